@@ -1,5 +1,6 @@
 from node_attack.attackSet import attackSet
 from node_attack.attackTrainerHelpers import test
+from adversarial_attack.harmfulInputCache import HarmfulInputCache
 from classes.basic_classes import Print
 from classes.approach_classes import Approach, NodeApproach
 
@@ -16,6 +17,8 @@ from typing import Tuple
 def adversarialTrainer(attack):
     """
         trains the model adversarial (the model learns to classify correctly harmful feature matrices)
+        when attack.adv_batch_size or attack.adv_drift is set, the harmful feature matrices of each epoch
+        come from a HarmfulInputCache (a mini-batch of warm-started victims), instead of attacking all the train nodes
         
         Parameters
         ----------
@@ -35,13 +38,22 @@ def adversarialTrainer(attack):
     adversarial_model_train_epochs = 200
     log_template = 'Adversarial Model - Epoch: {:03d}, Train: {:.4f}, Val: {:.4f}, Test: {:.4f}, Attack: {:.4f}'
 
+    harmful_input_cache = None
+    if attack.adv_batch_size is not None or attack.adv_drift is not None:
+        harmful_input_cache = HarmfulInputCache(batch_size=attack.adv_batch_size, drift_threshold=attack.adv_drift)
+
     model.attack = True
     # train in an adversarial way
     for epoch in range(0, adversarial_model_train_epochs):
-        tmp_attack = copy.deepcopy(attack)
-        tmp_attack.setIdx(epoch + 1)
-        attacked_x, attacked_nodes, y_targets = \
-            getTheMostHarmfulInput(attack=tmp_attack, approach=NodeApproach.TOPOLOGY)
+        if harmful_input_cache is None:
+            tmp_attack = copy.deepcopy(attack)
+            tmp_attack.setIdx(epoch + 1)
+            attacked_x, attacked_nodes, y_targets = \
+                getTheMostHarmfulInput(attack=tmp_attack, approach=NodeApproach.TOPOLOGY)
+        else:
+            harmful_input_cache.updateDrift(model=attack.model_wrapper.model)
+            attacked_x, attacked_nodes, y_targets = \
+                harmful_input_cache.getHarmfulInput(attack=attack, approach=NodeApproach.TOPOLOGY)
 
         train(model=attack.model_wrapper.model, optimizer=attack.model_wrapper.optimizer, data=data,
               attacked_nodes=attacked_nodes, attacked_x=attacked_x)
@@ -0,0 +1,132 @@
+from node_attack.attackSet import attackSetVictim, getNodesToAttack, getClassificationTargets
+from classes.basic_classes import Print, DatasetType
+from classes.approach_classes import Approach
+
+from typing import NamedTuple, Optional, Tuple
+import numpy as np
+import torch
+
+
+class HarmfulInput(NamedTuple):
+    """
+        a HarmfulInput object with the following fields:
+        y_target - the target label of the attack on the victim
+        malicious_nodes - the nodes whose rows were changed by the attack on the victim
+        rows - the harmful rows of malicious_nodes
+        drift - the drift of the model (see HarmfulInputCache.updateDrift) when the victim was attacked
+    """
+    y_target: int
+    malicious_nodes: torch.Tensor
+    rows: torch.Tensor
+    drift: float
+
+
+class HarmfulInputCache(object):
+    """
+        the data engine of the adversarial training: the harmful input of each train victim, kept between epochs
+        every epoch attacks a random mini-batch of the train victims (instead of all of them, from scratch),
+        a victim is attacked again only when the model drifted enough since its last attack,
+        and for continuous datasets its attack is warm-started from its cached rows
+        (so a victim that is still fooled by them is not attacked), more information at
+        node_attack.attackTrainerGeneric.warmStart
+        discrete attacks are not warm-started, as the discrete attack zeroes the rows of its malicious nodes first
+        important note: a cache entry is compact - only the rows which the attack changed in the model
+
+        Parameters
+        ----------
+        batch_size: Optional[int] - the number of victims per epoch, None for all the train nodes
+        drift_threshold: Optional[float] - the drift after which a victim is attacked again,
+                                           None to attack all the victims of the mini-batch every epoch
+    """
+    def __init__(self, batch_size: Optional[int] = None, drift_threshold: Optional[float] = None):
+        self.batch_size = batch_size
+        self.drift_threshold = drift_threshold
+        self.drift = 0.0
+        self.entries = {}
+        self._parameters = None
+
+    @torch.no_grad()
+    def updateDrift(self, model):
+        """
+            adds the relative change of the model parameters since the last call to the drift
+            the drift is the relative length of the path of the parameters, which bounds their relative distance
+
+            Parameters
+            ----------
+            model: Model
+        """
+        parameters = torch.cat([param.detach().view(-1) for param in model.parameters()])
+        if self._parameters is not None:
+            step = torch.norm(parameters - self._parameters) / torch.norm(self._parameters).clamp(min=1e-12)
+            self.drift += step.item()
+        self._parameters = parameters.clone()
+
+    def getHarmfulInput(self, attack, approach: Approach) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+        """
+            attacks a mini-batch of the train victims (or reuses their cached rows)
+            and extracts the attacked feature matrix of the mini-batch
+
+            Parameters
+            ----------
+            attack: oneGNNAttack
+            approach: Approach
+
+            Returns
+            -------
+            attacked_x: torch.Tensor - the feature matrix after the attack
+            attacked_nodes: torch.Tensor - the victim nodes
+            y_targets: torch.Tensor - the target labels of the attack
+        """
+        device = attack.device
+        dataset = attack.getDataset()
+        model = attack.model_wrapper.model
+
+        num_attacks, nodes_to_attack = getNodesToAttack(data=dataset.data, trainset=True)
+        if self.batch_size is not None:
+            num_attacks = min(num_attacks, self.batch_size)
+        attacked_nodes = np.random.choice(nodes_to_attack, num_attacks, replace=False)
+        attacked_nodes = torch.from_numpy(attacked_nodes).to(device)
+        y_targets = getClassificationTargets(attack=attack, dataset=dataset, num_attacks=num_attacks,
+                                             attacked_nodes=attacked_nodes)
+
+        print_answer = attack.print_answer
+        attack.print_answer = Print.NO
+        model0 = model.takeSnapshot()
+        for node_num, (attacked_node, y_target) in enumerate(zip(attacked_nodes.tolist(), y_targets.tolist())):
+            harmful_input = self.entries.get(attacked_node)
+            if harmful_input is not None and harmful_input.y_target != y_target:
+                harmful_input = None
+            if harmful_input is not None and self.drift_threshold is not None and \
+                    self.drift - harmful_input.drift < self.drift_threshold:
+                continue
+
+            # the model is restored after each victim, so no row of a victim is left in the model of the next one
+            if attack.dataset_type is DatasetType.CONTINUOUS:
+                attack.warm_start = harmful_input
+            try:
+                attackSetVictim(attack=attack, node_num=node_num, approach=approach, attacked_nodes=attacked_nodes,
+                                y_targets=y_targets, model_snapshot=None)
+                self.entries[attacked_node] = self._harmfulInput(model=model, model0=model0, y_target=y_target)
+            finally:
+                attack.warm_start = None
+                model.restoreSnapshot(model0)
+        attack.print_answer = print_answer
+
+        with torch.no_grad():
+            attacked_x = model0.getInput().clone()
+            for attacked_node in attacked_nodes.tolist():
+                harmful_input = self.entries[attacked_node]
+                attacked_x[harmful_input.malicious_nodes] = harmful_input.rows
+        return attacked_x, attacked_nodes, y_targets
+
+    @torch.no_grad()
+    def _harmfulInput(self, model, model0, y_target: int) -> HarmfulInput:
+        """
+            the cache entry of the attack which was just made on the model: all the rows which differ from model0
+            (the overlay rows, and any row which was written into the base matrix, see FeatureStore.setPerturbedNodes)
+        """
+        malicious_nodes = model.feature_store.perturbed_nodes.clone()
+        if model.feature_store.base_version != model0.feature_store.base_version:
+            malicious_nodes = (model.getInput() != model0.getInput()).any(dim=1).nonzero(as_tuple=True)[0]
+        rows = model.getInput(nodes=malicious_nodes).detach().clone()
+        return HarmfulInput(y_target=y_target, malicious_nodes=malicious_nodes, rows=rows, drift=self.drift)
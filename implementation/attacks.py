@@ -1,9 +1,9 @@
 from model_functions.graph_model import Model, ModelWrapper, AdversarialModelWrapper
 from dataset_functions.graph_dataset import GraphDataset
-from node_attack.attackSet import attackSet, printAttackHeader, getDefenceResultsMean
+from node_attack.attackSet import attackSet, printAttackHeader, getDefenceResultsMean, getSweep, getSweepResultsMean
 from classes.basic_classes import Print, DatasetType, GNN_TYPE, DataSet
 from helpers.fileNamer import fileNamer
-from classes.approach_classes import Approach
+from classes.approach_classes import Approach, NodeApproach
 from edge_attack.edgeAttackSet import edgeAttackSet
 
 from argparse import ArgumentParser
@@ -13,7 +13,6 @@ import numpy as np
 import random
 import pandas as pd
 from typing import Tuple
-import copy
 
 
 class oneGNNAttack(object):
@@ -36,7 +35,7 @@ class oneGNNAttack(object):
 
         self.mode = args.attMode
         self.dataset_name = args.dataset
-        dataset = GraphDataset(args.dataset, device)
+        dataset = GraphDataset(args.dataset, device, sparse_features=args.sparse_features)
         self.__dataset = dataset
         self.dataset_type = args.dataset.get_type()
 
@@ -49,6 +48,7 @@ class oneGNNAttack(object):
         self.num_layers = args.num_layers if args.num_layers is not None else 2
         self.patience = args.patience
 
+        self.continuous_epochs = None
         if dataset.type is DatasetType.CONTINUOUS:
             self.continuous_epochs = args.continuous_epochs
         self.lr = args.lr
@@ -56,12 +56,28 @@ class oneGNNAttack(object):
         if args.l_inf is None:
             args.l_inf = args.dataset.get_l_inf()
         self.l_inf = args.l_inf
+        self.l_inf_sweep = None
+        self.linf_continuation = args.linf_continuation
         if args.l_0 is None:
             args.l_0 = args.dataset.get_l_0()
         self.l_0 = args.l_0
+        self.l_0_sweep = None
         self.targeted = args.targeted
+        self.subgraph = args.subgraph
+        self.grad_norm = args.grad_norm
+        self.flip_k = args.flip_k
+        self.flip_growth = args.flip_growth
+        self.flip_refine = args.flip_refine
+        self.pgd = args.pgd
+        self.max_candidate_edges = args.max_candidate_edges
+        self.candidate_ranking = args.candidate_ranking
+        self.workers = args.workers
+        self.adv_batch_size = args.adv_batch_size
+        self.adv_drift = args.adv_drift
+        self.warm_start = None
 
         self.max_distance = args.distance
+        self.distance_sweep = None
 
         torch.manual_seed(seed)
         np.random.seed(seed)
@@ -77,6 +93,7 @@ class oneGNNAttack(object):
 
         # *PARTLY* checking correctness of the inputs
         self.checkDistanceFlag(args)
+        self.checkWorkersFlag(args)
 
     def setDataset(self, dataset: torch_geometric.data.Data):
         """
@@ -90,13 +107,14 @@ class oneGNNAttack(object):
 
     def getDataset(self):
         """
-            get a copy of the dataset
+            get the dataset, by reference
+            important note: the dataset is read-only, changes go through its transactions (see GraphDataset)
             
             Returns
             -------
             dataset: torch_geometric.data.Data
         """
-        return copy.deepcopy(self.__dataset)
+        return self.__dataset
 
     def checkDistanceFlag(self, args: ArgumentParser):
         """
@@ -109,6 +127,18 @@ class oneGNNAttack(object):
         if args.distance is not None:
             exit("This attack doesn't requires the distance flag")
 
+    def checkWorkersFlag(self, args: ArgumentParser):
+        """
+            Validates that the victims are split between worker processes only on the cpu
+            the worker processes receive a pickled copy of the attack, which can not hold cuda tensors
+
+            Parameters
+            ----------
+            args: ArgumentParser - command line inputs
+        """
+        if args.workers is not None and args.workers > 1 and self.device.type == 'cuda':
+            exit("The workers flag is supported only on the cpu")
+
     def setModelWrapper(self, gnn_type: GNN_TYPE):
         """
             Sets a ModelWrapper object and trains said ModelWrapper
@@ -305,6 +335,8 @@ class NodeGNNSAttack(oneGNNAttack):
             information at the generic base class oneGNNSAttack
         """
         results, _, _ = attackSet(self, approach=approach, trainset=False)
+        if getSweep(self) is not None:
+            return getSweepResultsMean(attack=self, approach=approach, attack_results=results)
         mean_results = getDefenceResultsMean(attack=self, approach=approach, attack_results=results)
         return mean_results[0], mean_results[1]
 
@@ -359,6 +391,7 @@ class NodeGNNSLinfAttack(NodeGNNSAttack):
         super(NodeGNNSLinfAttack, self).__init__(args=args, start_to_file='NodeLinfAttack', print_answer=Print.YES)
         self.l_inf_list = [0.01, 0.02, 0.04, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9]
         self.checkL_infFlag(self.getDataset())
+        self.checkLinfContinuationFlag(args)
 
     # a must-create
     def saveResults(self, defence: torch.Tensor, attributes: torch.Tensor):
@@ -384,12 +417,36 @@ class NodeGNNSLinfAttack(NodeGNNSAttack):
         if dataset.type is DatasetType.DISCRETE:
             exit("L_inf attack isn't suitable for discrete datasets")
 
+    def checkLinfContinuationFlag(self, args: ArgumentParser):
+        """
+            Validates that the linf_continuation flag is not combined with the pgd flag
+            the continuation sweep is a continuous attack only
+
+            Parameters
+            ----------
+            args: ArgumentParser - command line inputs
+        """
+        if args.linf_continuation and args.pgd:
+            exit("The linf_continuation flag can't be combined with the pgd flag")
+
     def attackPerGNN(self) -> Tuple[torch.Tensor]:
         """
             executes the requested attack for the requested l_inf values on a specific gnn_type
+            when linf_continuation is set, all the l_inf values are attacked by a single continuation sweep
+            (more information at attackTrainerContinuousLinfSweep)
         """
         defence = torch.zeros(len(self.l_inf_list)).to(self.device)
         attributes = torch.zeros(len(self.l_inf_list)).to(self.device)
+        if self.linf_continuation:
+            self.setLinf(self.l_inf_list[0])
+            self.l_inf_sweep = self.l_inf_list
+            sweep_defence, sweep_attributes = self.attackPerApproachWrapper(approach=NodeApproach.SINGLE)
+            self.l_inf_sweep = None
+            self.setLinf(max(self.l_inf_list))
+            defence[:] = sweep_defence
+            attributes[:] = sweep_attributes
+            return defence.unsqueeze(0), attributes.unsqueeze(0)
+
         for l_inf_idx, l_inf in enumerate(self.l_inf_list):
             self.setLinf(l_inf)
             tmp_defence, tmp_attributes = self.attackPerApproachWrapper(approach=NodeApproach.SINGLE)
@@ -479,14 +536,27 @@ class NodeGNNSL0Attack(NodeGNNSAttack):
     def attackPerGNNContinuous(self) -> Tuple[torch.Tensor]:
         """
             attackPerGNN for CONTINUOUS datasets
+            all the l_0 values are attacked by a single sweep (more information at attackTrainerContinuousSweep),
+            except for the projected-gradient attack, which limits the attributes by l_0 on every step
         """
         defence = torch.zeros(len(self.l_0_list)).to(self.device)
         attributes = torch.zeros(len(self.l_0_list)).to(self.device)
-        for l_0_idx, l_0 in enumerate(self.l_0_list):
-            self.setL0(l_0)
-            tmp_defence, tmp_attributes = self.attackPerApproachWrapper(approach=NodeApproach.SINGLE)
-            defence[l_0_idx] = tmp_defence
-            attributes[l_0_idx] = tmp_attributes
+        if self.pgd:
+            for l_0_idx, l_0 in enumerate(self.l_0_list):
+                self.setL0(l_0)
+                tmp_defence, tmp_attributes = self.attackPerApproachWrapper(approach=NodeApproach.SINGLE)
+                defence[l_0_idx] = tmp_defence
+                attributes[l_0_idx] = tmp_attributes
+            return defence.unsqueeze(0), attributes.unsqueeze(0)
+
+        # the attack of every l_0 is seeded the same by attackPerApproachWrapper, so they share their victims
+        self.setL0(self.l_0_list[0])
+        self.l_0_sweep = self.l_0_list
+        sweep_defence, sweep_attributes = self.attackPerApproachWrapper(approach=NodeApproach.SINGLE)
+        self.l_0_sweep = None
+        self.setL0(self.l_0_list[-1])
+        defence[:] = sweep_defence
+        attributes[:] = sweep_attributes
 
         return defence.unsqueeze(0), attributes.unsqueeze(0)
 
@@ -551,14 +621,20 @@ class NodeGNNSDistanceAttack(NodeGNNSAttack):
     def attackPerGNN(self) -> Tuple[torch.Tensor]:
         """
             executes the requested attack for the requested distance on a specific gnn_type
+            all the distances are attacked by a single pass over the victims: each victim is classified
+            and its BFS environment is looked up once (more information at attackVictimPerDistance)
         """
         defence = torch.zeros(self.max_distance).to(self.device)
         attributes = torch.zeros(self.max_distance).to(self.device)
-        for distance in range(1, self.max_distance + 1):
-            self.setCurrentDistance(distance)
-            tmp_defence, tmp_attributes = self.attackPerApproachWrapper(approach=NodeApproach.SINGLE)
-            defence[distance - 1] = tmp_defence
-            attributes[distance - 1] = tmp_attributes
+
+        # the attack of every distance is seeded the same by attackPerApproachWrapper, so they share their victims
+        self.setCurrentDistance(1)
+        self.distance_sweep = list(range(1, self.max_distance + 1))
+        sweep_defence, sweep_attributes = self.attackPerApproachWrapper(approach=NodeApproach.SINGLE)
+        self.distance_sweep = None
+        self.setCurrentDistance(self.max_distance)
+        defence[:] = sweep_defence
+        attributes[:] = sweep_attributes
 
         return defence.unsqueeze(0), attributes.unsqueeze(0)
 
@@ -83,12 +83,12 @@ class NodeApproach(Approach):
             malicious_node, _ = neighbours_and_dist[malicious_index.item()]
             malicious_node = torch.tensor([malicious_node.item()]).to(attack.device)
         elif self is NodeApproach.TOPOLOGY:
-            malicious_node = heuristicApproach(reversed_arr_list=attack.getDataset().reversed_arr_list,
+            malicious_node = heuristicApproach(node_scores=attack.getDataset().structure_index.in_degree,
                                                neighbours_and_dist=neighbours_and_dist,
                                                device=attack.device)
         elif self is NodeApproach.GRAD_CHOICE:
             malicious_node = gradientApproach(attack=attack, attacked_node=attacked_node, y_target=y_target,
-                                              node_num=node_num, neighbours_and_dist=neighbours_and_dist)
+                                              neighbours_and_dist=neighbours_and_dist)
         elif self is NodeApproach.INJECTION:
             malicious_node, dataset = attack.model_wrapper.model.injectNode(dataset=attack.getDataset(),
                                                                             attacked_node=attacked_node)
@@ -1,9 +1,9 @@
 from enum import Enum, auto
 from torch import nn
 from typing import List, Optional
-from torch_geometric.nn import GCNConv, SGConv
 
-from model_functions.modified_gnns import ModifiedGATConv, ModifiedGINConv, ModifiedSAGEConv
+from model_functions.modified_gnns import (ModifiedGATConv, ModifiedGINConv, ModifiedSAGEConv, ModifiedGCNConv,
+                                          ModifiedSGConv)
 from model_functions.robust_gcn import RobustGCNModel
 from model_functions.rgnn.rgnn_model import RGNNModel
 from model_functions.gal.gal_model import GalModel
@@ -147,7 +147,7 @@ class GNN_TYPE(Enum):
             layer: torch_geometric.nn
         """
         if self is GNN_TYPE.GCN:
-            return GCNConv(in_channels=in_dim, out_channels=out_dim)
+            return ModifiedGCNConv(in_channels=in_dim, out_channels=out_dim)
         elif self is GNN_TYPE.GAT:
             return ModifiedGATConv(in_channels=in_dim, out_channels=out_dim)
         elif self is GNN_TYPE.SAGE:
@@ -157,7 +157,7 @@ class GNN_TYPE(Enum):
                                        nn.Linear(out_dim, out_dim), nn.BatchNorm1d(out_dim), nn.ReLU())
             return ModifiedGINConv(sequential)
         elif self is GNN_TYPE.SGC:
-            return SGConv(in_channels=in_dim, out_channels=out_dim, K=K)
+            return ModifiedSGConv(in_channels=in_dim, out_channels=out_dim, K=K)
         else:
             exit(self.string() + " can not use this method")
 
@@ -1,15 +1,79 @@
 from dataset_functions.twitter_dataset import TwitterDataset
 from classes.basic_classes import DataSet
 from helpers.getGitPath import getGitPath
+from dataset_functions.structure_index import StructureIndex
+from model_functions.sparse_features import SparseFeatures
 
-from typing import NamedTuple
+from typing import List, NamedTuple, Tuple, Union
 import os.path as osp
+import hashlib
+import numpy as np
 import pickle
 import torch
 import torch_geometric
 from torch_geometric.datasets import Planetoid
 
 
+TRANSACTION_FIELDS = ('train_mask', 'val_mask', 'test_mask', 'y')
+
+
+class CSRAdjacency(NamedTuple):
+    """
+        a compressed sparse row adjacency with the following fields:
+        indptr - the neighbours of node i are indices[indptr[i]:indptr[i + 1]]
+        indices - the neighbours of all nodes, in the order of the edges
+        edge_ids - the column of each neighbour's edge in the edge index
+    """
+    indptr: np.ndarray
+    indices: np.ndarray
+    edge_ids: np.ndarray
+
+    def degrees(self) -> np.ndarray:
+        return np.diff(self.indptr)
+
+    def neighbours(self, nodes: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+            the neighbours of a batch of nodes, node after node
+
+            Parameters
+            ----------
+            nodes: np.ndarray
+
+            Returns
+            -------
+            rows: np.ndarray - the position (in nodes) of the node of each neighbour
+            neighbours: np.ndarray
+            edge_ids: np.ndarray - the column of each neighbour's edge in the edge index
+        """
+        nodes = np.asarray(nodes, dtype=np.int64).reshape(-1)
+        starts = self.indptr[nodes]
+        counts = self.indptr[nodes + 1] - starts
+        group_starts = np.cumsum(counts) - counts
+        positions = np.repeat(starts - group_starts, counts) + np.arange(counts.sum())
+        rows = np.repeat(np.arange(nodes.shape[0]), counts)
+        return rows, self.indices[positions], self.edge_ids[positions]
+
+
+def buildCSRAdjacency(index_from: np.ndarray, index_to: np.ndarray, num_nodes: int) -> CSRAdjacency:
+    """
+        groups the edges by index_from, keeping the order of the edges inside each group
+
+        Parameters
+        ----------
+        index_from: np.ndarray - the node of each edge which owns it in the adjacency
+        index_to: np.ndarray - the neighbour of each edge
+        num_nodes: int
+
+        Returns
+        -------
+        adjacency: CSRAdjacency
+    """
+    order = np.argsort(index_from, kind='stable')
+    indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(index_from, minlength=num_nodes), out=indptr[1:])
+    return CSRAdjacency(indptr=indptr, indices=index_to[order].astype(np.int64), edge_ids=order.astype(np.int64))
+
+
 class Masks(NamedTuple):
     """
         a Mask object with the following fields:
@@ -22,13 +86,17 @@ class Masks(NamedTuple):
 class GraphDataset(object):
     """
         a base class for datasets
+        important note: the dataset is shared by reference and is read-only,
+        mutations of the data (e.g. injection) go through a transaction which is either committed or rolled back
 
         Parameters
         ----------
         dataset: DataSet
         device: torch.device
+        sparse_features: bool - whether or not to also hold the (binary bag-of-words) attributes of Cora/CiteSeer
+                                in a sparse format, which the node models use as their base attribute matrix
     """
-    def __init__(self, dataset: DataSet, device: torch.device):
+    def __init__(self, dataset: DataSet, device: torch.device, sparse_features: bool = False):
         super(GraphDataset, self).__init__()
         name = dataset.string()
         self.name = name
@@ -47,10 +115,30 @@ class GraphDataset(object):
         else:
             self._setMasks(data, name)
 
-        self._setReversedArrayList(data)
+        if sparse_features and dataset is not DataSet.CORA and dataset is not DataSet.CITESEER:
+            raise ValueError('sparse features are supported only for the CORA and CITESEER datasets')
+        self.sparse_x = SparseFeatures.fromDense(data.x) if sparse_features else None
+
+        self._setAdjacency(data)
+        self._reversed_arr_list = None
+        self._structure_index = None
+        self._setEdgeIndexHash(data)
 
         self.data = data
         self.type = dataset.get_type()
+        self._transaction = None
+
+    def getFeatures(self) -> Union[torch.Tensor, SparseFeatures]:
+        """
+            a get function for the base attribute matrix of the node models
+
+            Returns
+            -------
+            x: Union[torch.Tensor, SparseFeatures] - the sparse attributes if requested, the dense ones otherwise
+        """
+        if self.sparse_x is not None:
+            return self.sparse_x
+        return self.data.x
 
     def _loadDataset(self, dataset: DataSet, device: torch.device) -> torch_geometric.data.Data:
         """
@@ -137,23 +225,90 @@ class GraphDataset(object):
         return masks
 
     # converting graph edge index representation to graph array list representation
-    def _setReversedArrayList(self, data: torch_geometric.data.Data):
+    def _setAdjacency(self, data: torch_geometric.data.Data):
+        """
+            creates the CSR adjacencies of the incoming and of the outgoing neighbours of each node
+            and their degrees
+            the neighbours of a node are in the order of the edges
+
+            Parameters
+            ----------
+            data: torch_geometric.data.Data
+        """
+        edge_index = data.edge_index.cpu().numpy()
+        self.in_adjacency = buildCSRAdjacency(index_from=edge_index[1], index_to=edge_index[0],
+                                              num_nodes=data.num_nodes)
+        self.out_adjacency = buildCSRAdjacency(index_from=edge_index[0], index_to=edge_index[1],
+                                               num_nodes=data.num_nodes)
+        self.in_degree = self.in_adjacency.degrees()
+        self.out_degree = self.out_adjacency.degrees()
+        self.in_degree.setflags(write=False)
+        self.out_degree.setflags(write=False)
+
+    @property
+    def structure_index(self) -> StructureIndex:
+        """
+            the structural statistics of the nodes (degrees, k-core, pagerank), built on first use
+            more information at dataset_functions.structure_index
+        """
+        if self._structure_index is None:
+            self._structure_index = StructureIndex(dataset=self)
+        return self._structure_index
+
+    @property
+    def reversed_arr_list(self) -> List[List[int]]:
+        """
+            a list view of the incoming neighbours of each node, built on first use
+            kept for compatibility, in_adjacency holds the same neighbours in the same order
+        """
+        if self._reversed_arr_list is None:
+            indptr, indices = self.in_adjacency.indptr, self.in_adjacency.indices.tolist()
+            self._reversed_arr_list = [indices[indptr[node]:indptr[node + 1]] for node in range(len(indptr) - 1)]
+        return self._reversed_arr_list
+
+    def _setEdgeIndexHash(self, data: torch_geometric.data.Data):
         """
-            creates a reversed array list from the edges
+            sets a hash of the edges, which identifies the files that are computed from them
 
             Parameters
             ----------
             data: torch_geometric.data.Data
         """
-        edge_index = data.edge_index
-        num_nodes = data.num_nodes
-        reversed_arr_list = [[] for _ in range(num_nodes)]
+        edge_index_hash = hashlib.sha1(str(data.num_nodes).encode())
+        edge_index_hash.update(data.edge_index.cpu().numpy().tobytes())
+        self.edge_index_hash = edge_index_hash.hexdigest()[:16]
 
-        for idx, column in enumerate(edge_index.T):
-            edge_from = edge_index[0, idx].item()
-            edge_to = edge_index[1, idx].item()
+    def beginTransaction(self):
+        """
+            starts a transactional overlay over the mutable fields of the data (the masks and the labels)
+            the data is not copied, the current fields are kept aside for a rollback
+        """
+        if self._transaction is not None:
+            raise RuntimeError("A dataset transaction is already in progress")
+        self._transaction = {name: getattr(self.data, name) for name in TRANSACTION_FIELDS}
 
-            # swapping positions to find all the neighbors that can go to the root
-            reversed_arr_list[edge_to].append(edge_from)
+    def updateData(self, **fields: torch.Tensor):
+        """
+            replaces fields of the data inside a transaction
+            important note: the fields are replaced and not changed in place, so the rollback is kept intact
 
-        self.reversed_arr_list = reversed_arr_list
+            Parameters
+            ----------
+            fields: torch.Tensor - the new value of each field, by name
+        """
+        if self._transaction is None:
+            raise RuntimeError("The dataset is read-only outside of a transaction")
+        for name, value in fields.items():
+            if name not in TRANSACTION_FIELDS:
+                raise ValueError(f"{name} is not one of the mutable fields {TRANSACTION_FIELDS}")
+            setattr(self.data, name, value)
+
+    def rollbackTransaction(self):
+        """
+            drops the changes of the transaction, restoring the fields from before it started
+        """
+        if self._transaction is None:
+            raise RuntimeError("No dataset transaction is in progress")
+        for name, value in self._transaction.items():
+            setattr(self.data, name, value)
+        self._transaction = None
@@ -0,0 +1,88 @@
+from helpers.algorithms import multiRootKBFS
+from helpers.getGitPath import getGitPath
+
+import glob
+import os
+import os.path as osp
+import numpy as np
+import torch
+
+# the loaded indices, by (dataset name, K, edge index hash)
+_neighbourhood_indices = {}
+
+
+class NeighbourhoodIndex(object):
+    """
+        the k-hop BFS neighbourhoods of all nodes in a dataset
+        stored in the masks folder as memory-mapped arrays and rebuilt whenever the edges of the dataset change
+
+        Parameters
+        ----------
+        dataset: GraphDataset
+        K: int - the maximal distance
+    """
+    def __init__(self, dataset, K: int):
+        prefix = osp.join(getGitPath(), 'masks', '{}_neighbourhoods_K{}_'.format(dataset.name, K))
+        offsets_path = prefix + dataset.edge_index_hash + '_offsets.npy'
+        neighbours_path = prefix + dataset.edge_index_hash + '_neighbours.npy'
+
+        if not osp.exists(offsets_path) or not osp.exists(neighbours_path):
+            # indices of older edges
+            for stale_path in glob.glob(prefix + '*.npy'):
+                if dataset.edge_index_hash not in stale_path:
+                    os.remove(stale_path)
+            offsets, nodes, distances = multiRootKBFS(roots=np.arange(dataset.data.num_nodes),
+                                                      adjacency=dataset.in_adjacency, K=K)
+            self._save(neighbours_path, np.stack((nodes, distances), axis=1))
+            self._save(offsets_path, offsets)
+
+        self.offsets = np.load(offsets_path, mmap_mode='r')
+        self.neighbours_and_dist = np.load(neighbours_path, mmap_mode='r')
+
+    @staticmethod
+    def _save(path: str, array: np.ndarray):
+        """
+            saves an array atomically, so that parallel workers never read a partially written file
+        """
+        tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+        with open(tmp_path, 'wb') as file:
+            np.save(file, array)
+        os.replace(tmp_path, path)
+
+    def neighboursAndDist(self, root: torch.Tensor, device: torch.cuda) -> torch.Tensor:
+        """
+            the BFS neighbourhood of a node, the same as helpers.algorithms.kBFS
+
+            Parameters
+            ----------
+            root: torch.Tensor
+            device: torch.cuda
+
+            Returns
+            -------
+            neighbours_and_dist: torch.Tensor - 2d-tensor that includes
+                                                1st-col - the nodes that are in the victim nodes BFS neighborhood
+                                                2nd-col - the distance of said nodes from the victim node
+        """
+        root = root.item()
+        neighbours_and_dist = np.array(self.neighbours_and_dist[self.offsets[root]:self.offsets[root + 1]])
+        return torch.from_numpy(neighbours_and_dist).to(device)
+
+
+def getNeighbourhoodIndex(dataset, K: int) -> NeighbourhoodIndex:
+    """
+        a get function for the neighbourhood index of a dataset, which is built once per (dataset, K)
+
+        Parameters
+        ----------
+        dataset: GraphDataset
+        K: int - the maximal distance
+
+        Returns
+        -------
+        neighbourhood_index: NeighbourhoodIndex
+    """
+    key = (dataset.name, K, dataset.edge_index_hash)
+    if key not in _neighbourhood_indices:
+        _neighbourhood_indices[key] = NeighbourhoodIndex(dataset=dataset, K=K)
+    return _neighbourhood_indices[key]
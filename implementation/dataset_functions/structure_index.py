@@ -0,0 +1,90 @@
+import numpy as np
+
+
+class StructureIndex(object):
+    """
+        the structural statistics of the nodes of a graph, each computed once on its first use
+        the statistics are arrays over the nodes, so topology-based attacker selectors are vectorized lookups
+        more information at helpers.algorithms.heuristicApproach
+
+        Parameters
+        ----------
+        dataset: GraphDataset
+    """
+    def __init__(self, dataset):
+        self.out_adjacency = dataset.out_adjacency
+        self.num_nodes = dataset.out_adjacency.indptr.shape[0] - 1
+        self.in_degree = dataset.in_degree
+        self.out_degree = dataset.out_degree
+        self._statistics = {}
+
+    @property
+    def core_number(self) -> np.ndarray:
+        return self._getStatistic('core_number', self._coreNumber)
+
+    @property
+    def pagerank(self) -> np.ndarray:
+        return self._getStatistic('pagerank', self._pagerank)
+
+    def _getStatistic(self, name: str, compute) -> np.ndarray:
+        if name not in self._statistics:
+            statistic = compute()
+            statistic.setflags(write=False)
+            self._statistics[name] = statistic
+        return self._statistics[name]
+
+    def _coreNumber(self) -> np.ndarray:
+        """
+            the k-core number of each node in the undirected (simple) version of the graph,
+            by peeling all the nodes of degree at most k at once
+        """
+        num_nodes = self.num_nodes
+        node_from = np.repeat(np.arange(num_nodes), self.out_degree)
+        node_to = self.out_adjacency.indices
+        keys = np.unique(np.concatenate((node_from * num_nodes + node_to, node_to * num_nodes + node_from)))
+        node_from, node_to = keys // num_nodes, keys % num_nodes
+        is_loop = node_from == node_to
+        node_from, node_to = node_from[~is_loop], node_to[~is_loop]
+
+        indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(node_from, minlength=num_nodes), out=indptr[1:])
+        degree = np.diff(indptr)
+        core_number = np.zeros(num_nodes, dtype=np.int64)
+        is_removed = np.zeros(num_nodes, dtype=bool)
+        k = 0
+        while not is_removed.all():
+            peeled = np.nonzero(~is_removed & (degree <= k))[0]
+            if not peeled.size:
+                k = degree[~is_removed].min()
+                continue
+            core_number[peeled] = k
+            is_removed[peeled] = True
+
+            # the degrees of the remaining neighbours of the peeled nodes
+            starts = indptr[peeled]
+            counts = indptr[peeled + 1] - starts
+            positions = np.repeat(starts - (np.cumsum(counts) - counts), counts) + np.arange(counts.sum())
+            degree -= np.bincount(node_to[positions], minlength=num_nodes)
+        return core_number
+
+    def _pagerank(self, damping: float = 0.85, tol: float = 1e-6, max_iter: int = 100) -> np.ndarray:
+        """
+            the pagerank of each node by power iteration, mass flows along the edges (source to target)
+            the mass of nodes without outgoing edges is spread uniformly
+        """
+        num_nodes = self.num_nodes
+        out_degree = self.out_degree
+        node_from = np.repeat(np.arange(num_nodes), out_degree)
+        node_to = self.out_adjacency.indices
+        is_dangling = out_degree == 0
+
+        rank = np.full(num_nodes, 1 / num_nodes)
+        for _ in range(max_iter):
+            flow = rank / np.maximum(out_degree, 1)
+            new_rank = np.bincount(node_to, weights=flow[node_from], minlength=num_nodes)
+            new_rank = damping * (new_rank + rank[is_dangling].sum() / num_nodes) + (1 - damping) / num_nodes
+            converged = np.abs(new_rank - rank).sum() < num_nodes * tol
+            rank = new_rank
+            if converged:
+                break
+        return rank
@@ -3,8 +3,10 @@ from node_attack.attackSet import getClassificationTargets
 from node_attack.attackVictim import checkNodeClassification
 from classes.basic_classes import Print
 from classes.approach_classes import Approach, EdgeApproach
+from model_functions.model_snapshot import ModelSnapshot
+from helpers.parallelVictims import mapVictims
 
-import copy
+from functools import partial
 import numpy as np
 import torch
 
@@ -39,28 +41,14 @@ def edgeAttackSet(attack, approach: Approach, print_flag: bool) -> torch.Tensor:
                                          attacked_nodes=attacked_nodes)
 
     # chooses a victim node and attacks it using oneNodeEdgeAttack
-    defence_rate = 0
     attack.model_wrapper.model.attack = True
-    model0 = copy.deepcopy(attack.model_wrapper.model)
-    for node_num in range(num_attacks):
-        attacked_node = torch.tensor([attacked_nodes[node_num]], dtype=torch.long).to(device)
-        y_target = torch.tensor([y_targets[node_num]]).to(device)
-        classified_to_target = checkNodeClassification(attack=attack, dataset=dataset, attacked_node=attacked_node,
-                                                       y_target=y_target, print_answer=Print.NO,
-                                                       attack_num=node_num + 1)
-        # important note: the victim is attacked only if it is classified to y_target!
-        if classified_to_target:
-            fail = edgeAttackVictim(attack=attack, approach=approach, print_flag=print_flag,
-                                    attacked_node=attacked_node, y_target=y_target, node_num=node_num + 1)
-            # the defence rate is raised only if we classify correctly both before and after the attack
-            if (not fail) and (fail is not None):
-                defence_rate += 1 / num_attacks
-        else:
-            if print_flag:
-                print('Attack: {:03d}, Node: {}, Misclassified already!'.format(node_num + 1, attacked_node.item()))
-                if approach is EdgeApproach.MULTI or approach is EdgeApproach.MULTI_GRAD_CHOICE:
-                    print()
-        attack.setModel(model0)
+    model_snapshot = attack.model_wrapper.model.takeSnapshot()
+    victim_function = partial(edgeAttackSetVictim, approach=approach, print_flag=print_flag,
+                              attacked_nodes=attacked_nodes, y_targets=y_targets, model_snapshot=model_snapshot)
+    defence_rate = 0
+    for defended in mapVictims(attack=attack, victim_function=victim_function, num_attacks=num_attacks):
+        if defended:
+            defence_rate += 1 / num_attacks
     attack.model_wrapper.model.attack = False
     if print_flag:
         print()
@@ -70,6 +58,47 @@ def edgeAttackSet(attack, approach: Approach, print_flag: bool) -> torch.Tensor:
     return torch.tensor([defence_rate])
 
 
+def edgeAttackSetVictim(attack, node_num: int, approach: Approach, print_flag: bool, attacked_nodes: torch.Tensor,
+                        y_targets: torch.Tensor, model_snapshot: ModelSnapshot) -> bool:
+    """
+        attacks a single victim of edgeAttackSet
+
+        Parameters
+        ----------
+        attack: oneGNNAttack
+        node_num: int - the index of the attacked/victim node (out of the test-set)
+        approach: Approach
+        print_flag: bool - whether to print every iteration or not
+        attacked_nodes: torch.Tensor - the victim nodes
+        y_targets: torch.Tensor - the target labels of the attack
+        model_snapshot: ModelSnapshot - the model is restored to it after the attack
+
+        Returns
+        -------
+        defended: bool - whether or not the victim is classified correctly both before and after the attack
+    """
+    device = attack.device
+    attacked_node = torch.tensor([attacked_nodes[node_num]], dtype=torch.long).to(device)
+    y_target = torch.tensor([y_targets[node_num]]).to(device)
+    classified_to_target = checkNodeClassification(attack=attack, dataset=attack.getDataset(),
+                                                   attacked_node=attacked_node, y_target=y_target,
+                                                   print_answer=Print.NO, attack_num=node_num + 1)
+    defended = False
+    # important note: the victim is attacked only if it is classified to y_target!
+    if classified_to_target:
+        fail = edgeAttackVictim(attack=attack, approach=approach, print_flag=print_flag,
+                                attacked_node=attacked_node, y_target=y_target, node_num=node_num + 1)
+        # the defence rate is raised only if we classify correctly both before and after the attack
+        defended = (not fail) and (fail is not None)
+    else:
+        if print_flag:
+            print('Attack: {:03d}, Node: {}, Misclassified already!'.format(node_num + 1, attacked_node.item()))
+            if approach is EdgeApproach.MULTI or approach is EdgeApproach.MULTI_GRAD_CHOICE:
+                print()
+    attack.model_wrapper.model.restoreSnapshot(model_snapshot)
+    return defended
+
+
 def printEdgeAttackHeader(attack, approach: Approach):
     """
         print the header of the attack
@@ -1,11 +1,16 @@
-from helpers.algorithms import kBFS
+from dataset_functions.neighbourhood_index import getNeighbourhoodIndex
 from node_attack.attackTrainerHelpers import train
-from node_attack.attackTrainerHelpers import test
+from node_attack.attackTrainerHelpers import test, model_res2targets_acc, isTrainModeSensitive
+from model_functions.victim_subgraph import extractVictimSubgraph, batchedVictimLogits, useVictimSubgraph
 from classes.approach_classes import Approach, EdgeApproach
 
+from typing import Optional
 import numpy as np
 import torch
 
+# the largest number of flip prefixes which are evaluated by a single batched forward
+MAX_PREFIX_BATCH = 64
+
 
 def edgeAttackVictim(attack, approach: Approach, print_flag: bool, attacked_node: torch.Tensor, y_target: torch.Tensor,
                      node_num: int) -> torch.Tensor:
@@ -14,6 +19,7 @@ def edgeAttackVictim(attack, approach: Approach, print_flag: bool, attacked_node
         the pool of possible edges changes per approach
         this BFS environments is also calculated according to our selected approach
         lastly, we attack using attackTrainer
+        when attack.subgraph is set, edgeTrainer runs on the receptive field of the victim only
         important note: the victim node is already known (attacked node)
 
         Parameters
@@ -36,8 +42,8 @@ def edgeAttackVictim(attack, approach: Approach, print_flag: bool, attacked_node
     targeted = attack.targeted
     end_log_template = ', Attack Success: {}'
 
-    neighbours_and_dist = kBFS(root=attacked_node, device=device, reversed_arr_list=dataset.reversed_arr_list,
-                               K=model.num_layers - 1)
+    neighbourhood_index = getNeighbourhoodIndex(dataset=dataset, K=model.num_layers - 1)
+    neighbours_and_dist = neighbourhood_index.neighboursAndDist(root=attacked_node, device=device)
     if not neighbours_and_dist.nelement():
         if print_flag:
             print('Attack: {:03d}, Node: {} is a solo node'.format(node_num, attacked_node.item()), flush=True)
@@ -59,7 +65,7 @@ def edgeAttackVictim(attack, approach: Approach, print_flag: bool, attacked_node
             new_attacked_node = torch.tensor([malicious_indices[new_attacked_node_index].item()]).to(device)
         flipEdge(model=model, attacked_node=new_attacked_node, malicious_index=malicious_index, device=device)
         attack_results = test(data=data, model=model, targeted=targeted, attacked_nodes=new_attacked_node,
-                              y_targets=y_target)
+                              y_targets=y_target, compute_accuracies=False)
 
         if print_flag:
             print(end_log_template.format(attack_results[3]), flush=True)
@@ -73,11 +79,18 @@ def edgeAttackVictim(attack, approach: Approach, print_flag: bool, attacked_node
         # Add all possible edges between all possible nodes and the BFS of distance K-1
         # calculate the edge with the largest gradient and flip it, using edgeTrainer
         malicious_index = model.expandEdgesByMalicious(dataset=dataset, approach=approach, attacked_node=attacked_node,
-                                                       neighbours=malicious_indices, device=device)
+                                                       neighbours=malicious_indices, device=device,
+                                                       max_candidates=attack.max_candidate_edges,
+                                                       candidate_ranking=attack.candidate_ranking)
+        # the candidate edges are already in the model, and edgeTrainer only flips them,
+        # so the receptive field of the victim includes the candidate attackers and their own receptive fields
+        if attack.subgraph:
+            useVictimSubgraph(model=model, attacked_nodes=attacked_node)
         attack_results = edgeTrainer(data=data, approach=approach, targeted=targeted, model=model,
                                      attacked_node=attacked_node, y_target=y_target, node_num=node_num,
                                      malicious_index=malicious_index, device=device, print_flag=print_flag,
                                      end_log_template=end_log_template)
+        model.removeVictimSubgraph()
     if attack_results is None:
         print("Node approach doesnt exist", flush=True)
         quit()
@@ -88,6 +101,7 @@ def edgeAttackVictim(attack, approach: Approach, print_flag: bool, attacked_node
 def flipEdge(model, attacked_node: torch.Tensor, malicious_index: torch.Tensor, device: torch.cuda):
     """
         flips the edge between attacked node and malicious index
+        the edge is found by the edge key index of the model
 
         Parameters
         ----------
@@ -105,15 +119,14 @@ def flipEdge(model, attacked_node: torch.Tensor, malicious_index: torch.Tensor,
         return
 
     # if edge existed
-    for edge_num, edge in enumerate(model.edge_index.T):
-        if edge[0] == malicious_index and edge[1] == attacked_node:
-            model.edge_weight.data[edge_num] = 0
-            return
+    edge_num = model.findEdge(malicious_index, attacked_node)
+    if edge_num is not None:
+        model.edge_weight.data[edge_num] = 0
+        return
 
     # if edge didn't existed
-    model.edge_index = torch.cat((model.edge_index, torch.tensor([[malicious_index, attacked_node]]).to(device).T),
-                                 dim=1)
-    model.edge_weight.data = torch.cat((model.edge_weight.data, torch.tensor([1]).type(torch.FloatTensor).to(device)))
+    model.addEdges(edge_index=torch.tensor([[malicious_index], [attacked_node]]).to(device),
+                   edge_weight=torch.tensor([1]).type(torch.FloatTensor).to(device))
 
 
 def edgeTrainer(data, approach: Approach, targeted: bool, model,
@@ -174,8 +187,9 @@ def edgeTrainer(data, approach: Approach, targeted: bool, model,
         # return edge weights to back to original values and flip
         model.edge_weight.data = edge_weight0
         model.edge_weight.data[max_malicious_edge] = not model.edge_weight.data[max_malicious_edge]
+        # the accuracies are only printed by the multi approaches
         attack_results = test(data=data, model=model, targeted=targeted, attacked_nodes=attacked_node,
-                              y_targets=y_target)
+                              y_targets=y_target, compute_accuracies=print_flag and approach.isMulti())
         if not approach.isMulti():
             if print_flag:
                 print(end_log_template.format(attack_results[-1]), flush=True)
@@ -226,8 +240,10 @@ def findMinimalEdges(sorted_edges: torch.Tensor, data, model, targeted: bool,
                      attacked_node: torch.Tensor, y_target: torch.Tensor, node_num: int, print_flag: bool,
                      log_template, end_log_template):
     """
-        flips each edge with a non-zero gradient
+        flips the edges with a non-zero gradient by their order, until the attack succeeds
         this function is only available for multi approaches
+        when nothing is printed, the minimal successful prefix of the edges is found by batched forwards
+        (more information at firstSuccessfulPrefix), and only that prefix is flipped and tested
 
         Parameters
         ----------
@@ -247,10 +263,23 @@ def findMinimalEdges(sorted_edges: torch.Tensor, data, model, targeted: bool,
         -------
         attack_result: torch.Tensor
     """
-    for edge_num, malicious_edge in enumerate(sorted_edges):
+    num_scanned = 0
+    if not print_flag and not isTrainModeSensitive(model):
+        num_flips = firstSuccessfulPrefix(sorted_edges=sorted_edges, model=model, targeted=targeted,
+                                          attacked_node=attacked_node, y_target=y_target)
+        num_scanned = sorted_edges.shape[0] if num_flips is None else num_flips
+        flipped_edges = sorted_edges[:num_scanned]
+        model.edge_weight.data[flipped_edges] = (model.edge_weight.data[flipped_edges] == 0).type_as(model.edge_weight)
+        attack_results = test(data=data, model=model, targeted=targeted, attacked_nodes=attacked_node,
+                              y_targets=y_target, compute_accuracies=False)
+        if attack_results[3]:
+            return attack_results
+        # the batched forward disagreed with the full forward (a floating point tie), so the scan continues one by one
+
+    for edge_num, malicious_edge in enumerate(sorted_edges[num_scanned:], num_scanned):
         model.edge_weight.data[malicious_edge] = not model.edge_weight.data[malicious_edge]
         attack_results = test(data=data, model=model, targeted=targeted, attacked_nodes=attacked_node,
-                              y_targets=y_target)
+                              y_targets=y_target, compute_accuracies=print_flag)
         if print_flag:
             print(log_template.format(node_num, edge_num + 2, *attack_results[:-1]), flush=True, end='')
         if attack_results[3]:
@@ -258,3 +287,59 @@ def findMinimalEdges(sorted_edges: torch.Tensor, data, model, targeted: bool,
     if print_flag:
         print(end_log_template.format(attack_results[-1]) + '\n', flush=True)
     return attack_results
+
+
+@torch.no_grad()
+def firstSuccessfulPrefix(sorted_edges: torch.Tensor, model, targeted: bool, attacked_node: torch.Tensor,
+                          y_target: torch.Tensor) -> Optional[int]:
+    """
+        the minimal number of edges (by their order) whose flip makes the attack succeed - the result of the
+        sequential scan, with a fraction of the forwards:
+        the prefixes are scanned in windows which grow exponentially (1, 2, 4, ... up to MAX_PREFIX_BATCH prefixes),
+        all the prefixes of a window are evaluated by a single batched forward on the victim subgraph,
+        and the first successful prefix of the first successful window is returned
+        important note: the success of the attack is not monotone in the number of flipped edges,
+        so the successful window is scanned instead of being bisected
+
+        Parameters
+        ----------
+        sorted_edges: torch.Tensor - the edges to flip, by their order
+        model: EdgeModel
+        targeted: bool
+        attacked_node: torch.Tensor - the victim node
+        y_target: torch.Tensor - the target label of the attack
+
+        Returns
+        -------
+        num_flips: Optional[int] - the length of the minimal successful prefix, None when no prefix succeeds
+    """
+    model.eval()
+    num_edges = sorted_edges.shape[0]
+    victim_subgraph = model.victim_subgraph
+    if victim_subgraph is None:
+        victim_subgraph = extractVictimSubgraph(attacked_nodes=attacked_node, num_hops=model.num_layers,
+                                                edge_index=model.edge_index, num_nodes=model.getInput().shape[0])
+    edge_mask = victim_subgraph.edge_mask
+    edge_weight0 = model.edge_weight.data[edge_mask]
+    flipped_edge_weight0 = (edge_weight0 == 0).type_as(edge_weight0)
+
+    # the rank of each subgraph edge in the flip order (edges outside of the receptive field do not matter)
+    subgraph_positions = torch.cumsum(edge_mask, dim=0) - 1
+    in_subgraph = edge_mask[sorted_edges]
+    flip_rank = torch.full((edge_weight0.shape[0],), num_edges, dtype=torch.long, device=edge_weight0.device)
+    flip_rank[subgraph_positions[sorted_edges[in_subgraph]]] = \
+        torch.arange(num_edges, device=flip_rank.device)[in_subgraph]
+
+    num_scanned, window = 0, 1
+    while num_scanned < num_edges:
+        prefix_lengths = torch.arange(num_scanned + 1, min(num_scanned + window, num_edges) + 1,
+                                      device=flip_rank.device)
+        edge_weights = torch.where(flip_rank.unsqueeze(0) < prefix_lengths.unsqueeze(1), flipped_edge_weight0,
+                                   edge_weight0)
+        logits = batchedVictimLogits(model=model, victim_subgraph=victim_subgraph, edge_weights=edge_weights)
+        for prefix_length, model_res in zip(prefix_lengths.tolist(), logits):
+            if model_res2targets_acc(targeted=targeted, y_targets=y_target, model_res=model_res):
+                return prefix_length
+        num_scanned += prefix_lengths.shape[0]
+        window = min(2 * window, MAX_PREFIX_BATCH)
+    return None
@@ -1,23 +1,85 @@
-from node_attack.attackTrainerGeneric import attackTrainer
-from classes.basic_classes import Print, DatasetType
+from node_attack.attackTrainerHelpers import attackLoss, setRequiresGrad
+from classes.basic_classes import DatasetType
+from dataset_functions.graph_dataset import CSRAdjacency
+from model_functions.victim_subgraph import useVictimSubgraph
 
-import collections
+from typing import Tuple
 import numpy as np
 import torch
-import copy
 
 
-def kBFS(root: torch.Tensor, device: torch.cuda, reversed_arr_list: torch.Tensor, K: int) -> torch.Tensor:
+def multiRootKBFS(roots: np.ndarray, adjacency: CSRAdjacency, K: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
     """
-        a regular BFS algorithm with a k distance stopping rule
+        a frontier-based BFS with a k distance stopping rule, for a batch of roots at once
+        the neighbours of each root are in the same order as a regular (queue-based) BFS would find them
+        important note: the BFS doesnt include the root in its neighbours
+
+        Parameters
+        ----------
+        roots: np.ndarray - the roots of the BFS
+        adjacency: CSRAdjacency - the incoming neighbours of each node
+                                  more information at dataset_functions.graph_dataset.GraphDataset._setAdjacency
+        K: int - the maximal distance
+
+        Returns
+        -------
+        offsets: np.ndarray - the neighbourhood of roots[i] is at offsets[i]:offsets[i + 1]
+        nodes: np.ndarray - the nodes that are in the BFS neighborhoods
+        distances: np.ndarray - the distance of said nodes from their root
+    """
+    roots = np.asarray(roots, dtype=np.int64).reshape(-1)
+    num_roots = roots.shape[0]
+    num_nodes = adjacency.indptr.shape[0] - 1
+
+    # each root owns its frontier, the nodes are visited per owner by keys of owner * num_nodes + node
+    frontier_owners = np.arange(num_roots, dtype=np.int64)
+    frontier = roots
+    visited = np.sort(frontier_owners * num_nodes + frontier)
+    owners, nodes, distances = [], [], []
+    for dist in range(1, K + 1):
+        if not frontier.size:
+            break
+        # the neighbours of the frontier, frontier node after frontier node
+        rows, neighbours, _ = adjacency.neighbours(frontier)
+        neighbour_owners = frontier_owners[rows]
+
+        keys = neighbour_owners * num_nodes + neighbours
+        not_visited = ~np.isin(keys, visited)
+        keys, neighbour_owners, neighbours = keys[not_visited], neighbour_owners[not_visited], neighbours[not_visited]
+
+        # the first discovery of each node, in the order of discovery
+        _, first_discovery = np.unique(keys, return_index=True)
+        first_discovery.sort()
+        frontier_owners, frontier = neighbour_owners[first_discovery], neighbours[first_discovery]
+        visited = np.union1d(visited, keys[first_discovery])
+
+        owners.append(frontier_owners)
+        nodes.append(frontier)
+        distances.append(np.full(frontier.shape[0], dist, dtype=np.int64))
+
+    if not owners:
+        empty = np.zeros(0, dtype=np.int64)
+        return np.zeros(num_roots + 1, dtype=np.int64), empty, empty
+
+    # group by root, the BFS order is kept inside each root
+    owners = np.concatenate(owners)
+    order = np.argsort(owners, kind='stable')
+    offsets = np.zeros(num_roots + 1, dtype=np.int64)
+    np.cumsum(np.bincount(owners, minlength=num_roots), out=offsets[1:])
+    return offsets, np.concatenate(nodes)[order], np.concatenate(distances)[order]
+
+
+def kBFS(root: torch.Tensor, device: torch.cuda, adjacency: CSRAdjacency, K: int) -> torch.Tensor:
+    """
+        a BFS algorithm with a k distance stopping rule
         important note: the BFS doesnt include the root in its neighbours
 
         Parameters
         ----------
         root: torch.Tensor
         device: torch.cuda
-        reversed_arr_list: torch.Tensor - more information at
-                                          dataset_functions.graph_dataset.GraphDataset._setReversedArrayList
+        adjacency: CSRAdjacency - the incoming neighbours of each node
+                                  more information at dataset_functions.graph_dataset.GraphDataset._setAdjacency
         K: int - the maximal distance
 
         Returns
@@ -26,81 +88,67 @@ def kBFS(root: torch.Tensor, device: torch.cuda, reversed_arr_list: torch.Tensor
                                             1st-col - the nodes that are in the victim nodes BFS neighborhood
                                             2nd-col - the distance of said nodes from the victim node
     """
-    neighbours_and_dist = []
-
-    visited, queue = set(), collections.deque()
-    queue.append((root.item(), 0))
-    visited.add(root.item())
+    _, nodes, distances = multiRootKBFS(roots=root.cpu().numpy(), adjacency=adjacency, K=K)
+    return torch.from_numpy(np.stack((nodes, distances), axis=1)).to(device)
 
-    while queue:
-        # Dequeue a vertex from queue
-        vertex, dist = queue.popleft()
 
-        # If not visited, mark it as visited, and
-        # enqueue it
-        if dist < K != 0:
-            for neighbour in reversed_arr_list[vertex]:
-                if neighbour not in visited:
-                    visited.add(neighbour)
-                    queue.append((neighbour, dist + 1))
-                    neighbours_and_dist.append([neighbour, dist + 1])
-    neighbours_and_dist = torch.tensor(neighbours_and_dist).to(device)
-    return neighbours_and_dist
-
-
-def heuristicApproach(reversed_arr_list, neighbours_and_dist, device) -> torch.Tensor:
+def heuristicApproach(node_scores: np.ndarray, neighbours_and_dist, device) -> torch.Tensor:
     """
-        out of all nodes with distance 1 chooses the node with minimal in degree
+        out of all nodes with distance 1 chooses the node with minimal score (the in degree for TOPOLOGY)
         in the case of multiple such nodes, select at random
 
         Parameters
         ----------
-        reversed_arr_list: torch.Tensor - more information at
-                                          dataset_functions.graph_dataset.GraphDataset._setReversedArrayList
+        node_scores: np.ndarray - a structural statistic of all nodes, more information at
+                                  dataset_functions.structure_index.StructureIndex
         neighbours_and_dist: torch.Tensor - 2d-tensor that includes
                                             1st-col - the nodes that are in the victim nodes BFS neighborhood
                                             2nd-col - the distance of said nodes from the victim node
         device: torch.cuda
         Returns
         -------
-        nodes_with_min_in_degree_and_distance_one: torch.Tensor
+        nodes_with_min_score_and_distance_one: torch.Tensor
     """
-    # the in degree of all nodes
-    nodes_in_degree = []
-    for nodes_leading_to_node_index in reversed_arr_list:
-        nodes_in_degree.append(len(nodes_leading_to_node_index))
-    nodes_in_degree = torch.tensor(nodes_in_degree).to(device)
-
     # find nodes with distance = 1
     distance_one_nodes = neighbours_and_dist[neighbours_and_dist[:, 1] == 1, 0]
 
-    # in degree of nodes with distance = 1
-    in_degree_of_distance_one_nodes = nodes_in_degree[distance_one_nodes]
-    nodes_with_min_in_degree_and_distance_one =\
-        distance_one_nodes[in_degree_of_distance_one_nodes == torch.min(in_degree_of_distance_one_nodes)]
+    # the scores of nodes with distance = 1
+    scores_of_distance_one_nodes = torch.from_numpy(node_scores[distance_one_nodes.cpu().numpy()]).to(device)
+    nodes_with_min_score_and_distance_one =\
+        distance_one_nodes[scores_of_distance_one_nodes == torch.min(scores_of_distance_one_nodes)]
 
-    if nodes_with_min_in_degree_and_distance_one.shape[0] == 1:
-        return nodes_with_min_in_degree_and_distance_one
+    if nodes_with_min_score_and_distance_one.shape[0] == 1:
+        return nodes_with_min_score_and_distance_one
 
     # choose one at random
-    random_index = np.random.choice(nodes_with_min_in_degree_and_distance_one.shape[0], 1)
-    return nodes_with_min_in_degree_and_distance_one[random_index]
+    random_index = np.random.choice(nodes_with_min_score_and_distance_one.shape[0], 1)
+    return nodes_with_min_score_and_distance_one[random_index]
+
+
+# the norms by which gradientApproach ranks the candidates
+GRADIENT_NORMS = {'linf': float('inf'), 'l2': 2, 'l1': 1}
 
 
-# our gradient approach: attack node with the WHOLE BFS neighbourhood for 1 epoch
-# choose the node with the maximal gradient
-def gradientApproach(attack, attacked_node: torch.Tensor, y_target: torch.Tensor, node_num: int,
+# our gradient approach: the gradient of the attack for the WHOLE BFS neighbourhood
+# choose the node with the maximal change
+def gradientApproach(attack, attacked_node: torch.Tensor, y_target: torch.Tensor,
                      neighbours_and_dist: torch.Tensor) -> torch.Tensor:
     """
-        attacks node with the WHOLE BFS neighbourhood for 1 epoch
-        chooses the node with the maximal gradient
+        computes the gradient of the attack loss w.r.t. the attributes of the WHOLE BFS neighbourhood
+        with a single backward pass (on the victim subgraph when attack.subgraph is set)
+        and chooses the node whose row is changed the most (in the attack.grad_norm norm)
+        by the first epoch of an attack of the whole neighbourhood (with a tenth of the learning rate)
+        for continuous datasets the epoch is the first adam step from the clean rows,
+        for discrete datasets the rows are zeroed (where the discrete attack starts), the step is taken from them
+        and the attributes with the largest step are flipped up (more information at flipUpBestNewAttributes)
+        the change is measured from the clean rows and the first node (in BFS order) wins a tie
+        the model is changed in place and rolled back by a snapshot, the attack is not copied
 
         Parameters
         ----------
         attack: oneGNNAttack
         attacked_node: torch.Tensor -  the victim node
         y_target: torch.Tensor - the target label of the attack
-        node_num: int - the index of the attacked/victim node (out of the train/val/test-set)
         neighbours_and_dist: torch.Tensor - 2d-tensor that includes
                                             1st-col - the nodes that are in the victim nodes BFS neighborhood
                                             2nd-col - the distance of said nodes from the victim node
@@ -109,25 +157,51 @@ def gradientApproach(attack, attacked_node: torch.Tensor, y_target: torch.Tensor
         -------
         malicious_node: torch.Tensor - the chosen attacker/malicious node
     """
-    device = attack.device
-    gradient_attack = copy.deepcopy(attack)
-    x0 = attack.getDataset().data.x.clone().detach()
+    model = attack.model_wrapper.model
     malicious_nodes = neighbours_and_dist[:, 0]
+    model0 = model.takeSnapshot()
+    if attack.subgraph:
+        useVictimSubgraph(model=model, attacked_nodes=attacked_node)
+
+    malicious_rows = setRequiresGrad(model=model, malicious_nodes=malicious_nodes)[0]['params'][0]
+    rows0 = malicious_rows.detach().clone()
+    if attack.dataset_type is DatasetType.DISCRETE:
+        malicious_rows.data.zero_()
+    model.train()
+    loss = attackLoss(model=model, targeted=attack.targeted, attacked_nodes=attacked_node, y_targets=y_target)
+    gradient, = torch.autograd.grad(loss, malicious_rows)
+
+    model.removeVictimSubgraph()
+    model.restoreSnapshot(model0)
+
+    step = _firstAdamStep(gradient=gradient, lr=attack.lr / 10)
+    if attack.dataset_type is DatasetType.DISCRETE:
+        rows = _flipUpLargestStep(step=step, max_attributes=int(rows0.shape[1] * attack.l_0))
+    else:
+        rows = rows0 + step
+    nodes_norm = torch.norm(rows - rows0, p=GRADIENT_NORMS[attack.grad_norm], dim=1)
+    malicious_nodes_max_norm_idx = torch.tensor([torch.argmax(nodes_norm).item()]).to(attack.device)
+    return malicious_nodes[malicious_nodes_max_norm_idx]
+
+
+def _firstAdamStep(gradient: torch.Tensor, lr: float) -> torch.Tensor:
+    """
+        the first step of the adam optimizer of the attack, which is saturated to about lr * sign(-gradient)
+    """
+    rows = torch.zeros_like(gradient, requires_grad=True)
+    rows.grad = gradient.clone()
+    torch.optim.Adam(params=[rows], lr=lr).step()
+    return rows.detach()
+
 
-    # attack node with the whole bfs clique - for 1 epoch!
-    # gradient_attack.l_0 = 1
-    if attack.dataset_type is DatasetType.CONTINUOUS:
-        gradient_attack.continuous_epochs = 1
-    gradient_attack.lr /= 10
-    gradient_attack.print_answer = Print.NO
-    attackTrainer(attack=gradient_attack, attacked_nodes=attacked_node, y_targets=y_target,
-                  malicious_nodes=malicious_nodes, node_num=node_num, discrete_stop_after_1iter=True)
-    gradient_model = gradient_attack.model_wrapper.model
-    # choose the largest norm-linf attribute
-    nodes_norm_linf, _ = torch.max(torch.abs(gradient_model.getInput() - x0), dim=1)
-    nodes_norm_linf = nodes_norm_linf.to(device)
-        
-    malicious_nodes_max_norm_linf_idx = torch.argmax(nodes_norm_linf[malicious_nodes]).to(device)
-    malicious_nodes_max_norm_linf_idx = torch.tensor([malicious_nodes_max_norm_linf_idx.item()]).to(device)
-
-    return malicious_nodes[malicious_nodes_max_norm_linf_idx]
+@torch.no_grad()
+def _flipUpLargestStep(step: torch.Tensor, max_attributes: int) -> torch.Tensor:
+    """
+        the rows after the first flip of the discrete attack, which starts from zeroed rows:
+        the attributes with the largest positive step are flipped up, the first max_attributes of them
+    """
+    step = torch.clamp(step, min=0)
+    max_step = step.max(dim=1, keepdim=True)[0]
+    is_flipped = torch.logical_and(step == max_step, max_step != 0)
+    is_flipped = torch.logical_and(is_flipped, torch.cumsum(is_flipped.long(), dim=1) <= max_attributes)
+    return is_flipped.type(step.dtype)
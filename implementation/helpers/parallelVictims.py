@@ -0,0 +1,121 @@
+from contextlib import redirect_stdout
+from typing import Any, Callable, List, Tuple
+import io
+import random
+import numpy as np
+import torch
+import torch.multiprocessing as mp
+
+# the state of a worker process, set once by _initWorker
+_worker_attack = None
+_worker_victim_function = None
+
+
+def seedVictim(seed: int, node_num: int):
+    """
+        seeds all the random generators with a stream of the specific victim
+        so that the result of a victim does not depend on the victims which were attacked before it
+
+        Parameters
+        ----------
+        seed: int - the seed of the attack
+        node_num: int - the index of the attacked/victim node (out of the train/val/test-set)
+    """
+    victim_seed = int(np.random.SeedSequence([seed, node_num]).generate_state(1)[0])
+    torch.manual_seed(victim_seed)
+    np.random.seed(victim_seed)
+    random.seed(victim_seed)
+
+
+def getRandomState() -> Tuple:
+    """
+        the state of all the random generators, so that a random stream can be paused and resumed
+
+        Returns
+        -------
+        random_state: Tuple
+    """
+    cuda_state = torch.cuda.get_rng_state_all() if torch.cuda.is_available() else None
+    return random.getstate(), np.random.get_state(), torch.get_rng_state(), cuda_state
+
+
+def setRandomState(random_state: Tuple):
+    """
+        restores the state of all the random generators (see getRandomState)
+
+        Parameters
+        ----------
+        random_state: Tuple
+    """
+    python_state, numpy_state, torch_state, cuda_state = random_state
+    random.setstate(python_state)
+    np.random.set_state(numpy_state)
+    torch.set_rng_state(torch_state)
+    if cuda_state is not None:
+        torch.cuda.set_rng_state_all(cuda_state)
+
+
+def mapVictims(attack, victim_function: Callable[[Any, int], Any], num_attacks: int) -> List:
+    """
+        runs victim_function(attack, node_num) for every victim
+        when attack.workers is set, each victim gets its own random stream and the victims are split
+        between attack.workers processes, the results (and the prints) are merged in the order of the victims
+        so they do not depend on the number of workers
+        important note: victim_function (and the attack) are pickled into the (spawned) worker processes
+
+        Parameters
+        ----------
+        attack: oneGNNAttack
+        victim_function: Callable - a picklable function which attacks a single victim
+        num_attacks: int - the number of victims
+
+        Returns
+        -------
+        results: List - the result of each victim, in order
+    """
+    workers = attack.workers
+    if workers is None:
+        return [victim_function(attack, node_num) for node_num in range(num_attacks)]
+
+    if workers == 1:
+        results = []
+        for node_num in range(num_attacks):
+            seedVictim(seed=attack.seed, node_num=node_num)
+            results.append(victim_function(attack, node_num))
+        return results
+
+    # the parent already initialized the thread pools of torch, which a forked process can not use safely,
+    # so the workers are spawned and each of them rebuilds the attack from its pickle
+    context = mp.get_context('spawn')
+    results = []
+    with context.Pool(processes=workers, initializer=_initWorker, initargs=(attack, victim_function)) as pool:
+        for result, log in pool.imap(_runVictim, range(num_attacks)):
+            print(log, flush=True, end='')
+            results.append(result)
+    return results
+
+
+def _initWorker(attack, victim_function: Callable[[Any, int], Any]):
+    """
+        receives the attack (with its trained model) once per worker process
+        important note: the attack is on the cpu (see oneGNNAttack.checkWorkersFlag)
+    """
+    global _worker_attack, _worker_victim_function
+    torch.set_num_threads(1)
+    _worker_attack = attack
+    _worker_victim_function = victim_function
+
+
+def _runVictim(node_num: int):
+    """
+        attacks a single victim inside a worker process
+
+        Returns
+        -------
+        result: Any - the result of the victim
+        log: str - the prints of the victim
+    """
+    seedVictim(seed=_worker_attack.seed, node_num=node_num)
+    with redirect_stdout(io.StringIO()) as log:
+        result = _worker_victim_function(_worker_attack, node_num)
+    return result, log.getvalue()
@@ -24,10 +24,24 @@ if __name__ == '__main__':
     parser.add_argument("--l_inf", dest="l_inf", type=float, default=None, required=False)
     parser.add_argument("--l_0", dest="l_0", type=float, default=None, required=False)
     parser.add_argument('--targeted', dest="targeted", action='store_true', required=False)
+    parser.add_argument('--subgraph', dest="subgraph", action='store_true', required=False)
+    parser.add_argument('--sparse_features', dest="sparse_features", action='store_true', required=False)
+    parser.add_argument("--grad_norm", dest="grad_norm", default='linf', choices=['linf', 'l2', 'l1'], required=False)
+    parser.add_argument("--flip_k", dest="flip_k", type=int, default=1, required=False)
+    parser.add_argument("--flip_growth", dest="flip_growth", type=float, default=1, required=False)
+    parser.add_argument('--flip_refine', dest="flip_refine", action='store_true', required=False)
+    parser.add_argument('--pgd', dest="pgd", action='store_true', required=False)
+    parser.add_argument('--linf_continuation', dest="linf_continuation", action='store_true', required=False)
+    parser.add_argument("--max_candidate_edges", dest="max_candidate_edges", type=int, default=None, required=False)
+    parser.add_argument("--candidate_ranking", dest="candidate_ranking", default=None, choices=['similarity'],
+                        required=False)
+    parser.add_argument("--adv_batch_size", dest="adv_batch_size", type=int, default=None, required=False)
+    parser.add_argument("--adv_drift", dest="adv_drift", type=float, default=None, required=False)
 
     parser.add_argument("--distance", dest='distance', type=int, required=False)
 
     parser.add_argument("--seed", dest="seed", type=int, default=0, required=False)
+    parser.add_argument("--workers", dest="workers", type=int, default=None, required=False)
 
     parser.add_argument('--gpu', type=int, required=False)
 
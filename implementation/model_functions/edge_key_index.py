@@ -0,0 +1,95 @@
+from typing import Optional, Tuple
+import numpy as np
+
+# the number of sorted segments above which the segments are merged
+MAX_SEGMENTS = 8
+
+
+class EdgeKeySegment(object):
+    """
+        the sorted keys (src * num_nodes + dst) of a block of consecutive edge columns
+
+        Parameters
+        ----------
+        keys: np.ndarray - the keys of the edges, in the order of their columns
+        first_column: int - the column of the first edge of the block
+    """
+    def __init__(self, keys: np.ndarray, first_column: int):
+        order = np.argsort(keys, kind='stable')
+        self.keys = keys[order]
+        self.columns = order + first_column
+
+    def find(self, key: int) -> Optional[int]:
+        position = np.searchsorted(self.keys, key)
+        if position < self.keys.shape[0] and self.keys[position] == key:
+            return int(self.columns[position])
+        return None
+
+
+class EdgeKeyIndex(object):
+    """
+        an immutable index from an edge (src, dst) to its (first) column in the edge index of a model
+        the index is a few sorted segments, so a lookup is O(log E) and an insert does not re-sort the old edges
+        a model keeps the index of its current edges and replaces it whenever edges are added
+        important note: the edge index of a model is only extended, so the columns of the old edges never change
+
+        Parameters
+        ----------
+        num_nodes: int
+        segments: Tuple[EdgeKeySegment, ...] - the segments, in the order of their columns
+        num_edges: int - the number of indexed edges
+    """
+    def __init__(self, num_nodes: int, segments: Tuple[EdgeKeySegment, ...] = (), num_edges: int = 0):
+        self.num_nodes = num_nodes
+        self.segments = segments
+        self.num_edges = num_edges
+
+    def __deepcopy__(self, memo):
+        # the index is immutable, so it is shared between copies of a model
+        return self
+
+    def find(self, src: int, dst: int) -> Optional[int]:
+        """
+            Parameters
+            ----------
+            src: int
+            dst: int
+
+            Returns
+            -------
+            column: Optional[int] - the first column of the edge, None if the edge does not exist
+        """
+        key = src * self.num_nodes + dst
+        for segment in self.segments:
+            column = segment.find(key)
+            if column is not None:
+                return column
+        return None
+
+    def extend(self, src: np.ndarray, dst: np.ndarray) -> 'EdgeKeyIndex':
+        """
+            the index after new edges are appended to the edge index
+
+            Parameters
+            ----------
+            src: np.ndarray - the sources of the new edges
+            dst: np.ndarray - the targets of the new edges
+
+            Returns
+            -------
+            edge_key_index: EdgeKeyIndex
+        """
+        keys = np.asarray(src, dtype=np.int64) * self.num_nodes + np.asarray(dst, dtype=np.int64)
+        if not keys.shape[0]:
+            return self
+        num_edges = self.num_edges + keys.shape[0]
+        segments = self.segments + (EdgeKeySegment(keys=keys, first_column=self.num_edges),)
+        if len(segments) > MAX_SEGMENTS:
+            # merge all but the first segment (the edges of the dataset), keeping the first column of each key
+            keys = np.concatenate([segment.keys for segment in segments[1:]])
+            columns = np.concatenate([segment.columns for segment in segments[1:]])
+            merged = EdgeKeySegment.__new__(EdgeKeySegment)
+            order = np.lexsort((columns, keys))
+            merged.keys, merged.columns = keys[order], columns[order]
+            segments = (segments[0], merged)
+        return EdgeKeyIndex(num_nodes=self.num_nodes, segments=segments, num_edges=num_edges)
@@ -0,0 +1,123 @@
+from model_functions.sparse_features import SparseFeatures
+
+from typing import Optional, Union
+import torch
+
+
+class FeatureProjection(object):
+    """
+        the projection of the raw node attributes into the input space of the model
+        raw features (e.g. Planetoid) are not projected at all,
+        the features of Twitter are projected by the GloVe matrix:
+        the projection of the base attribute matrix is computed once,
+        and only the perturbed rows of the feature store are projected (with their gradient) on each forward
+
+        Parameters
+        ----------
+        matrix: Optional[torch.Tensor] - the projection matrix, None for raw features
+    """
+    def __init__(self, matrix: Optional[torch.Tensor] = None):
+        self.matrix = matrix
+        self._base_key = None
+        self._base_projection = None
+
+    def __deepcopy__(self, memo):
+        # the matrix and the base projection are never changed in place, so they are shared between copies
+        feature_projection = FeatureProjection.__new__(FeatureProjection)
+        memo[id(self)] = feature_projection
+        feature_projection.__dict__.update(self.__dict__)
+        return feature_projection
+
+    def isIdentity(self) -> bool:
+        return self.matrix is None
+
+    def project(self, x: torch.Tensor) -> torch.Tensor:
+        """
+            projects raw attribute rows
+
+            Parameters
+            ----------
+            x: torch.Tensor - raw attribute rows
+
+            Returns
+            -------
+            projected_x: torch.Tensor
+        """
+        if self.matrix is None:
+            return x
+        return torch.matmul(x, self.matrix)
+
+    def baseProjection(self, x: torch.Tensor, base_version: Optional[int] = None) -> torch.Tensor:
+        """
+            the projection of a base attribute matrix, cached per base matrix and base version
+            important note: the base matrix of a feature store is never changed in place,
+            a write replaces it by a new matrix with a new base version (more information at FeatureStore)
+
+            Parameters
+            ----------
+            x: torch.Tensor - the base attribute matrix
+            base_version: Optional[int] - the base version of the feature store of x, None for a constant matrix
+
+            Returns
+            -------
+            projected_x: torch.Tensor
+        """
+        if self.matrix is None:
+            return x
+        if self._base_key is None or self._base_key[0] is not x or self._base_key[1] != base_version:
+            with torch.no_grad():
+                self._base_projection = torch.matmul(x, self.matrix)
+            self._base_key = (x, base_version)
+        return self._base_projection
+
+    def baseProduct(self, x: Union[torch.Tensor, SparseFeatures], weight: torch.Tensor,
+                    nodes: Optional[torch.Tensor] = None, base_version: Optional[int] = None) -> torch.Tensor:
+        """
+            the product of the projected base attribute matrix with the input weight of a layer
+            sparse attribute matrices (which are never projected) are multiplied by a sparse-dense product
+
+            Parameters
+            ----------
+            x: Union[torch.Tensor, SparseFeatures] - the base attribute matrix
+            weight: torch.Tensor
+            nodes: Optional[torch.Tensor] - when given, only the rows of these nodes are multiplied
+            base_version: Optional[int] - the base version of the feature store of x (see baseProjection)
+
+            Returns
+            -------
+            product: torch.Tensor
+        """
+        if isinstance(x, SparseFeatures):
+            return x.matmul(weight, nodes=nodes)
+        projected_x = self.baseProjection(x, base_version=base_version)
+        if nodes is not None:
+            projected_x = projected_x[nodes]
+        return torch.matmul(projected_x, weight)
+
+    def projectInput(self, feature_store, nodes: Optional[torch.Tensor] = None) -> torch.Tensor:
+        """
+            the projected input of a feature store
+
+            Parameters
+            ----------
+            feature_store: FeatureStore
+            nodes: Optional[torch.Tensor] - when given, only the rows of these nodes are returned
+
+            Returns
+            -------
+            projected_x: torch.Tensor
+        """
+        if self.matrix is None:
+            return feature_store.getInput(nodes=nodes)
+
+        perturbed_nodes, perturbed_attributes = feature_store.perturbed_nodes, feature_store.perturbed_attributes
+        projected_x = self.baseProjection(feature_store.x, base_version=feature_store.base_version)
+        if nodes is None:
+            positions = perturbed_nodes
+        else:
+            projected_x = projected_x[nodes]
+            positions, perturbed_indices = feature_store.overlayPositions(nodes)
+            perturbed_attributes = perturbed_attributes[perturbed_indices]
+        if not positions.numel():
+            return projected_x
+        return projected_x.index_copy(0, positions, self.project(perturbed_attributes))
@@ -0,0 +1,273 @@
+from model_functions.sparse_features import SparseFeatures
+
+from typing import Optional, Tuple, Union
+import itertools
+import torch
+import copy
+
+# every new base matrix gets a new base version, so that caches of a base matrix never mix two matrices
+_base_versions = itertools.count()
+
+
+class FeatureStore(object):
+    """
+        the node attributes of a model:
+        an immutable base matrix, which is shared between copies of the model,
+        and a small overlay which holds the rows of the perturbed (malicious) nodes
+        important note: the base matrix is never changed in place, a change of a row adds it to the overlay
+        every change, except for optimizer steps on the trainable rows, increments the version of the store
+        every replacement of the base matrix gives it a new base version, which keys the caches of the base matrix
+        (more information at model_functions.input_products and model_functions.feature_projection)
+        the base matrix is either dense or sparse (more information at model_functions.sparse_features),
+        the overlay is always dense
+
+        Parameters
+        ----------
+        x: Union[torch.Tensor, SparseFeatures] - the node attributes
+    """
+    def __init__(self, x: Union[torch.Tensor, SparseFeatures]):
+        self.x = x if isinstance(x, SparseFeatures) else x.detach()
+        self.perturbed_nodes = torch.zeros(0, dtype=torch.long, device=x.device)
+        self.perturbed_attributes = torch.nn.Parameter(torch.zeros(0, x.shape[1], dtype=x.dtype, device=x.device),
+                                                       requires_grad=False)
+        self.version = 0
+        self.base_version = next(_base_versions)
+
+    def __deepcopy__(self, memo):
+        feature_store = FeatureStore.__new__(FeatureStore)
+        memo[id(self)] = feature_store
+        feature_store.x = self.x
+        feature_store.perturbed_nodes = self.perturbed_nodes.clone()
+        feature_store.perturbed_attributes = copy.deepcopy(self.perturbed_attributes, memo)
+        feature_store.version = self.version
+        feature_store.base_version = self.base_version
+        return feature_store
+
+    @property
+    def num_nodes(self) -> int:
+        return self.x.shape[0]
+
+    @property
+    def is_sparse(self) -> bool:
+        return isinstance(self.x, SparseFeatures)
+
+    def getInput(self, nodes: Optional[torch.Tensor] = None) -> torch.Tensor:
+        """
+            the node attributes, with the perturbed rows written over the base matrix
+
+            Parameters
+            ----------
+            nodes: torch.Tensor - when given, only the rows of these nodes are returned
+
+            Returns
+            -------
+            x: torch.Tensor
+        """
+        if nodes is None:
+            x = self._baseRows()
+            if not self.perturbed_nodes.numel():
+                return x
+            return x.index_copy(0, self.perturbed_nodes, self.perturbed_attributes)
+
+        x = self._baseRows(nodes)
+        positions, perturbed_indices = self.overlayPositions(nodes)
+        if not positions.numel():
+            return x
+        return x.index_copy(0, positions, self.perturbed_attributes[perturbed_indices])
+
+    def overlayPositions(self, nodes: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+            matches the requested nodes with the perturbed rows of the overlay
+
+            Parameters
+            ----------
+            nodes: torch.Tensor
+
+            Returns
+            -------
+            positions: torch.Tensor - the positions (in nodes) of the perturbed nodes
+            perturbed_indices: torch.Tensor - the matching rows of the overlay
+        """
+        is_perturbed = nodes.unsqueeze(1) == self.perturbed_nodes.unsqueeze(0)
+        return is_perturbed.nonzero(as_tuple=True)
+
+    def getNodesAttributes(self, idx_node: torch.Tensor) -> torch.Tensor:
+        """
+            a copy of the attributes of a specific node
+
+            Parameters
+            ----------
+            idx_node: torch.Tensor - the specific node
+
+            Returns
+            -------
+            row: torch.Tensor
+        """
+        position = self._getPosition(idx_node)
+        if position is None:
+            return self._baseRows(torch.tensor([int(idx_node)], device=self.perturbed_nodes.device))[0].clone()
+        return self.perturbed_attributes.data[position].clone()
+
+    def setNodesAttributes(self, idx_node: torch.Tensor, values: torch.Tensor):
+        """
+            sets the attributes of a specific node in the overlay
+
+            Parameters
+            ----------
+            idx_node: torch.Tensor - the specific node
+            values: torch.Tensor
+        """
+        position = self._addToOverlay(idx_node)
+        self.perturbed_attributes.data[position] = values
+        self.version += 1
+
+    def setNodesAttribute(self, idx_node: torch.Tensor, idx_attribute: torch.Tensor, value: float):
+        """
+            sets a value for a specific node's specific attribute in the overlay
+
+            Parameters
+            ----------
+            idx_node: torch.Tensor - the specific node
+            idx_attribute: torch.Tensor - the specific attribute
+            value: float
+        """
+        position = self._addToOverlay(idx_node)
+        self.perturbed_attributes.data[position, idx_attribute] = value
+        self.version += 1
+
+    def setPerturbedNodes(self, nodes: torch.Tensor) -> torch.nn.Parameter:
+        """
+            makes the rows of the requested nodes (and only them) trainable
+            perturbed rows of other nodes are kept, by writing them into a new base matrix
+
+            Parameters
+            ----------
+            nodes: torch.Tensor - the malicious nodes
+
+            Returns
+            -------
+            perturbed_attributes: torch.nn.Parameter - the trainable rows, in the order of nodes
+        """
+        nodes = nodes.view(-1).to(self.perturbed_nodes.device)
+        attributes = self.getInput(nodes=nodes).detach().clone()
+        is_kept = (self.perturbed_nodes.unsqueeze(1) == nodes.unsqueeze(0)).any(dim=1)
+        if not is_kept.all():
+            self._writeBase(self.perturbed_nodes[~is_kept], self.perturbed_attributes.data[~is_kept])
+
+        self.perturbed_nodes = nodes.clone()
+        self.perturbed_attributes = torch.nn.Parameter(attributes, requires_grad=True)
+        self.version += 1
+        return self.perturbed_attributes
+
+    def restore(self, feature_store):
+        """
+            rolls the attributes back, in place, to those of another (copied) feature store
+            the trainable overlay is kept as the same Parameter whenever its nodes are unchanged
+
+            Parameters
+            ----------
+            feature_store: FeatureStore
+        """
+        self.x = feature_store.x
+        self.base_version = feature_store.base_version
+        if torch.equal(self.perturbed_nodes, feature_store.perturbed_nodes):
+            self.perturbed_attributes.data.copy_(feature_store.perturbed_attributes.data)
+        else:
+            self.perturbed_nodes = feature_store.perturbed_nodes.clone()
+            self.perturbed_attributes = \
+                torch.nn.Parameter(feature_store.perturbed_attributes.data.clone(),
+                                   requires_grad=feature_store.perturbed_attributes.requires_grad)
+        self.version += 1
+
+    def isZeroGrad(self) -> bool:
+        """
+            whether or not the gradient of the perturbed rows is zero
+
+            Returns
+            -------
+            is_zero_grad: bool
+        """
+        grad = self.perturbed_attributes.grad
+        return grad is None or grad.abs().sum().item() == 0
+
+    def addNode(self, values: torch.Tensor):
+        """
+            adds a node (a new last row) to the base matrix
+
+            Parameters
+            ----------
+            values: torch.Tensor - 2d-tensor of the attributes of the new node
+        """
+        if self.is_sparse:
+            self._setBase(self.x.cat(values))
+        else:
+            self._setBase(torch.cat((self.x, values.detach()), dim=0))
+        self.version += 1
+
+    def removeLastNode(self):
+        """
+            removes the last node from the base matrix and from the overlay
+        """
+        last_node = self.num_nodes - 1
+        self._setBase(self.x.narrow(last_node) if self.is_sparse else self.x[:-1])
+        kept = self.perturbed_nodes != last_node
+        if not kept.all():
+            self.perturbed_nodes = self.perturbed_nodes[kept]
+            self.perturbed_attributes = torch.nn.Parameter(self.perturbed_attributes.data[kept],
+                                                           requires_grad=self.perturbed_attributes.requires_grad)
+        self.version += 1
+
+    def _getPosition(self, idx_node: torch.Tensor) -> Optional[int]:
+        """
+            the position of a node in the overlay, None if the node is not perturbed
+        """
+        position = (self.perturbed_nodes == int(idx_node)).nonzero(as_tuple=True)[0]
+        if not position.numel():
+            return None
+        return position[0].item()
+
+    def _addToOverlay(self, idx_node: torch.Tensor) -> int:
+        """
+            adds the row of a node to the overlay (if it is not already there)
+
+            Returns
+            -------
+            position: int - the position of the node in the overlay
+        """
+        position = self._getPosition(idx_node)
+        if position is not None:
+            return position
+
+        idx_node = int(idx_node)
+        self.perturbed_nodes = torch.cat((self.perturbed_nodes,
+                                          torch.tensor([idx_node], device=self.perturbed_nodes.device)))
+        base_row = self._baseRows(torch.tensor([idx_node], device=self.perturbed_nodes.device))
+        self.perturbed_attributes = torch.nn.Parameter(torch.cat((self.perturbed_attributes.data, base_row)),
+                                                       requires_grad=self.perturbed_attributes.requires_grad)
+        return self.perturbed_nodes.shape[0] - 1
+
+    def _baseRows(self, nodes: Optional[torch.Tensor] = None) -> torch.Tensor:
+        """
+            the dense rows of the base matrix
+        """
+        if self.is_sparse:
+            return self.x.toDense(nodes=nodes)
+        if nodes is None:
+            return self.x
+        return self.x[nodes]
+
+    def _writeBase(self, nodes: torch.Tensor, rows: torch.Tensor):
+        """
+            replaces rows of the base matrix by a new base matrix
+        """
+        if self.is_sparse:
+            self._setBase(self.x.indexCopy(nodes, rows))
+        else:
+            self._setBase(self.x.index_copy(0, nodes, rows))
+
+    def _setBase(self, x: Union[torch.Tensor, SparseFeatures]):
+        """
+            replaces the base matrix, with a new base version
+        """
+        self.x = x
+        self.base_version = next(_base_versions)
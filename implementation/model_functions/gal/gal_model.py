@@ -8,9 +8,12 @@ Copyright (C) 2021
 import torch
 from torch_geometric.nn import GCNConv
 import torch.nn.functional as F
-from functools import reduce
 from torch_geometric.utils import train_test_split_edges
 from torch_geometric.nn import GCNConv, ChebConv, GINConv, GATConv
+from model_functions.victim_subgraph import extractVictimSubgraph
+from model_functions.feature_store import FeatureStore
+from model_functions.feature_projection import FeatureProjection
+from model_functions.model_snapshot import ModelSnapshot
 torch.autograd.set_detect_anomaly(True)
 
 class GradReverse(torch.autograd.Function):
@@ -78,46 +81,77 @@ class GalModel(torch.nn.Module):
         self.data = data
 
         if hasattr(dataset, 'glove_matrix'):
-            self.glove_matrix = dataset.glove_matrix.to(device)
+            self.feature_projection = FeatureProjection(dataset.glove_matrix.to(device))
         else:
-            self.glove_matrix = torch.eye(data.x.shape[1]).to(device)
+            self.feature_projection = FeatureProjection()
 
         self.name = 'GAL'
         self.device = device
         self.edge_index = data.edge_index.to(device)
         # self.edge_weight = data.edge_attr.to(device)
+        self.victim_subgraph = None
 
-        node_attribute_list = []
-        for idx in range(data.x.shape[0]):
-            node_attribute_list += [torch.nn.Parameter(data.x[idx].unsqueeze(0), requires_grad=False).to(device)]
-        self.node_attribute_list = node_attribute_list
+        self.feature_store = FeatureStore(data.x.to(device))
         # end of changes XXXXX
 
         self.labels = data.y.to(self.device)
 
     # start of changes XXXXX
     def is_zero_grad(self) -> bool:
-        nodes_with_gradient = filter(lambda node: node.grad is not None, self.node_attribute_list)
-        abs_gradients = map(lambda node: node.grad.abs().sum().item(), nodes_with_gradient)
-        if reduce(lambda x, y: x + y, abs_gradients) == 0:
-            return True
-        else:
-            return False
+        return self.feature_store.isZeroGrad()
+
+    def setVictimSubgraph(self, attacked_nodes):
+        num_hops = len(self.layers) + 1 if self.conv3 is None else len(self.layers) + 2
+        self.victim_subgraph = extractVictimSubgraph(attacked_nodes=attacked_nodes, num_hops=num_hops,
+                                                     edge_index=self.edge_index,
+                                                     num_nodes=self.feature_store.num_nodes)
+
+    def removeVictimSubgraph(self):
+        self.victim_subgraph = None
+
+    @property
+    def victim_subgraph(self):
+        return self._victim_subgraph
+
+    @victim_subgraph.setter
+    def victim_subgraph(self, victim_subgraph):
+        # every switch between the subgraph and the full graph (including the temporary ones of
+        # model_functions.victim_subgraph) changes the graph, so the cached normalization is reset
+        self._victim_subgraph = victim_subgraph
+        self._resetCachedNormalization()
+
+    def _resetCachedNormalization(self):
+        # attr and attk cache the normalized adjacency of the graph they were last called with
+        for conv in [self.attr, self.attk]:
+            conv._cached_edge_index = None
+            conv._cached_adj_t = None
+
+    def takeSnapshot(self):
+        return ModelSnapshot(self)
+
+    def restoreSnapshot(self, snapshot):
+        snapshot.restore(self)
 
     def forward(self, pos_edge_index=None, neg_edge_index=None, input=None):
         # start of changes XXXXX
-        if input is None:
-            input = self.getInput().to(self.device)
-        x = torch.matmul(input, self.glove_matrix).to(self.device)
+        edge_index = self.edge_index
+        if input is not None:
+            x = self.feature_projection.project(input).to(self.device)
+        elif self.victim_subgraph is None or pos_edge_index is not None or neg_edge_index is not None:
+            x = self.feature_projection.projectInput(self.feature_store).to(self.device)
+        else:
+            x = self.feature_projection.projectInput(self.feature_store,
+                                                     nodes=self.victim_subgraph.subset).to(self.device)
+            edge_index = self.victim_subgraph.edge_index
         # end of changes XXXXX
 
-        x = F.relu(self.conv1(x, self.edge_index))
-        x = self.conv2(x, self.edge_index)
+        x = F.relu(self.conv1(x, edge_index))
+        x = self.conv2(x, edge_index)
         if self.conv3 is not None:
-            x = self.conv3(x, self.edge_index)
+            x = self.conv3(x, edge_index)
 
         feat = x
-        attr = self.attr(x, self.edge_index)
+        attr = self.attr(x, edge_index)
 
         if pos_edge_index is None and neg_edge_index is None:
             return F.log_softmax(attr, dim=1)
@@ -133,12 +167,15 @@ class GalModel(torch.nn.Module):
 
             return res, F.log_softmax(attr, dim=1), att, feat        
 
-    def getInput(self):
-        return torch.cat(self.node_attribute_list, dim=0)
+    def getInput(self, nodes=None):
+        return self.feature_store.getInput(nodes=nodes)
+
+    def getNodesAttributes(self, idx_node):
+        return self.feature_store.getNodesAttributes(idx_node)
 
     def setNodesAttribute(self, idx_node, idx_attribute, value):
-        self.node_attribute_list[idx_node][0][idx_attribute] = value
+        self.feature_store.setNodesAttribute(idx_node, idx_attribute, value)
 
     def setNodesAttributes(self, idx_node, values):
-        self.node_attribute_list[idx_node][0] = values
+        self.feature_store.setNodesAttributes(idx_node, values)
     # end of changes XXXXX
@@ -9,8 +9,14 @@ from helpers.getGitPath import getGitPath
 from classes.basic_classes import DatasetType
 from dataset_functions.graph_dataset import GraphDataset
 from classes.approach_classes import Approach
-
-from typing import Tuple
+from model_functions.victim_subgraph import extractVictimSubgraph
+from model_functions.feature_store import FeatureStore
+from model_functions.model_snapshot import ModelSnapshot
+from model_functions.input_products import InputProductCache, usesInputProducts
+from model_functions.feature_projection import FeatureProjection
+from model_functions.edge_key_index import EdgeKeyIndex
+
+from typing import Optional, Tuple
 import os.path as osp
 import torch
 from torch import nn
@@ -19,6 +25,10 @@ import copy
 import numpy as np
 
 
+# the maximal number of (clique node, graph node) pairs which a global approach checks at once
+CANDIDATE_CHUNK_SIZE = 2 ** 24
+
+
 class Model(torch.nn.Module):
     """
         Generic model class
@@ -38,9 +48,9 @@ class Model(torch.nn.Module):
         data = dataset.data
 
         if hasattr(dataset, 'glove_matrix'):
-            self.glove_matrix = dataset.glove_matrix.to(device)
+            self.feature_projection = FeatureProjection(dataset.glove_matrix.to(device))
         else:
-            self.glove_matrix = torch.eye(data.x.shape[1]).to(device)
+            self.feature_projection = FeatureProjection()
 
         num_initial_features = dataset.num_features
         num_final_features = dataset.num_classes
@@ -60,30 +70,107 @@ class Model(torch.nn.Module):
         self.device = device
         self.edge_index = data.edge_index.to(device)
         self.edge_weight = None
+        self.victim_subgraph = None
 
     def forward(self, x=None):
-        if x is None:
-            x = self.getInput().to(self.device)
-
-        x = torch.matmul(x, self.glove_matrix).to(self.device)
-        for layer in self.layers[:-1]:
-            x = F.relu(layer(x=x, edge_index=self.edge_index, edge_weight=self.edge_weight).to(self.device))\
-                .to(self.device)
-            x = F.dropout(x, training=self.training and not self.attack).to(self.device)
+        edge_index, edge_weight = self.edge_index, self.edge_weight
+        nodes = None
+        if x is None and self.victim_subgraph is not None:
+            nodes = self.victim_subgraph.subset
+            edge_index = self.victim_subgraph.edge_index
+            if edge_weight is not None:
+                edge_weight = edge_weight[self.victim_subgraph.edge_mask]
+
+        # the product of the first layer with the input is cached during attacks and sparse for sparse attributes
+        input_product = None
+        if usesInputProducts(model=self, layer=self.layers[0], x=x):
+            input_product = self.input_products.getProduct(layer=self.layers[0], feature_store=self.feature_store,
+                                                           feature_projection=self.feature_projection, nodes=nodes)
+        elif x is None:
+            x = self.getProjectedInput(nodes=nodes).to(self.device)
+        else:
+            x = self.feature_projection.project(x).to(self.device)
 
-        x = self.layers[-1](x=x, edge_index=self.edge_index, edge_weight=self.edge_weight).to(self.device)
+        for layer_idx, layer in enumerate(self.layers):
+            if layer_idx == 0 and input_product is not None:
+                x = layer.propagateProduct(x=input_product, edge_index=edge_index, edge_weight=edge_weight)
+            else:
+                x = layer(x=x, edge_index=edge_index, edge_weight=edge_weight)
+            x = x.to(self.device)
+            if layer_idx != len(self.layers) - 1:
+                x = F.relu(x).to(self.device)
+                x = F.dropout(x, training=self.training and not self.attack).to(self.device)
         return F.log_softmax(x, dim=1).to(self.device)
 
-    def getInput(self) -> torch.Tensor:
+    def setVictimSubgraph(self, attacked_nodes: torch.Tensor):
+        """
+            restricts the forward pass to the receptive field of the victim nodes
+            more information at model_functions.victim_subgraph
+
+            Parameters
+            ----------
+            attacked_nodes: torch.Tensor - the victim nodes
+        """
+        self.victim_subgraph = extractVictimSubgraph(attacked_nodes=attacked_nodes, num_hops=self.num_layers,
+                                                     edge_index=self.edge_index,
+                                                     num_nodes=self.getInput().shape[0])
+
+    def removeVictimSubgraph(self):
+        """
+            returns the forward pass to the whole graph
+        """
+        self.victim_subgraph = None
+
+    def takeSnapshot(self) -> ModelSnapshot:
+        """
+            takes a copy-on-write snapshot of the model
+            more information at model_functions.model_snapshot
+
+            Returns
+            -------
+            snapshot: ModelSnapshot
+        """
+        return ModelSnapshot(self)
+
+    def restoreSnapshot(self, snapshot: ModelSnapshot):
+        """
+            rolls the model back, in place, to a snapshot
+
+            Parameters
+            ----------
+            snapshot: ModelSnapshot
+        """
+        snapshot.restore(self)
+
+    def getInput(self, nodes: torch.Tensor = None) -> torch.Tensor:
         """
             a get function for the models input
 
+            Parameters
+            ----------
+            nodes: torch.Tensor - when given, only the input rows of these nodes are returned
+
             Returns
             ----------
             model_input: torch.Tensor
         """
         raise NotImplementedError
 
+    def getProjectedInput(self, nodes: torch.Tensor = None) -> torch.Tensor:
+        """
+            a get function for the models input, projected into the input space of the first layer
+            more information at model_functions.feature_projection
+
+            Parameters
+            ----------
+            nodes: torch.Tensor - when given, only the input rows of these nodes are returned
+
+            Returns
+            ----------
+            projected_input: torch.Tensor
+        """
+        raise NotImplementedError
+
     def injectNode(self, dataset: GraphDataset, attacked_node: torch.Tensor) -> torch.Tensor:
         """
             injects a node to the model
@@ -118,18 +205,32 @@ class NodeModel(Model):
     """
     def __init__(self, gnn_type: GNN_TYPE, num_layers: int, dataset: GraphDataset, device: torch.cuda):
         super(NodeModel, self).__init__(gnn_type, num_layers, dataset, device)
-        data = dataset.data
-        node_attribute_list = []
-        for idx in range(data.x.shape[0]):
-            node_attribute_list += [torch.nn.Parameter(data.x[idx].unsqueeze(0), requires_grad=False).to(device)]
-        self.node_attribute_list = node_attribute_list
+        self.feature_store = FeatureStore(dataset.getFeatures().to(device))
+        self.input_products = InputProductCache()
+
+    def getInput(self, nodes: torch.Tensor = None) -> torch.Tensor:
+        return self.feature_store.getInput(nodes=nodes)
 
-    def getInput(self) -> torch.Tensor:
-        return torch.cat(self.node_attribute_list, dim=0)
+    def getProjectedInput(self, nodes: torch.Tensor = None) -> torch.Tensor:
+        return self.feature_projection.projectInput(self.feature_store, nodes=nodes)
+
+    def getNodesAttributes(self, idx_node: torch.Tensor) -> torch.Tensor:
+        """
+            a get function for a copy of the attributes of a specific node
+
+            Parameters
+            ----------
+            idx_node: torch.Tensor - the specific node
+
+            Returns
+            -------
+            values: torch.Tensor
+        """
+        return self.feature_store.getNodesAttributes(idx_node)
 
     def setNodesAttribute(self, idx_node: torch.Tensor, idx_attribute: torch.Tensor, value: float):
         """
-            sets a value for a specific node's specific attribute in the node_attribute_list
+            sets a value for a specific node's specific attribute in the feature store
 
             Parameters
             ----------
@@ -137,18 +238,18 @@ class NodeModel(Model):
             idx_attribute: torch.Tensor - the specific attribute
             value: float
         """
-        self.node_attribute_list[idx_node][0][idx_attribute] = value
+        self.feature_store.setNodesAttribute(idx_node, idx_attribute, value)
 
     def setNodesAttributes(self, idx_node: torch.Tensor, values: torch.Tensor):
         """
-            sets the attributes for a specific node in the node_attribute_list
+            sets the attributes for a specific node in the feature store
 
             Parameters
             ----------
             idx_node: torch.Tensor - the specific node
             values: torch.Tensor
         """
-        self.node_attribute_list[idx_node][0] = values
+        self.feature_store.setNodesAttributes(idx_node, values)
 
     def injectNode(self, dataset: GraphDataset, attacked_node: torch.Tensor) -> torch.Tensor:
         """
@@ -166,34 +267,28 @@ class NodeModel(Model):
         injected_edge = torch.tensor([[malicious_node.item()], [attacked_node.item()]]).to(self.device)
 
         # injecting to the model
-        self.node_attribute_list += [torch.nn.Parameter(injected_attributes, requires_grad=False).to(self.device)]
+        self.feature_store.addNode(injected_attributes)
         self.edge_index = torch.cat((self.edge_index, injected_edge), dim=1).type(torch.LongTensor).to(self.device)
 
-        # injecting to the data
+        # injecting to the data, rolled back by removeInjectedNode
         false_tensor = torch.tensor([False]).to(self.device)
-        data.train_mask = torch.cat((data.train_mask, false_tensor), dim=0)
-        data.val_mask = torch.cat((data.val_mask, false_tensor), dim=0)
-        data.test_mask = torch.cat((data.test_mask, false_tensor), dim=0)
-        data.y = torch.cat((data.y, torch.tensor([0]).to(self.device)), dim=0)
+        dataset.beginTransaction()
+        dataset.updateData(train_mask=torch.cat((data.train_mask, false_tensor), dim=0),
+                           val_mask=torch.cat((data.val_mask, false_tensor), dim=0),
+                           test_mask=torch.cat((data.test_mask, false_tensor), dim=0),
+                           y=torch.cat((data.y, torch.tensor([0]).to(self.device)), dim=0))
         return malicious_node, dataset
 
     def removeInjectedNode(self, attack):
         """
             information at the generic base class Model
         """
-        dataset = attack.getDataset()
-        data = dataset.data
-
         # removing injection from the model
-        self.node_attribute_list.pop()
+        self.feature_store.removeLastNode()
         self.edge_index = self.edge_index[:, :-1]
 
         # removing injection from the data
-        data.train_mask = data.train_mask[:-1]
-        data.val_mask = data.val_mask[:-1]
-        data.test_mask = data.test_mask[:-1]
-        data.y = data.y[:-1]
-        attack.setDataset(dataset=dataset)
+        attack.getDataset().rollbackTransaction()
 
     def is_zero_grad(self) -> bool:
         return False
@@ -209,16 +304,59 @@ class EdgeModel(Model):
         data = dataset.data
         self.x = data.x.to(device)
         self.edge_weight = torch.nn.Parameter(torch.ones(data.edge_index.shape[1]), requires_grad=False).to(device)
+        self.edge_keys = EdgeKeyIndex(num_nodes=data.num_nodes).extend(*data.edge_index.cpu().numpy())
 
-    def getInput(self) -> torch.Tensor:
+    def getInput(self, nodes: torch.Tensor = None) -> torch.Tensor:
         """
             information at the generic base class Model
         """
-        return self.x
+        if nodes is None:
+            return self.x
+        return self.x[nodes]
+
+    def getProjectedInput(self, nodes: torch.Tensor = None) -> torch.Tensor:
+        """
+            information at the generic base class Model
+        """
+        projected_x = self.feature_projection.baseProjection(self.x)
+        if nodes is None:
+            return projected_x
+        return projected_x[nodes]
+
+    def findEdge(self, src: int, dst: int) -> Optional[int]:
+        """
+            finds an edge of the model by its edge key index
+            more information at model_functions.edge_key_index
+
+            Parameters
+            ----------
+            src: int
+            dst: int
+
+            Returns
+            -------
+            column: Optional[int] - the (first) column of the edge in edge_index, None if the edge does not exist
+        """
+        return self.edge_keys.find(src, dst)
+
+    @torch.no_grad()
+    def addEdges(self, edge_index: torch.Tensor, edge_weight: torch.Tensor):
+        """
+            appends edges to the model and to its edge key index
+
+            Parameters
+            ----------
+            edge_index: torch.Tensor - the new edges
+            edge_weight: torch.Tensor - the weights of the new edges
+        """
+        self.edge_index = torch.cat((self.edge_index, edge_index.to(self.device)), dim=1)
+        self.edge_weight.data = torch.cat((self.edge_weight.data, edge_weight.to(self.device)))
+        self.edge_keys = self.edge_keys.extend(*edge_index.cpu().numpy())
 
     @torch.no_grad()
     def expandEdgesByMalicious(self, dataset: GraphDataset, approach: Approach, attacked_node: torch.Tensor,
-                               neighbours: torch.Tensor, device: torch.cuda) -> torch.Tensor:
+                               neighbours: torch.Tensor, device: torch.cuda, max_candidates: Optional[int] = None,
+                               candidate_ranking: Optional[str] = None) -> torch.Tensor:
         """
             adds edges with zero weights to the malicious/attacker node according to the attack approach
 
@@ -231,46 +369,81 @@ class EdgeModel(Model):
                                        1st-col - the nodes that are in the victim nodes BFS neighborhood
                                        2nd-col - the distance of said nodes from the victim node
             device: torch.cuda
+            max_candidates: Optional[int] - the maximal number of edges added by a global approach, None for no limit
+            candidate_ranking: Optional[str] - which edges a global approach keeps when max_candidates is exceeded
+                                               None - the first edges, 'similarity' - the edges with the most
+                                               similar (cosine) attributes on both ends
 
             Returns
             ----------
             malicious_index: torch.Tensor - the injected/attacker/malicious node index
         """
         data = dataset.data
-        clique = torch.cat((attacked_node, neighbours))
-        n = data.num_nodes
-        zero_dim_edge_index = []
-        first_dim_edge_index = []
+        clique = torch.cat((attacked_node, neighbours)).cpu().numpy()
         malicious_index = None
 
-        flag_global_approach = approach.isGlobal()
-        if not approach.isGlobal():
+        if approach.isGlobal():
+            # adds all edges from the whole graph to the neighbourhood
+            zero_dim_edge_index, first_dim_edge_index = \
+                self._globalCandidateEdges(dataset=dataset, clique=clique, max_candidates=max_candidates,
+                                           candidate_ranking=candidate_ranking)
+        else:
+            # adds all edges from malicious index to the neighbourhood
             malicious_index = np.random.choice(data.num_nodes, 1).item()
-
-        for neighbour_num, neighbour in enumerate(clique):
-            ignore = dataset.reversed_arr_list[neighbour]  # edges which already exist
-
-            tmp_zero_dim_edge_index = []
-            if flag_global_approach:
-                # adds all edges from the whole graph to the neighbourhood
-                tmp_zero_dim_edge_index = [idx for idx in range(n) if idx not in ignore]
-            else:
-                # adds all edges from malicious index to the neighbourhood
-                if malicious_index not in ignore:
-                    tmp_zero_dim_edge_index = [malicious_index]
-
-            zero_dim_edge_index += tmp_zero_dim_edge_index
-            first_dim_edge_index += [neighbour.item()] * len(tmp_zero_dim_edge_index)
-
-        if zero_dim_edge_index:
-            model_edge_index = torch.tensor([zero_dim_edge_index, first_dim_edge_index]).to(device)
+            rows, existing, _ = dataset.in_adjacency.neighbours(clique)  # edges which already exist
+            is_missing = np.ones(clique.shape[0], dtype=bool)
+            is_missing[rows[existing == malicious_index]] = False
+            first_dim_edge_index = clique[is_missing]
+            zero_dim_edge_index = np.full(first_dim_edge_index.shape[0], malicious_index, dtype=np.int64)
+
+        if zero_dim_edge_index.shape[0]:
+            model_edge_index = torch.from_numpy(np.stack((zero_dim_edge_index, first_dim_edge_index))).to(device)
             model_edge_weight = torch.zeros(len(zero_dim_edge_index)).to(device)
-
-            self.edge_index = torch.cat((self.edge_index, model_edge_index), dim=1)
-            self.edge_weight.data = torch.cat((self.edge_weight.data, model_edge_weight))
+            self.addEdges(edge_index=model_edge_index, edge_weight=model_edge_weight)
 
         return malicious_index
 
+    def _globalCandidateEdges(self, dataset: GraphDataset, clique: np.ndarray, max_candidates: Optional[int],
+                              candidate_ranking: Optional[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+            all the edges from the whole graph to the clique which do not exist yet, clique node after clique node
+            the set difference is computed over chunks of the clique, so that the memory is bounded by
+            CANDIDATE_CHUNK_SIZE, and at most max_candidates edges are kept (ranked by candidate_ranking)
+
+            Returns
+            -------
+            edges_from: np.ndarray - the sources of the candidate edges
+            edges_to: np.ndarray - the clique nodes of the candidate edges
+        """
+        n = dataset.data.num_nodes
+        chunk_rows = max(1, CANDIDATE_CHUNK_SIZE // n)
+        if candidate_ranking == 'similarity':
+            x = self.feature_projection.baseProjection(self.x)
+            x = x / torch.clamp(torch.norm(x, dim=1, keepdim=True), min=1e-12)
+
+        edges_from, edges_to, scores = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0)
+        for chunk_start in range(0, clique.shape[0], chunk_rows):
+            chunk = clique[chunk_start:chunk_start + chunk_rows]
+            rows, existing, _ = dataset.in_adjacency.neighbours(chunk)  # edges which already exist
+            is_missing = np.ones((chunk.shape[0], n), dtype=bool)
+            is_missing[rows, existing] = False
+            missing_rows, chunk_edges_from = np.nonzero(is_missing)
+            edges_from = np.concatenate((edges_from, chunk_edges_from))
+            edges_to = np.concatenate((edges_to, chunk[missing_rows]))
+
+            if candidate_ranking == 'similarity':
+                similarity = torch.matmul(x[torch.from_numpy(chunk).to(self.device)], x.T).cpu().numpy()
+                scores = np.concatenate((scores, similarity[missing_rows, chunk_edges_from]))
+
+            if max_candidates is not None and edges_from.shape[0] > max_candidates:
+                if candidate_ranking is None:
+                    # the first candidates, no later chunk can replace them
+                    return edges_from[:max_candidates], edges_to[:max_candidates]
+                # the best candidates so far, in their original order
+                kept = np.sort(np.argsort(-scores, kind='stable')[:max_candidates])
+                edges_from, edges_to, scores = edges_from[kept], edges_to[kept], scores[kept]
+        return edges_from, edges_to
+
 
 class ModelWrapper(object):
     """
@@ -405,7 +578,8 @@ class ModelWrapper(object):
             elif dataset.type is DatasetType.CONTINUOUS:
                 exit(" According to the ROBUST GCN paper, this gnn works only for discrete datasets")
         elif self.gnn_type == GNN_TYPE.GAL:  # RGG
-            return galTrainer(self.model, data)
+            # the edge split of GAL replaces fields of the data, which is shared and read-only
+            return galTrainer(self.model, copy.copy(data))
         elif self.gnn_type == GNN_TYPE.LAT_GCN:  # RGG
             return latgcnTrainer(self.model, self.optimizer, data, self.patience)
 
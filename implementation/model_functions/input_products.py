@@ -0,0 +1,107 @@
+from typing import Optional
+import torch
+
+
+class InputProductCache(object):
+    """
+        caches the input-side product of the first layer of a model: projected x @ W
+        the product of the base attribute matrix is computed once (per base version and layer weights),
+        and only the perturbed rows of the feature store are multiplied again, with their gradient
+        the product is cached only when the first layer is not trained, as the cached product has no gradient
+        (a trained first layer over sparse attributes recomputes the sparse-dense product on each forward)
+    """
+    def __init__(self):
+        self._key = None
+        self._base_product = None
+
+    def __deepcopy__(self, memo):
+        input_product_cache = InputProductCache.__new__(InputProductCache)
+        memo[id(self)] = input_product_cache
+        input_product_cache._key = None
+        input_product_cache._base_product = None
+        return input_product_cache
+
+    def getProduct(self, layer, feature_store, feature_projection, nodes: Optional[torch.Tensor] = None)\
+            -> torch.Tensor:
+        """
+            the input-side product of the first layer
+
+            Parameters
+            ----------
+            layer: torch.nn.Module - the first layer, with an inputWeight function
+            feature_store: FeatureStore
+            feature_projection: FeatureProjection
+            nodes: Optional[torch.Tensor] - when given, only the rows of these nodes are returned
+
+            Returns
+            -------
+            product: torch.Tensor
+        """
+        weight = layer.inputWeight()
+        if _isFrozen(layer):
+            key = [(feature_store.x, feature_store.base_version)] + \
+                  [(param, param._version) for param in layer.parameters()]
+            if not self._isSameKey(key):
+                with torch.no_grad():
+                    self._base_product = feature_projection.baseProduct(feature_store.x, weight,
+                                                                        base_version=feature_store.base_version)
+                self._key = key
+            product = self._base_product if nodes is None else self._base_product[nodes]
+        else:
+            product = feature_projection.baseProduct(feature_store.x, weight, nodes=nodes,
+                                                     base_version=feature_store.base_version)
+
+        perturbed_nodes, perturbed_attributes = feature_store.perturbed_nodes, feature_store.perturbed_attributes
+        if nodes is None:
+            positions = perturbed_nodes
+        else:
+            positions, perturbed_indices = feature_store.overlayPositions(nodes)
+            perturbed_attributes = perturbed_attributes[perturbed_indices]
+        if not positions.numel():
+            return product
+
+        perturbed_product = torch.matmul(feature_projection.project(perturbed_attributes), weight)
+        return product.index_copy(0, positions, perturbed_product)
+
+    def _isSameKey(self, key) -> bool:
+        """
+            compares the key of the cached product by the identity and the version counter of its tensors
+            (the version of the base matrix is the base version of its feature store)
+        """
+        if self._key is None or len(self._key) != len(key):
+            return False
+        return all(tensor is cached_tensor and version == cached_version
+                   for (tensor, version), (cached_tensor, cached_version) in zip(key, self._key))
+
+
+def usesInputProducts(model, layer, x: Optional[torch.Tensor]) -> bool:
+    """
+        whether or not the forward pass can use the input products of the first layer:
+        the input is the feature store and either the attributes are sparse,
+        or this is an attack and the first layer does not need a gradient
+
+        Parameters
+        ----------
+        model: Model
+        layer: torch.nn.Module - the first layer
+        x: Optional[torch.Tensor] - the explicit input of the forward pass
+
+        Returns
+        -------
+        uses_input_products: bool
+    """
+    feature_store = getattr(model, 'feature_store', None)
+    if x is not None or feature_store is None or not hasattr(layer, 'inputWeight'):
+        return False
+    if feature_store.is_sparse:
+        return True
+    return getattr(model, 'attack', False) and _isFrozen(layer)
+
+
+def _isFrozen(layer) -> bool:
+    """
+        whether or not the first layer does not need a gradient
+    """
+    if not torch.is_grad_enabled():
+        return True
+    return not any(param.requires_grad for param in layer.parameters())
@@ -4,7 +4,10 @@ from torch_geometric.nn import GCNConv
 import torch.nn.functional as F
 from torch.nn import Dropout
 
-from functools import reduce
+from model_functions.victim_subgraph import extractVictimSubgraph
+from model_functions.feature_store import FeatureStore
+from model_functions.feature_projection import FeatureProjection
+from model_functions.model_snapshot import ModelSnapshot
 
 
 class LATGCNModel(torch.nn.Module):
@@ -34,29 +37,36 @@ class LATGCNModel(torch.nn.Module):
         self.data = data
 
         if hasattr(dataset, 'glove_matrix'):
-            self.glove_matrix = dataset.glove_matrix.to(device)
+            self.feature_projection = FeatureProjection(dataset.glove_matrix.to(device))
         else:
-            self.glove_matrix = torch.eye(data.x.shape[1]).to(device)
+            self.feature_projection = FeatureProjection()
 
         self.name = 'LATGCN'
         self.device = device
         self.edge_index = data.edge_index.to(device)
+        self.victim_subgraph = None
 
-        node_attribute_list = []
-        for idx in range(data.x.shape[0]):
-            node_attribute_list += [torch.nn.Parameter(data.x[idx].unsqueeze(0), requires_grad=False).to(device)]
-        self.node_attribute_list = node_attribute_list
+        self.feature_store = FeatureStore(data.x.to(device))
 
     def get_perturbation_shape(self):
         return (self.getInput().detach().shape[0], self.internal_channels)
 
     def is_zero_grad(self) -> bool:
-        nodes_with_gradient = filter(lambda node: node.grad is not None, self.node_attribute_list)
-        abs_gradients = map(lambda node: node.grad.abs().sum().item(), nodes_with_gradient)
-        if reduce(lambda x, y: x + y, abs_gradients) == 0:
-            return True
-        else:
-            return False
+        return self.feature_store.isZeroGrad()
+
+    def setVictimSubgraph(self, attacked_nodes):
+        self.victim_subgraph = extractVictimSubgraph(attacked_nodes=attacked_nodes, num_hops=self.num_layers,
+                                                     edge_index=self.edge_index,
+                                                     num_nodes=self.feature_store.num_nodes)
+
+    def removeVictimSubgraph(self):
+        self.victim_subgraph = None
+
+    def takeSnapshot(self):
+        return ModelSnapshot(self)
+
+    def restoreSnapshot(self, snapshot):
+        snapshot.restore(self)
 
     def forward(self, input=None, perturbation=None, grad_perturbation=False):
         """
@@ -67,17 +77,23 @@ class LATGCNModel(torch.nn.Module):
                 to propagate gradient to the network
         """
 
-        if input is None:
-            input = self.getInput().to(self.device)
-        x = torch.matmul(input, self.glove_matrix).to(self.device)
+        edge_index = self.edge_index
+        if input is not None:
+            x = self.feature_projection.project(input).to(self.device)
+        elif self.victim_subgraph is None or perturbation is not None:
+            x = self.feature_projection.projectInput(self.feature_store).to(self.device)
+        else:
+            x = self.feature_projection.projectInput(self.feature_store,
+                                                     nodes=self.victim_subgraph.subset).to(self.device)
+            edge_index = self.victim_subgraph.edge_index
 
         x_drop = self.input_dropout(x)
 
-        h1 = F.relu(self.conv1(x_drop, self.edge_index))
+        h1 = F.relu(self.conv1(x_drop, edge_index))
 
         h1_d = self.h1_dropout(h1)
 
-        h2 = self.conv2(h1_d, self.edge_index)
+        h2 = self.conv2(h1_d, edge_index)
 
         h2 = F.log_softmax(h2, dim=1).to(self.device)
 
@@ -93,11 +109,14 @@ class LATGCNModel(torch.nn.Module):
         else:
             return h2
 
-    def getInput(self):
-        return torch.cat(self.node_attribute_list, dim=0)
+    def getInput(self, nodes=None):
+        return self.feature_store.getInput(nodes=nodes)
+
+    def getNodesAttributes(self, idx_node):
+        return self.feature_store.getNodesAttributes(idx_node)
 
     def setNodesAttribute(self, idx_node, idx_attribute, value):
-        self.node_attribute_list[idx_node][0][idx_attribute] = value
+        self.feature_store.setNodesAttribute(idx_node, idx_attribute, value)
 
     def setNodesAttributes(self, idx_node, values):
-        self.node_attribute_list[idx_node][0] = values
+        self.feature_store.setNodesAttributes(idx_node, values)
@@ -0,0 +1,74 @@
+from typing import Optional
+import torch
+import copy
+
+
+class ModelSnapshot(object):
+    """
+        a copy-on-write snapshot of the state that an attack changes in a model:
+        the perturbed attribute rows, the edges and edge weights and the buffers (e.g. batch norm statistics)
+        the base attribute matrix, the edge index and its key index are never changed in place,
+        so they are kept by reference
+
+        a snapshot can be used as a read-only pre-attack model (getInput, getNodesAttributes)
+
+        Parameters
+        ----------
+        model: Model
+    """
+    def __init__(self, model):
+        feature_store = getattr(model, 'feature_store', None)
+        self.feature_store = copy.deepcopy(feature_store)
+        self.x = model.getInput() if feature_store is None else None
+
+        self.edge_index = model.edge_index
+        self.edge_keys = getattr(model, 'edge_keys', None)
+        edge_weight = getattr(model, 'edge_weight', None)
+        self.edge_weight = None if edge_weight is None else edge_weight.detach().clone()
+
+        self.buffers = {name: buffer.clone() for name, buffer in model.named_buffers()}
+        self.requires_grad = [param.requires_grad for param in model.parameters()]
+        self.training = model.training
+
+    def getInput(self, nodes: Optional[torch.Tensor] = None) -> torch.Tensor:
+        """
+            information at model_functions.graph_model.Model
+        """
+        if self.feature_store is not None:
+            return self.feature_store.getInput(nodes=nodes)
+        if nodes is None:
+            return self.x
+        return self.x[nodes]
+
+    def getNodesAttributes(self, idx_node: torch.Tensor) -> torch.Tensor:
+        """
+            information at model_functions.graph_model.NodeModel
+        """
+        return self.feature_store.getNodesAttributes(idx_node)
+
+    @torch.no_grad()
+    def restore(self, model):
+        """
+            rolls the model back, in place, to the state of the snapshot
+            the snapshot itself is not changed and can be restored again
+
+            Parameters
+            ----------
+            model: Model
+        """
+        if self.feature_store is not None:
+            model.feature_store.restore(self.feature_store)
+
+        model.edge_index = self.edge_index
+        if self.edge_keys is not None:
+            model.edge_keys = self.edge_keys
+        if self.edge_weight is not None:
+            model.edge_weight.data = self.edge_weight.clone()
+            # the gradient of edges which were added after the snapshot does not fit the restored weights
+            model.edge_weight.grad = None
+
+        for name, buffer in model.named_buffers():
+            buffer.copy_(self.buffers[name])
+        for param, requires_grad in zip(model.parameters(), self.requires_grad):
+            param.requires_grad = requires_grad
+        model.train(self.training)
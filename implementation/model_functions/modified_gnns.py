@@ -1,4 +1,5 @@
-from torch_geometric.nn import GATConv, GINConv, SAGEConv
+from torch_geometric.nn import GATConv, GINConv, SAGEConv, GCNConv, SGConv
+from torch_geometric.nn.conv.gcn_conv import gcn_norm
 
 from typing import Union, Tuple, Optional, Callable
 from torch_geometric.typing import (OptPairTensor, Adj, Size, NoneType,
@@ -136,6 +137,21 @@ class ModifiedGINConv(GINConv):
 
         return self.nn(out)
 
+    # start of input products #########
+    def inputWeight(self) -> Tensor:
+        # the first linear layer of nn, applied before the aggregation
+        return self.nn[0].weight.T
+
+    def propagateProduct(self, x: Tensor, edge_index: Adj, edge_weight=None) -> Tensor:
+        if edge_weight is None:
+            edge_weight = torch.ones((edge_index.size(1),), dtype=x.dtype, device=edge_index.device)
+        out = self.propagate(edge_index, x=(x, x), size=None, edge_weight=edge_weight)
+        out += (1 + self.eps) * x
+        if self.nn[0].bias is not None:
+            out += self.nn[0].bias
+        return self.nn[1:](out)
+    # end of input products #########
+
     def message(self, x_j: Tensor, edge_weight: Tensor) -> Tensor:
         # start of modified implementation #########
         return edge_weight.view(-1, 1) * x_j
@@ -173,7 +189,109 @@ class ModifiedSAGEConv(SAGEConv):
 
         return out
 
+    # start of input products #########
+    def inputWeight(self) -> Tensor:
+        # the weights of lin_l (applied after the aggregation) and of lin_r, side by side
+        return torch.cat((self.lin_l.weight.T, self.lin_r.weight.T), dim=1)
+
+    def propagateProduct(self, x: Tensor, edge_index: Adj, edge_weight=None) -> Tensor:
+        x_l, x_r = x[:, :self.out_channels], x[:, self.out_channels:]
+        if edge_weight is None:
+            edge_weight = torch.ones((edge_index.size(1),), dtype=x.dtype, device=edge_index.device)
+        out = self.propagate(edge_index, x=(x_l, x_l), size=None, edge_weight=edge_weight)
+        if self.lin_l.bias is not None:
+            out += self.lin_l.bias
+        out += x_r
+
+        if self.normalize:
+            out = F.normalize(out, p=2., dim=-1)
+        return out
+    # end of input products #########
+
     def message(self, x_j: Tensor, edge_weight: Tensor) -> Tensor:
         # start of modified implementation #########
         return edge_weight.view(-1, 1) * x_j
         # end of modified implementation #########
+
+
+class ModifiedGCNConv(GCNConv):
+    """
+        GCNConv which can start from the input product x @ weight (more information at
+        model_functions.input_products)
+    """
+    def __init__(self, **kwargs):
+        super(ModifiedGCNConv, self).__init__(**kwargs)
+
+    def forward(self, x: Tensor, edge_index: Adj, edge_weight: OptTensor = None) -> Tensor:
+        """"""
+        return self.propagateProduct(torch.matmul(x, self.inputWeight()), edge_index=edge_index,
+                                     edge_weight=edge_weight)
+
+    def inputWeight(self) -> Tensor:
+        # torch_geometric 1.x keeps the weight as a parameter, later versions keep it in a bias-free linear layer
+        lin = getattr(self, 'lin', None)
+        if lin is not None:
+            return lin.weight.T
+        return self.weight
+
+    def propagateProduct(self, x: Tensor, edge_index: Adj, edge_weight: OptTensor = None) -> Tensor:
+        # the forward of GCNConv, after the multiplication by the weight
+        if self.normalize:
+            if isinstance(edge_index, Tensor):
+                cache = self._cached_edge_index
+                if cache is None:
+                    edge_index, edge_weight = gcn_norm(  # yapf: disable
+                        edge_index, edge_weight, x.size(self.node_dim),
+                        self.improved, self.add_self_loops, dtype=x.dtype)
+                    if self.cached:
+                        self._cached_edge_index = (edge_index, edge_weight)
+                else:
+                    edge_index, edge_weight = cache[0], cache[1]
+
+            elif isinstance(edge_index, SparseTensor):
+                cache = self._cached_adj_t
+                if cache is None:
+                    edge_index = gcn_norm(  # yapf: disable
+                        edge_index, edge_weight, x.size(self.node_dim),
+                        self.improved, self.add_self_loops, dtype=x.dtype)
+                    if self.cached:
+                        self._cached_adj_t = edge_index
+                else:
+                    edge_index = cache
+
+        out = self.propagate(edge_index, x=x, edge_weight=edge_weight, size=None)
+
+        if self.bias is not None:
+            out += self.bias
+
+        return out
+
+
+class ModifiedSGConv(SGConv):
+    """
+        SGConv which can start from the input product x @ lin.weight.T (more information at
+        model_functions.input_products)
+    """
+    def __init__(self, **kwargs):
+        super(ModifiedSGConv, self).__init__(**kwargs)
+
+    def inputWeight(self) -> Tensor:
+        return self.lin.weight.T
+
+    def propagateProduct(self, x: Tensor, edge_index: Adj, edge_weight: OptTensor = None) -> Tensor:
+        # the forward of SGConv, with lin moved before the (linear) propagation
+        if isinstance(edge_index, Tensor):
+            edge_index, edge_weight = gcn_norm(  # yapf: disable
+                edge_index, edge_weight, x.size(self.node_dim), False,
+                self.add_self_loops, dtype=x.dtype)
+        elif isinstance(edge_index, SparseTensor):
+            edge_index = gcn_norm(  # yapf: disable
+                edge_index, edge_weight, x.size(self.node_dim), False,
+                self.add_self_loops, dtype=x.dtype)
+
+        for k in range(self.K):
+            x = self.propagate(edge_index, x=x, edge_weight=edge_weight, size=None)
+
+        if self.lin.bias is not None:
+            x = x + self.lin.bias
+        return x
@@ -1,6 +1,9 @@
 from model_functions.rgnn.models import RGNN
+from model_functions.victim_subgraph import extractVictimSubgraph
+from model_functions.feature_store import FeatureStore
+from model_functions.feature_projection import FeatureProjection
+from model_functions.model_snapshot import ModelSnapshot
 
-from functools import reduce
 import torch
 
 
@@ -14,44 +17,60 @@ class RGNNModel(RGNN):
         self.attack = False
 
         if hasattr(dataset, 'glove_matrix'):
-            self.glove_matrix = dataset.glove_matrix.to(device)
+            self.feature_projection = FeatureProjection(dataset.glove_matrix.to(device))
         else:
-            self.glove_matrix = torch.eye(data.x.shape[1]).to(device)
+            self.feature_projection = FeatureProjection()
 
         self.name = 'RGNN'
         self.device = device
         self.edge_index = data.edge_index.to(device)
         self.edge_weight = None
-        node_attribute_list = []
-        for idx in range(data.x.shape[0]):
-            node_attribute_list += [torch.nn.Parameter(data.x[idx].unsqueeze(0), requires_grad=False).to(device)]
-        self.node_attribute_list = node_attribute_list
+        self.victim_subgraph = None
+        self.feature_store = FeatureStore(data.x.to(device))
         # end of changes XXXXX
 
     # start of changes XXXXX
-    def getInput(self):
-        return torch.cat(self.node_attribute_list, dim=0)
+    def getInput(self, nodes=None):
+        return self.feature_store.getInput(nodes=nodes)
+
+    def getNodesAttributes(self, idx_node):
+        return self.feature_store.getNodesAttributes(idx_node)
 
     def setNodesAttribute(self, idx_node, idx_attribute, value):
-        self.node_attribute_list[idx_node][0][idx_attribute] = value
+        self.feature_store.setNodesAttribute(idx_node, idx_attribute, value)
 
     def setNodesAttributes(self, idx_node, values):
-        self.node_attribute_list[idx_node][0] = values
+        self.feature_store.setNodesAttributes(idx_node, values)
 
     def is_zero_grad(self) -> bool:
-        nodes_with_gradient = filter(lambda node: node.grad is not None, self.node_attribute_list)
-        abs_gradients = map(lambda node: node.grad.abs().sum().item(), nodes_with_gradient)
-        if reduce(lambda x, y: x + y, abs_gradients) == 0:
-            return True
-        else:
-            return False
+        return self.feature_store.isZeroGrad()
+
+    def setVictimSubgraph(self, attacked_nodes):
+        self.victim_subgraph = extractVictimSubgraph(attacked_nodes=attacked_nodes, num_hops=len(self.layers),
+                                                     edge_index=self.edge_index,
+                                                     num_nodes=self.feature_store.num_nodes)
+
+    def removeVictimSubgraph(self):
+        self.victim_subgraph = None
+
+    def takeSnapshot(self):
+        return ModelSnapshot(self)
+
+    def restoreSnapshot(self, snapshot):
+        snapshot.restore(self)
 
     def forward(self, input=None):
-        if input is None:
-            input = self.getInput().to(self.device)
-        x = torch.matmul(input, self.glove_matrix).to(self.device)
+        edge_index = self.edge_index
+        if input is not None:
+            x = self.feature_projection.project(input).to(self.device)
+        elif self.victim_subgraph is None:
+            x = self.feature_projection.projectInput(self.feature_store).to(self.device)
+        else:
+            x = self.feature_projection.projectInput(self.feature_store,
+                                                     nodes=self.victim_subgraph.subset).to(self.device)
+            edge_index = self.victim_subgraph.edge_index
 
-        edge_idx, edge_weight = self._preprocess_adjacency_matrix(self.edge_index, x)
+        edge_idx, edge_weight = self._preprocess_adjacency_matrix(edge_index, x)
 
         # Enforce that the input is contiguous
         x, edge_idx, edge_weight = self._ensure_contiguousness(x, edge_idx, edge_weight)
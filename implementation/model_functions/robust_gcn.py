@@ -15,6 +15,11 @@ import numpy as np
 from torch.nn import functional as F
 from torch.nn.functional import relu
 from torch import optim
+from model_functions.victim_subgraph import VictimSubgraph
+from model_functions.feature_store import FeatureStore
+from model_functions.model_snapshot import ModelSnapshot
+from model_functions.input_products import InputProductCache, usesInputProducts
+from model_functions.feature_projection import FeatureProjection
 
 try:
     from tqdm import tqdm
@@ -122,6 +127,25 @@ class RobustGCNLayer(nn.Module):
 
         return adj_slice.mm(input.mm(self.weights)) + self.bias
 
+    # start of changes XXXXX
+    def inputWeight(self):
+        return self.weights
+
+    def productForward(self, input_products, feature_store, feature_projection, nodes=None):
+        """
+        The forward pass of the input layer, from the cached input products
+        (more information at model_functions.input_products).
+        """
+        if nodes is not None:
+            adj_slice, nbs = self.slice_adj(nodes)
+            nbs = torch.from_numpy(nbs).to(self.device)
+        else:
+            adj_slice, nbs = self.adj_tensor, None
+        product = input_products.getProduct(layer=self, feature_store=feature_store,
+                                            feature_projection=feature_projection, nodes=nbs)
+        return adj_slice.mm(product) + self.bias
+    # end of changes XXXXX
+
     def bounds_continuous(self, input_lower, input_upper, nodes, slice_input=False):
         """
         Compute lower and upper bounds of the hidden activations of the
@@ -371,9 +395,9 @@ class RobustGCNModel(nn.Module):
         self.attack = False
 
         if hasattr(dataset, 'glove_matrix'):
-            self.glove_matrix = dataset.glove_matrix.to(device)
+            self.feature_projection = FeatureProjection(dataset.glove_matrix.to(device))
         else:
-            self.glove_matrix = torch.eye(data.x.shape[1]).to(device)
+            self.feature_projection = FeatureProjection()
 
         num_initial_features = dataset.num_features
         num_final_features = dataset.num_classes
@@ -385,6 +409,7 @@ class RobustGCNModel(nn.Module):
         self.device = device
         self.edge_index = data.edge_index.to(device)
         self.edge_weight = None
+        self.victim_subgraph = None
 
         row = edge_index[0, :].cpu().numpy()
         col = edge_index[1, :].cpu().numpy()
@@ -409,25 +434,40 @@ class RobustGCNModel(nn.Module):
                 self.omegas.append(torch.zeros([self.N, dims[ix+1]], requires_grad=True))
 
         # start of changes XXXXX
-        node_attribute_list = []
-        for idx in range(data.x.shape[0]):
-            node_attribute_list += [torch.nn.Parameter(data.x[idx].unsqueeze(0), requires_grad=False).to(device)]
-        self.node_attribute_list = node_attribute_list
+        self.feature_store = FeatureStore(dataset.getFeatures().to(device))
+        self.input_products = InputProductCache()
         # end of changes XXXXX
 
     # start of changes XXXXX
-    def getInput(self):
-        return torch.cat(self.node_attribute_list, dim=0)
+    def getInput(self, nodes=None):
+        return self.feature_store.getInput(nodes=nodes)
+
+    def getNodesAttributes(self, idx_node):
+        return self.feature_store.getNodesAttributes(idx_node)
 
     def setNodesAttribute(self, idx_node, idx_attribute, value):
-        self.node_attribute_list[idx_node][0][idx_attribute] = value
+        self.feature_store.setNodesAttribute(idx_node, idx_attribute, value)
 
     def setNodesAttributes(self, idx_node, values):
-        self.node_attribute_list[idx_node][0] = values
+        self.feature_store.setNodesAttributes(idx_node, values)
 
     def is_zero_grad(self) -> bool:
         return False
 
+    def setVictimSubgraph(self, attacked_nodes):
+        # the layers already slice the neighborhoods of the requested nodes, so only the victims are kept
+        self.victim_subgraph = VictimSubgraph(subset=attacked_nodes, edge_index=None, edge_mask=None,
+                                              mapping=torch.arange(attacked_nodes.shape[0]).to(self.device))
+
+    def removeVictimSubgraph(self):
+        self.victim_subgraph = None
+
+    def takeSnapshot(self):
+        return ModelSnapshot(self)
+
+    def restoreSnapshot(self, snapshot):
+        snapshot.restore(self)
+
     # end of changes XXXXX
 
     def predict(self, input, nodes):
@@ -510,9 +550,14 @@ class RobustGCNModel(nn.Module):
 
         """
         # start of changes XXXXX
+        use_input_products = usesInputProducts(model=self, layer=self.layers[0], x=input)
         if input is None:
-            input = self.getInput().to(self.device)
-        input = torch.matmul(input, self.glove_matrix).to(self.device)
+            if nodes is None and self.victim_subgraph is not None:
+                nodes = self.victim_subgraph.subset.cpu().numpy()
+            if not use_input_products:
+                input = self.feature_projection.projectInput(self.feature_store).to(self.device)
+        else:
+            input = self.feature_projection.project(input).to(self.device)
         # end of changes XXXXX
 
         # get neighborhoods first, in a backward manner
@@ -525,7 +570,10 @@ class RobustGCNModel(nn.Module):
             # We only slice the attributes in the input layer,
             # afterwards we just pass them along.
             slice_input = ix == 0
-            if nodes is None:
+            if ix == 0 and use_input_products:
+                hidden = layer.productForward(self.input_products, self.feature_store, self.feature_projection,
+                                              None if nodes is None else neighborhoods[ix])
+            elif nodes is None:
                 hidden = layer(hidden)
             else:
                 hidden = layer(hidden, neighborhoods[ix], slice_input=slice_input)
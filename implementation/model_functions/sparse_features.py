@@ -0,0 +1,189 @@
+from typing import Optional
+import torch
+
+
+class SparseFeatures(object):
+    """
+        a node attribute matrix in compressed sparse row format, for the sparse bag-of-words attributes
+        of Cora and CiteSeer: the memory and the product with the first layer scale with the non-zero attributes
+        important note: like the dense base matrix of a feature store, it is never changed in place
+
+        Parameters
+        ----------
+        indptr: torch.Tensor - the attributes of node i are indices[indptr[i]:indptr[i + 1]]
+        indices: torch.Tensor - the non-zero attributes of all nodes, sorted inside each node
+        values: torch.Tensor - the values of the non-zero attributes
+        num_features: int
+    """
+    def __init__(self, indptr: torch.Tensor, indices: torch.Tensor, values: torch.Tensor, num_features: int):
+        self.indptr = indptr
+        self.indices = indices
+        self.values = values
+        self.num_features = num_features
+        self._coo = None
+
+    @staticmethod
+    def fromDense(x: torch.Tensor) -> 'SparseFeatures':
+        """
+            Parameters
+            ----------
+            x: torch.Tensor - a dense attribute matrix
+
+            Returns
+            -------
+            sparse_features: SparseFeatures
+        """
+        x = x.detach()
+        rows, cols = x.nonzero(as_tuple=True)
+        return _fromCOO(rows=rows, cols=cols, values=x[rows, cols], num_nodes=x.shape[0], num_features=x.shape[1])
+
+    @property
+    def shape(self) -> torch.Size:
+        return torch.Size((self.indptr.shape[0] - 1, self.num_features))
+
+    @property
+    def device(self) -> torch.device:
+        return self.values.device
+
+    @property
+    def dtype(self) -> torch.dtype:
+        return self.values.dtype
+
+    @property
+    def _version(self) -> int:
+        # the version counter of the values, so that the matrix can key caches like a dense tensor
+        return self.values._version
+
+    def to(self, device: torch.device) -> 'SparseFeatures':
+        return SparseFeatures(indptr=self.indptr.to(device), indices=self.indices.to(device),
+                              values=self.values.to(device), num_features=self.num_features)
+
+    def toDense(self, nodes: Optional[torch.Tensor] = None) -> torch.Tensor:
+        """
+            the dense rows of the matrix
+
+            Parameters
+            ----------
+            nodes: Optional[torch.Tensor] - when given, only the rows of these nodes are returned
+
+            Returns
+            -------
+            x: torch.Tensor
+        """
+        rows, positions, num_rows = self._rowPositions(nodes)
+        x = self.values.new_zeros(num_rows, self.num_features)
+        x[rows, self.indices[positions]] = self.values[positions]
+        return x
+
+    def matmul(self, weight: torch.Tensor, nodes: Optional[torch.Tensor] = None) -> torch.Tensor:
+        """
+            the sparse-dense product of the matrix (or some of its rows) with a dense weight
+
+            Parameters
+            ----------
+            weight: torch.Tensor
+            nodes: Optional[torch.Tensor] - when given, only the rows of these nodes are multiplied
+
+            Returns
+            -------
+            product: torch.Tensor
+        """
+        if nodes is None:
+            if self._coo is None:
+                self._coo = self._toCOO(*self._rowPositions(None))
+            return torch.sparse.mm(self._coo, weight)
+        return torch.sparse.mm(self._toCOO(*self._rowPositions(nodes)), weight)
+
+    def indexCopy(self, nodes: torch.Tensor, rows: torch.Tensor) -> 'SparseFeatures':
+        """
+            a copy of the matrix with the rows of some nodes replaced
+
+            Parameters
+            ----------
+            nodes: torch.Tensor
+            rows: torch.Tensor - the new dense rows, in the order of nodes
+
+            Returns
+            -------
+            sparse_features: SparseFeatures
+        """
+        num_nodes = self.shape[0]
+        is_replaced = torch.zeros(num_nodes, dtype=torch.bool, device=self.device)
+        is_replaced[nodes] = True
+        old_rows = self._rowIds()
+        is_kept = ~is_replaced[old_rows]
+
+        rows = rows.detach()
+        new_rows, new_cols = rows.nonzero(as_tuple=True)
+        return _fromCOO(rows=torch.cat((old_rows[is_kept], nodes[new_rows])),
+                        cols=torch.cat((self.indices[is_kept], new_cols)),
+                        values=torch.cat((self.values[is_kept], rows[new_rows, new_cols])),
+                        num_nodes=num_nodes, num_features=self.num_features)
+
+    def cat(self, rows: torch.Tensor) -> 'SparseFeatures':
+        """
+            a copy of the matrix with new last rows
+
+            Parameters
+            ----------
+            rows: torch.Tensor - the new dense rows
+
+            Returns
+            -------
+            sparse_features: SparseFeatures
+        """
+        appended = SparseFeatures.fromDense(rows)
+        return SparseFeatures(indptr=torch.cat((self.indptr, appended.indptr[1:] + self.indptr[-1])),
+                              indices=torch.cat((self.indices, appended.indices)),
+                              values=torch.cat((self.values, appended.values)), num_features=self.num_features)
+
+    def narrow(self, num_nodes: int) -> 'SparseFeatures':
+        """
+            a copy of the matrix with only its first num_nodes rows
+        """
+        end = self.indptr[num_nodes].item()
+        return SparseFeatures(indptr=self.indptr[:num_nodes + 1], indices=self.indices[:end],
+                              values=self.values[:end], num_features=self.num_features)
+
+    def _rowIds(self) -> torch.Tensor:
+        """
+            the row of each non-zero attribute
+        """
+        num_nodes = self.shape[0]
+        return torch.repeat_interleave(torch.arange(num_nodes, device=self.device), self.indptr[1:] - self.indptr[:-1])
+
+    def _rowPositions(self, nodes: Optional[torch.Tensor]):
+        """
+            the non-zero attributes of some rows
+
+            Returns
+            -------
+            rows: torch.Tensor - the (output) row of each attribute
+            positions: torch.Tensor - the position of each attribute in indices/values
+            num_rows: int
+        """
+        if nodes is None:
+            return self._rowIds(), torch.arange(self.values.shape[0], device=self.device), self.shape[0]
+
+        nodes = torch.as_tensor(nodes, device=self.device).view(-1)
+        starts = self.indptr[nodes]
+        counts = self.indptr[nodes + 1] - starts
+        rows = torch.repeat_interleave(torch.arange(nodes.shape[0], device=self.device), counts)
+        offsets = torch.cumsum(counts, dim=0) - counts
+        positions = torch.arange(rows.shape[0], device=self.device) + (starts - offsets)[rows]
+        return rows, positions, nodes.shape[0]
+
+    def _toCOO(self, rows: torch.Tensor, positions: torch.Tensor, num_rows: int) -> torch.Tensor:
+        return torch.sparse_coo_tensor(torch.stack((rows, self.indices[positions])), self.values[positions],
+                                       size=(num_rows, self.num_features)).coalesce()
+
+
+def _fromCOO(rows: torch.Tensor, cols: torch.Tensor, values: torch.Tensor, num_nodes: int, num_features: int)\
+        -> SparseFeatures:
+    """
+        builds the compressed rows of (unsorted) coordinates
+    """
+    order = torch.argsort(rows * num_features + cols)
+    indptr = rows.new_zeros(num_nodes + 1)
+    indptr[1:] = torch.cumsum(torch.bincount(rows, minlength=num_nodes), dim=0)
+    return SparseFeatures(indptr=indptr, indices=cols[order], values=values[order], num_features=num_features)
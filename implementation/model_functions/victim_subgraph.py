@@ -0,0 +1,180 @@
+from typing import NamedTuple, Optional
+import weakref
+import torch
+from torch import nn
+from torch_geometric.utils import k_hop_subgraph
+
+
+class VictimSubgraph(NamedTuple):
+    """
+        a VictimSubgraph object with the following fields:
+        subset - the (global) nodes in the receptive field of the victims
+        edge_index - the edges between the nodes of subset, relabeled to subset positions
+        edge_mask - a mask over the full-graph edges which are kept in edge_index
+        mapping - the positions of the victim nodes inside subset
+    """
+    subset: torch.Tensor
+    edge_index: Optional[torch.Tensor]
+    edge_mask: Optional[torch.Tensor]
+    mapping: torch.Tensor
+
+
+# whether or not the victim subgraph of each model is exact, with the architecture it was checked on
+# (exactness depends on the layers of the model only, so the full-graph check runs once per model)
+_subgraph_exact_cache = weakref.WeakKeyDictionary()
+
+
+def extractVictimSubgraph(attacked_nodes: torch.Tensor, num_hops: int, edge_index: torch.Tensor, num_nodes: int)\
+        -> VictimSubgraph:
+    """
+        extracts the receptive field of the victim nodes
+        important note: one extra hop is included so that the degree of the border nodes (used by the GCN
+        normalization) is the same as in the full graph
+
+        Parameters
+        ----------
+        attacked_nodes: torch.Tensor - the victim nodes
+        num_hops: int - the number of message passing steps of the model
+        edge_index: torch.Tensor - the full-graph edges
+        num_nodes: int - the number of nodes in the full graph
+
+        Returns
+        -------
+        victim_subgraph: VictimSubgraph
+    """
+    subset, sub_edge_index, mapping, edge_mask = k_hop_subgraph(node_idx=attacked_nodes, num_hops=num_hops + 1,
+                                                                edge_index=edge_index, relabel_nodes=True,
+                                                                num_nodes=num_nodes)
+    return VictimSubgraph(subset=subset, edge_index=sub_edge_index, edge_mask=edge_mask, mapping=mapping)
+
+
+def fullForward(model) -> torch.Tensor:
+    """
+        a forward pass over the whole graph, even if a victim subgraph is set
+
+        Parameters
+        ----------
+        model: Model
+
+        Returns
+        -------
+        logits: torch.Tensor - the output of all nodes in the graph
+    """
+    victim_subgraph = model.victim_subgraph
+    model.victim_subgraph = None
+    try:
+        logits = model()
+    finally:
+        model.victim_subgraph = victim_subgraph
+    return logits
+
+
+def victimLogits(model, attacked_nodes: torch.Tensor) -> torch.Tensor:
+    """
+        a forward pass which returns the output of the victim nodes only
+        uses the victim subgraph when one is set
+
+        Parameters
+        ----------
+        model: Model
+        attacked_nodes: torch.Tensor - the victim nodes
+
+        Returns
+        -------
+        logits: torch.Tensor - the output of the victim nodes
+    """
+    if model.victim_subgraph is None:
+        return model()[attacked_nodes]
+    return model()[model.victim_subgraph.mapping]
+
+
+@torch.no_grad()
+def isSubgraphExact(model, attacked_nodes: torch.Tensor) -> bool:
+    """
+        checks that the victim subgraph gives the same victim output as the full graph
+        models with batch normalization are rejected, as their train mode uses statistics of the whole graph
+
+        Parameters
+        ----------
+        model: Model
+        attacked_nodes: torch.Tensor - the victim nodes
+
+        Returns
+        -------
+        is_exact: bool
+    """
+    for module in model.modules():
+        if isinstance(module, nn.modules.batchnorm._BatchNorm):
+            return False
+
+    training = model.training
+    model.eval()
+    subgraph_logits = victimLogits(model=model, attacked_nodes=attacked_nodes)
+    full_logits = fullForward(model)[attacked_nodes]
+    model.train(training)
+
+    if subgraph_logits.shape != full_logits.shape:
+        return False
+    same_prediction = torch.equal(subgraph_logits.max(1)[1], full_logits.max(1)[1])
+    return same_prediction and torch.allclose(subgraph_logits, full_logits, atol=1e-5)
+
+
+def useVictimSubgraph(model, attacked_nodes: torch.Tensor) -> bool:
+    """
+        sets the victim subgraph of the model, and falls back to the full graph when it is not exact
+        the exactness is checked against the full graph on the first call for each model only
+
+        Parameters
+        ----------
+        model: Model
+        attacked_nodes: torch.Tensor - the victim nodes
+
+        Returns
+        -------
+        is_used: bool - whether or not the victim subgraph is used
+    """
+    model.setVictimSubgraph(attacked_nodes)
+    architecture = (model.name, model.num_layers)
+    cached = _subgraph_exact_cache.get(model)
+    if cached is None or cached[0] != architecture:
+        cached = (architecture, isSubgraphExact(model=model, attacked_nodes=attacked_nodes))
+        _subgraph_exact_cache[model] = cached
+    if cached[1]:
+        return True
+    model.removeVictimSubgraph()
+    return False
+
+
+@torch.no_grad()
+def batchedVictimLogits(model, victim_subgraph: VictimSubgraph, edge_weights: torch.Tensor) -> torch.Tensor:
+    """
+        the output of the victim nodes under a batch of edge weight vectors, with a single forward
+        the forward runs on a disjoint union of copies of the victim subgraph (one copy per edge weight vector),
+        so message passing never mixes the copies
+        important note: only valid for models which do not share statistics between nodes (see isSubgraphExact)
+
+        Parameters
+        ----------
+        model: EdgeModel
+        victim_subgraph: VictimSubgraph - the receptive field of the victims (for all the edge weight vectors)
+        edge_weights: torch.Tensor - the edge weights of the subgraph edges, of shape (batch, subgraph edges)
+
+        Returns
+        -------
+        logits: torch.Tensor - the output of the victim nodes, of shape (batch, victims, classes)
+    """
+    batch_size = edge_weights.shape[0]
+    num_nodes = victim_subgraph.subset.shape[0]
+    offsets = torch.arange(batch_size, device=edge_weights.device) * num_nodes
+    edge_index = victim_subgraph.edge_index.unsqueeze(0) + offsets.view(-1, 1, 1)
+    edge_index = edge_index.transpose(0, 1).reshape(2, -1)
+    x = model.getInput(nodes=victim_subgraph.subset).repeat(batch_size, 1)
+
+    model_edge_index, model_edge_weight, subgraph = model.edge_index, model.edge_weight.data, model.victim_subgraph
+    model.edge_index, model.edge_weight.data, model.victim_subgraph = edge_index, edge_weights.reshape(-1), None
+    try:
+        logits = model(x)
+    finally:
+        model.edge_index, model.edge_weight.data, model.victim_subgraph = model_edge_index, model_edge_weight, subgraph
+    victim_rows = victim_subgraph.mapping.unsqueeze(0) + offsets.view(-1, 1)
+    return logits[victim_rows.view(-1)].view(batch_size, victim_subgraph.mapping.shape[0], -1)
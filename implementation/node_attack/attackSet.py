@@ -1,14 +1,19 @@
-from node_attack.attackVictim import attackVictim
+from node_attack.attackVictim import attackVictim, attackVictimPerDistance
 from classes.basic_classes import Print, DatasetType
 from classes.approach_classes import Approach, NodeApproach
 from node_attack.attackVictim import checkNodeClassification
+from model_functions.model_snapshot import ModelSnapshot
+from helpers.parallelVictims import mapVictims
 
-import copy
+from functools import partial
 import numpy as np
 import torch
-from typing import Tuple
+from typing import List, Tuple, Optional
 import torch_geometric
 
+# each sweep of the attack and the attribute of the attack which holds its current value
+SWEEP_VALUE_NAMES = (('l_0_sweep', 'l_0'), ('l_inf_sweep', 'l_inf'), ('distance_sweep', 'current_distance'))
+
 
 def attackSet(attack, approach: Approach, trainset: bool) -> Tuple[torch.Tensor]:
     """
@@ -43,49 +48,124 @@ def attackSet(attack, approach: Approach, trainset: bool) -> Tuple[torch.Tensor]
     y_targets = getClassificationTargets(attack=attack, dataset=dataset, num_attacks=num_attacks,
                                          attacked_nodes=attacked_nodes)
 
-    # chooses a victim node and attacks it using oneNodeAttack
-    attack_results_for_all_attacked_nodes = []
+    # the random stream of each distance of a distance sweep, when the victims are not seeded separately
+    random_states = None
+    if attack.distance_sweep is not None and attack.workers is None:
+        random_states = [None] * len(attack.distance_sweep)
 
+    # chooses a victim node and attacks it using oneNodeAttack
     attack.model_wrapper.model.attack = True
-    model0 = copy.deepcopy(attack.model_wrapper.model)
-    for node_num in range(num_attacks):
-        attacked_node = torch.tensor([attacked_nodes[node_num]], dtype=torch.long).to(device)
-        y_target = torch.tensor([y_targets[node_num]], dtype=torch.long).to(device)
-        classified_to_target = checkNodeClassification(attack=attack, dataset=dataset, attacked_node=attacked_node,
-                                                       y_target=y_target, print_answer=print_answer,
-                                                       attack_num=node_num + 1)
-        # important note: the victim is attacked only if it is classified to y_target!
-        if classified_to_target:
-            attack_results = attackVictim(attack=attack, approach=approach, attacked_node=attacked_node,
-                                          y_target=y_target, node_num=node_num + 1)
-            # in case of an impossible attack (i.e. double attack with bfs of 1)
-            if attack_results is None:
-                attack_results = torch.tensor([[0, 0]])
-
-        # in case of a miss-classification
-        else:
-            attack_results = torch.tensor([[1, 0]])
-
-        attack_results_for_all_attacked_nodes.append(attack_results.type(torch.long))
-        # check if the model is changed in between one node attacks
-        if not (attack.mode.isAdversarial() and trainset):
-            attack.setModel(model0)
+    # check if the model is changed in between one node attacks
+    if not (attack.mode.isAdversarial() and trainset):
+        model_snapshot = attack.model_wrapper.model.takeSnapshot()
+        victim_function = partial(attackSetVictim, approach=approach, attacked_nodes=attacked_nodes,
+                                  y_targets=y_targets, model_snapshot=model_snapshot, random_states=random_states)
+        attack_results_for_all_attacked_nodes = mapVictims(attack=attack, victim_function=victim_function,
+                                                           num_attacks=num_attacks)
+    else:
+        attack_results_for_all_attacked_nodes = \
+            [attackSetVictim(attack=attack, node_num=node_num, approach=approach, attacked_nodes=attacked_nodes,
+                             y_targets=y_targets, model_snapshot=None) for node_num in range(num_attacks)]
 
     # print results and save accuracies
     attack_results_for_all_attacked_nodes = torch.cat(attack_results_for_all_attacked_nodes)
-    mean_defence_results = \
-        getDefenceResultsMean(attack=attack, approach=approach, attack_results=attack_results_for_all_attacked_nodes)
     attack.model_wrapper.model.attack = False
 
     if not trainset:
-        print("######################## Attack Results ######################## ", flush=True)
-        printAttackHeader(attack=attack, approach=approach)
         num_of_attackers = attack.default_multiple_num_of_attackers if approach.isMultiple() else 1
+        printAttackResults(attack=attack, approach=approach, attack_results=attack_results_for_all_attacked_nodes,
+                           max_attributes=data.x.shape[1] * num_of_attackers)
+
+    return attack_results_for_all_attacked_nodes, attacked_nodes, y_targets
+
+
+def attackSetVictim(attack, node_num: int, approach: Approach, attacked_nodes: torch.Tensor, y_targets: torch.Tensor,
+                    model_snapshot: Optional[ModelSnapshot], random_states: Optional[List] = None) -> torch.Tensor:
+    """
+        attacks a single victim of attackSet
+
+        Parameters
+        ----------
+        attack: oneGNNAttack
+        node_num: int - the index of the attacked/victim node (out of the train/val/test-set)
+        approach: Approach
+        attacked_nodes: torch.Tensor - the victim nodes
+        y_targets: torch.Tensor - the target labels of the attack
+        model_snapshot: Optional[ModelSnapshot] - the model is restored to it after the attack (when given)
+        random_states: Optional[List] - the random stream of each distance of a distance sweep
+                                        more information at node_attack.attackVictim.attackVictimPerDistance
+
+        Returns
+        -------
+        attack_results: torch.Tensor - 2d-tensor that includes
+                                       1st-col - the attack
+                                       2nd-col - the number of attributes used
+                                       (for a sweep - both columns for each value of the sweep, see getSweep)
+    """
+    device = attack.device
+    dataset = attack.getDataset()
+    attacked_node = torch.tensor([attacked_nodes[node_num]], dtype=torch.long).to(device)
+    y_target = torch.tensor([y_targets[node_num]], dtype=torch.long).to(device)
+    classified_to_target = checkNodeClassification(attack=attack, dataset=dataset, attacked_node=attacked_node,
+                                                   y_target=y_target, print_answer=attack.print_answer,
+                                                   attack_num=node_num + 1)
+    # important note: the victim is attacked only if it is classified to y_target!
+    if classified_to_target and attack.distance_sweep is not None:
+        attack_results = attackVictimPerDistance(attack=attack, approach=approach, attacked_node=attacked_node,
+                                                 y_target=y_target, node_num=node_num + 1,
+                                                 random_states=random_states)
+    elif classified_to_target:
+        attack_results = attackVictim(attack=attack, approach=approach, attacked_node=attacked_node,
+                                      y_target=y_target, node_num=node_num + 1)
+        # in case of an impossible attack (i.e. double attack with bfs of 1)
+        if attack_results is None:
+            attack_results = torch.tensor([[0, 0]])
+
+    # in case of a miss-classification
+    else:
+        attack_results = torch.tensor([[1, 0]])
+
+    # the results which do not depend on the swept value are repeated for each of its values
+    sweep = getSweep(attack)
+    if sweep is not None and attack_results.shape[1] == 2:
+        attack_results = attack_results.repeat(1, len(sweep))
+
+    if model_snapshot is not None:
+        attack.model_wrapper.model.restoreSnapshot(model_snapshot)
+    return attack_results.type(torch.long)
 
+
+def printAttackResults(attack, approach: Approach, attack_results: torch.Tensor, max_attributes: int):
+    """
+        prints the final results of attackSet, one block for each value of a sweep (see getSweep),
+        while the value is set in the attack (so the header shows it)
+
+        Parameters
+        ----------
+        attack: oneGNNAttack
+        approach: Approach
+        attack_results: torch.Tensor - the results of attackSet
+        max_attributes: int
+    """
+    value_name = getSweepValueName(attack)
+    if value_name is None:
+        mean_defence_results = getDefenceResultsMean(attack=attack, approach=approach, attack_results=attack_results)
+        print("######################## Attack Results ######################## ", flush=True)
+        printAttackHeader(attack=attack, approach=approach)
         printAttack(basic_log=attack.model_wrapper.basic_log, mean_defence_results=mean_defence_results,
-                    approach=approach, max_attributes=data.x.shape[1] * num_of_attackers)
+                    approach=approach, max_attributes=max_attributes)
+        return
 
-    return attack_results_for_all_attacked_nodes, attacked_nodes, y_targets
+    value0 = getattr(attack, value_name)
+    defence, attributes = getSweepResultsMean(attack=attack, approach=approach, attack_results=attack_results)
+    for value, value_defence, value_attributes in zip(getSweep(attack), defence, attributes):
+        setattr(attack, value_name, value)
+        print("######################## Attack Results ######################## ", flush=True)
+        printAttackHeader(attack=attack, approach=approach)
+        printAttack(basic_log=attack.model_wrapper.basic_log,
+                    mean_defence_results=torch.tensor([value_defence, value_attributes]), approach=approach,
+                    max_attributes=max_attributes)
+    setattr(attack, value_name, value0)
 
 
 # a function which prints the header for the final results
@@ -177,6 +257,69 @@ def getClassificationTargets(attack, dataset: torch_geometric.data.Data, num_att
     return y_targets.type(torch.LongTensor).to(device)
 
 
+def getSweep(attack) -> Optional[List]:
+    """
+        the values of the sweep which is attacked at once (attack.l_0_sweep, attack.l_inf_sweep or
+        attack.distance_sweep), None when the attack is not a sweep
+
+        Parameters
+        ----------
+        attack: oneGNNAttack
+
+        Returns
+        -------
+        sweep: Optional[List]
+    """
+    for sweep in (attack.l_0_sweep, attack.l_inf_sweep, attack.distance_sweep):
+        if sweep is not None:
+            return sweep
+    return None
+
+
+def getSweepValueName(attack) -> Optional[str]:
+    """
+        the name of the attribute of the attack which holds the current value of its sweep (see getSweep),
+        None when the attack is not a sweep
+
+        Parameters
+        ----------
+        attack: oneGNNAttack
+
+        Returns
+        -------
+        value_name: Optional[str]
+    """
+    for sweep_name, value_name in SWEEP_VALUE_NAMES:
+        if getattr(attack, sweep_name) is not None:
+            return value_name
+    return None
+
+
+def getSweepResultsMean(attack, approach: Approach, attack_results: torch.Tensor) -> Tuple[torch.Tensor]:
+    """
+        getDefenceResultsMean for each value of a sweep (see getSweep)
+
+        Parameters
+        ----------
+        attack: oneGNNAttack
+        approach: Approach
+        attack_results: torch.Tensor - the defence and the number of attributes used for each value of the sweep
+
+        Returns
+        -------
+        defence: torch.Tensor - the defence for each value of the sweep
+        attributes: torch.Tensor - the mean number of attributes used for each value of the sweep
+    """
+    num_values = attack_results.shape[1] // 2
+    defence, attributes = torch.zeros(num_values), torch.zeros(num_values)
+    for value_idx in range(num_values):
+        mean_results = getDefenceResultsMean(attack=attack, approach=approach,
+                                             attack_results=attack_results[:, 2 * value_idx:2 * value_idx + 2])
+        defence[value_idx] = mean_results[0]
+        attributes[value_idx] = mean_results[1]
+    return defence, attributes
+
+
 def getDefenceResultsMean(attack, approach: Approach, attack_results: torch.Tensor) -> torch.Tensor:
     """
         calculates the mean for the defence results and the ratio of attributes used
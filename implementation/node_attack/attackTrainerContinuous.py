@@ -1,16 +1,21 @@
-from node_attack.attackTrainerHelpers import (createLogTemplate, setRequiresGrad, train, test, embedRowContinuous)
+from node_attack.attackTrainerHelpers import (createLogTemplate, setRequiresGrad, train, test, embedRowContinuous,
+                                              projectRowsContinuous)
 from classes.basic_classes import Print
 from node_attack.attackTrainerTests import test_discrete, test_continuous
+from model_functions.model_snapshot import ModelSnapshot
 
+from typing import Optional
 import torch
-import copy
 
 
 def attackTrainerContinuous(attack, attacked_nodes: torch.Tensor, y_targets: torch.Tensor,
-                            malicious_nodes: torch.Tensor, node_num: int) -> torch.Tensor:
+                            malicious_nodes: torch.Tensor, node_num: int,
+                            model0: Optional[ModelSnapshot] = None) -> torch.Tensor:
     """
         a trainer function that attacks our model by changing the input attributes
         a successful attack is when we attack successfully AND embed the attributes
+        when model0 is given, the attack is warm-started from the current attributes of the model,
+        and the attributes are still limited around the (clean) attributes of model0
 
         Parameters
         ----------
@@ -19,6 +24,7 @@ def attackTrainerContinuous(attack, attacked_nodes: torch.Tensor, y_targets: tor
         y_targets: torch.Tensor - the target labels of the attack
         malicious_nodes: torch.Tensor - the attacker/malicious node
         node_num: int - the index of the attacked/victim node (out of the train/val/test-set)
+        model0: Optional[ModelSnapshot] - the model before the attack, None when the attack starts from the model
 
         Returns
         -------
@@ -47,8 +53,9 @@ def attackTrainerContinuous(attack, attacked_nodes: torch.Tensor, y_targets: tor
     optimizer = torch.optim.Adam(params=optimizer_params, lr=lr)
 
     # find best_attributes
-    model0 = copy.deepcopy(model)
-    previous_embeded_model = None
+    if model0 is None:
+        model0 = model.takeSnapshot()
+    previous_embeded_attributes = None
     for epoch in range(0, continuous_epochs):
         # train
         train(model=model, targeted=attack.targeted, attacked_nodes=attacked_nodes, y_targets=y_targets,
@@ -65,7 +72,7 @@ def attackTrainerContinuous(attack, attacked_nodes: torch.Tensor, y_targets: tor
 
         # test
         results = test(data=data, model=model, targeted=attack.targeted, attacked_nodes=attacked_nodes,
-                       y_targets=y_targets)
+                       y_targets=y_targets, compute_accuracies=print_answer is Print.YES)
 
         # breaks
         if is_zero_grad:
@@ -74,31 +81,34 @@ def attackTrainerContinuous(attack, attacked_nodes: torch.Tensor, y_targets: tor
             break
 
         if results[3]:
-            # embed
-            embeded_model = copy.deepcopy(model)
+            # embed in place, the trained (not embedded) rows are restored if the embedded attack fails
+            trained_model = model.takeSnapshot()
             for malicious_idx, malicious_node in enumerate(malicious_nodes):
-                embedRowContinuous(model=embeded_model, malicious_node=malicious_node, model0=model0,
+                embedRowContinuous(model=model, malicious_node=malicious_node, model0=model0,
                                    l_inf=attack.l_inf, l_0=attack.l_0)
 
             # test correctness
-            changed_attributes = (embeded_model.getInput() != model0.getInput())[malicious_nodes].sum().item()
-            test_continuous(model=embeded_model, model0=model0, malicious_nodes=malicious_nodes,
+            changed_attributes = (model.getInput() != model0.getInput())[malicious_nodes].sum().item()
+            test_continuous(model=model, model0=model0, malicious_nodes=malicious_nodes,
                             attacked_nodes=attacked_nodes, changed_attributes=changed_attributes,
                             max_attributes=l_0_max_attributes, l_inf=attack.l_inf)
             # test
-            results = test(data=data, model=embeded_model, targeted=attack.targeted, attacked_nodes=attacked_nodes,
-                           y_targets=y_targets)
+            results = test(data=data, model=model, targeted=attack.targeted, attacked_nodes=attacked_nodes,
+                           y_targets=y_targets, compute_accuracies=print_answer is Print.YES)
             if results[3]:
                 if print_answer is Print.YES:
                     print(log_template.format(node_num, epoch + 1, *results[:-1]), flush=True, end='')
                 break
 
-            if previous_embeded_model is not None:
-                if torch.norm(embeded_model.getInput() - previous_embeded_model.getInput(), p='fro') == 0:
+            # only the malicious rows differ between two embedded models
+            embeded_attributes = model.getInput(nodes=malicious_nodes).detach()
+            model.restoreSnapshot(trained_model)
+            if previous_embeded_attributes is not None:
+                if torch.norm(embeded_attributes - previous_embeded_attributes, p='fro') == 0:
                     if print_answer is Print.YES:
                         print(log_template.format(node_num, epoch + 1, *results[:-1]), flush=True, end='')
                     break
-            previous_embeded_model = copy.deepcopy(embeded_model)
+            previous_embeded_attributes = embeded_attributes
         
         # prints
         if print_answer is Print.YES:
@@ -116,9 +126,156 @@ def attackTrainerContinuous(attack, attacked_nodes: torch.Tensor, y_targets: tor
     if not results[3]:
         changed_attributes = max_attributes
 
-    if attack.mode.isAdversarial():
-        if results[3]:
-            attack.setModel(embeded_model)
-        else:
-            attack.setModel(model0)
+    if attack.mode.isAdversarial() and not results[3]:
+        model.restoreSnapshot(model0)
     return torch.tensor([[results[3], changed_attributes]]).type(torch.long)
+
+
+def attackTrainerContinuousSweep(attack, attacked_nodes: torch.Tensor, y_targets: torch.Tensor,
+                                 malicious_nodes: torch.Tensor, node_num: int) -> torch.Tensor:
+    """
+        attackTrainerContinuous for every l_0 of attack.l_0_sweep, with a single training trajectory
+        the training steps of attackTrainerContinuous do not depend on l_0 (only the embedding does),
+        so the trained attributes are embedded for every l_0 which is still unresolved after each epoch,
+        and each l_0 gets the result that attackTrainerContinuous would have returned for it
+
+        Parameters
+        ----------
+        attack: oneGNNAttack
+        attacked_nodes: torch.Tensor - the victim nodes
+        y_targets: torch.Tensor - the target labels of the attack
+        malicious_nodes: torch.Tensor - the attacker/malicious node
+        node_num: int - the index of the attacked/victim node (out of the train/val/test-set)
+
+        Returns
+        -------
+        attack_results: torch.Tensor - 2d-tensor with a single row that includes for each l_0 of attack.l_0_sweep
+                                       the defence and the number of attributes used (as in attackTrainerContinuous)
+    """
+    # initialize
+    model = attack.model_wrapper.model
+    l_0_sweep = attack.l_0_sweep
+    print_answer = attack.print_answer
+    dataset = attack.getDataset()
+    data = dataset.data
+
+    num_attributes = data.x.shape[1]
+    max_attributes = num_attributes * malicious_nodes.shape[0]
+
+    log_template = createLogTemplate(attack=attack, dataset=dataset)
+
+    # changing the parameters which require grads and setting adversarial optimizer
+    optimizer_params = setRequiresGrad(model=model, malicious_nodes=malicious_nodes)
+    optimizer = torch.optim.Adam(params=optimizer_params, lr=attack.lr)
+
+    # the previously embedded attributes of each unresolved l_0
+    model0 = model.takeSnapshot()
+    unresolved = {l_0_idx: None for l_0_idx in range(len(l_0_sweep))}
+    sweep_results = [[0, max_attributes] for _ in l_0_sweep]
+    for epoch in range(0, attack.continuous_epochs):
+        # train
+        train(model=model, targeted=attack.targeted, attacked_nodes=attacked_nodes, y_targets=y_targets,
+              optimizer=optimizer)
+        is_zero_grad = model.is_zero_grad()
+
+        # test correctness
+        if not is_zero_grad:
+            changed_attributes = (model.getInput() != model0.getInput())[malicious_nodes].sum().item()
+            test_discrete(model=model, model0=model0, malicious_nodes=malicious_nodes, attacked_nodes=attacked_nodes,
+                          changed_attributes=changed_attributes, max_attributes=max_attributes)
+
+        # test
+        results = test(data=data, model=model, targeted=attack.targeted, attacked_nodes=attacked_nodes,
+                       y_targets=y_targets, compute_accuracies=print_answer is Print.YES)
+        if print_answer is Print.YES:
+            print(log_template.format(node_num, epoch + 1, *results[:-1]), flush=True, end='')
+
+        # breaks
+        if is_zero_grad:
+            for l_0_idx in unresolved:
+                sweep_results[l_0_idx] = [results[3], 0 if results[3] else max_attributes]
+            break
+
+        if results[3]:
+            # embed each unresolved l_0 in place, and restore the trained (not embedded) rows after it
+            trained_model = model.takeSnapshot()
+            for l_0_idx, previous_embeded_attributes in list(unresolved.items()):
+                l_0 = l_0_sweep[l_0_idx]
+                for malicious_node in malicious_nodes:
+                    embedRowContinuous(model=model, malicious_node=malicious_node, model0=model0,
+                                       l_inf=attack.l_inf, l_0=l_0)
+
+                # test correctness
+                changed_attributes = (model.getInput() != model0.getInput())[malicious_nodes].sum().item()
+                test_continuous(model=model, model0=model0, malicious_nodes=malicious_nodes,
+                                attacked_nodes=attacked_nodes, changed_attributes=changed_attributes,
+                                max_attributes=int(num_attributes * l_0) * malicious_nodes.shape[0],
+                                l_inf=attack.l_inf)
+                # test
+                embeded_results = test(data=data, model=model, targeted=attack.targeted,
+                                       attacked_nodes=attacked_nodes, y_targets=y_targets, compute_accuracies=False)
+                embeded_attributes = model.getInput(nodes=malicious_nodes).detach()
+                model.restoreSnapshot(trained_model)
+                if embeded_results[3]:
+                    sweep_results[l_0_idx] = [embeded_results[3], changed_attributes]
+                    del unresolved[l_0_idx]
+                elif previous_embeded_attributes is not None and \
+                        torch.norm(embeded_attributes - previous_embeded_attributes, p='fro') == 0:
+                    del unresolved[l_0_idx]
+                else:
+                    unresolved[l_0_idx] = embeded_attributes
+            if not unresolved:
+                break
+
+        if epoch != attack.continuous_epochs - 1 and print_answer is not Print.NO:
+            print()
+
+    if print_answer is Print.YES:
+        num_successes = sum(bool(success) for success, _ in sweep_results)
+        print(', Attack Success: {}/{} l_0 values\n'.format(num_successes, len(l_0_sweep)), flush=True)
+    return torch.tensor([sum(sweep_results, [])]).type(torch.long)
+
+
+def attackTrainerContinuousLinfSweep(attack, attacked_nodes: torch.Tensor, y_targets: torch.Tensor,
+                                     malicious_nodes: torch.Tensor, node_num: int) -> torch.Tensor:
+    """
+        attackTrainerContinuous for every l_inf of attack.l_inf_sweep, by continuation in increasing order of l_inf:
+        a victim which is attacked successfully with some l_inf is solved for all the larger l_inf values
+        (without attacking it again), and otherwise the attack of the next l_inf is warm-started
+        from the attributes of the previous attack, projected onto the limits of the previous l_inf
+        important note: the results can differ from independent attacks of each l_inf (from the clean attributes)
+
+        Parameters
+        ----------
+        attack: oneGNNAttack
+        attacked_nodes: torch.Tensor - the victim nodes
+        y_targets: torch.Tensor - the target labels of the attack
+        malicious_nodes: torch.Tensor - the attacker/malicious node
+        node_num: int - the index of the attacked/victim node (out of the train/val/test-set)
+
+        Returns
+        -------
+        attack_results: torch.Tensor - 2d-tensor with a single row that includes for each l_inf of attack.l_inf_sweep
+                                       the defence and the number of attributes used (as in attackTrainerContinuous)
+    """
+    model = attack.model_wrapper.model
+    l_inf_sweep, l_inf = attack.l_inf_sweep, attack.l_inf
+    model0 = model.takeSnapshot()
+
+    sweep_results = [None] * len(l_inf_sweep)
+    attack_results = None
+    for l_inf_idx in sorted(range(len(l_inf_sweep)), key=lambda idx: l_inf_sweep[idx]):
+        if attack_results is None or not attack_results[0][0]:
+            attack.l_inf = l_inf_sweep[l_inf_idx]
+            attack_results = attackTrainerContinuous(attack, attacked_nodes, y_targets, malicious_nodes, node_num,
+                                                     model0=model0)
+            if not attack_results[0][0]:
+                with torch.no_grad():
+                    rows = model.getInput(nodes=malicious_nodes).detach().clone()
+                    projectRowsContinuous(rows=rows, rows0=model0.getInput(nodes=malicious_nodes),
+                                          l_inf=attack.l_inf, l_0=attack.l_0)
+                for malicious_node, row in zip(malicious_nodes, rows):
+                    model.setNodesAttributes(idx_node=malicious_node, values=row)
+        sweep_results[l_inf_idx] = attack_results
+    attack.l_inf = l_inf
+    return torch.cat(sweep_results, dim=1)
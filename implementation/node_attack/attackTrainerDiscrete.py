@@ -1,18 +1,21 @@
-from node_attack.attackTrainerHelpers import createLogTemplate, setRequiresGrad, train, test, flipUpBestNewAttributes
+from node_attack.attackTrainerHelpers import (createLogTemplate, setRequiresGrad, train, test, flipSchedule,
+                                              flipUpBestNewAttributes, refineFlippedAttributes)
 from classes.basic_classes import Print
 from node_attack.attackTrainerTests import test_discrete
 
 import torch
-import copy
 
 
 def attackTrainerDiscrete(attack, attacked_nodes: torch.Tensor, y_targets: torch.Tensor, malicious_nodes: torch.Tensor,
-                          node_num: int, discrete_stop_after_1iter: bool) -> torch.Tensor:
+                          node_num: int) -> torch.Tensor:
     """
         a trainer function that attacks our model by changing the input attribute for a limited number of attributes
         1.attack the model with i attributes
         2.backprop
-        3.add the attribute with the largest gradient as the i+1 attribute
+        3.add the attributes with the largest gradient as the next attributes
+        the number of attributes added per round follows the flip schedule of the attack:
+        attack.flip_k attributes per malicious node in the first round, growing by a factor of attack.flip_growth,
+        and when attack.flip_refine is set the successful round is refined to its minimal successful prefix
 
         Parameters
         ----------
@@ -21,8 +24,6 @@ def attackTrainerDiscrete(attack, attacked_nodes: torch.Tensor, y_targets: torch
         y_targets: torch.Tensor - the target labels of the attack
         malicious_nodes: torch.Tensor - the attacker/malicious node
         node_num: int - the index of the attacked/victim node (out of the train/val/test-set)
-        discrete_stop_after_1iter: bool - whether or not to stop the discrete after 1 iteration
-                                          this is a specific flag for the GRAD_CHOICE Approach
 
         Returns
         -------
@@ -54,16 +55,16 @@ def attackTrainerDiscrete(attack, attacked_nodes: torch.Tensor, y_targets: torch
     with torch.no_grad():
         changed_attributes = 0
         for malicious_node in malicious_nodes:
-            changed_attributes += model.node_attribute_list[malicious_node][0].sum().item()
+            changed_attributes += model.getNodesAttributes(malicious_node).sum().item()
             model.setNodesAttributes(idx_node=malicious_node, values=torch.zeros(num_attributes))
 
-    # flip the attribute with the largest gradient
-    model0 = copy.deepcopy(model)
+    # flip the attributes with the largest gradient
+    model0 = model.takeSnapshot()
     changed_attributes, prev_changed_attributes = 0, 0
     num_attributes_left = l_0_max_attributes_per_malicious * torch.ones_like(malicious_nodes).to(attack.device)
     while True:
         epoch += 1
-        prev_model = copy.deepcopy(model)
+        prev_model = model.takeSnapshot()
         # train
         train(model=model, targeted=attack.targeted, attacked_nodes=attacked_nodes, y_targets=y_targets,
               optimizer=optimizer)
@@ -71,8 +72,16 @@ def attackTrainerDiscrete(attack, attacked_nodes: torch.Tensor, y_targets: torch
 
         # test correctness
         if not is_zero_grad:
-            num_attributes_left = flipUpBestNewAttributes(model=model, model0=prev_model, malicious_nodes=malicious_nodes,
-                                                          num_attributes_left=num_attributes_left)
+            num_flips = flipSchedule(flip_k=attack.flip_k, flip_growth=attack.flip_growth, epoch=epoch)
+            num_attributes_left, flip_scores = \
+                flipUpBestNewAttributes(model=model, model0=prev_model, malicious_nodes=malicious_nodes,
+                                        num_attributes_left=num_attributes_left, num_flips=num_flips)
+            if attack.flip_refine:
+                num_attributes_left = \
+                    refineFlippedAttributes(model=model, model0=prev_model, malicious_nodes=malicious_nodes,
+                                            num_attributes_left=num_attributes_left, flip_scores=flip_scores,
+                                            targeted=attack.targeted, attacked_nodes=attacked_nodes,
+                                            y_targets=y_targets)
             changed_attributes = limited_max_attributes - num_attributes_left.sum().item()
 
             test_discrete(model=model, model0=model0, malicious_nodes=malicious_nodes, attacked_nodes=attacked_nodes,
@@ -82,7 +91,7 @@ def attackTrainerDiscrete(attack, attacked_nodes: torch.Tensor, y_targets: torch
 
         # test
         results = test(data=data, model=model, targeted=attack.targeted, attacked_nodes=attacked_nodes,
-                       y_targets=y_targets)
+                       y_targets=y_targets, compute_accuracies=print_answer is Print.YES)
 
         # prints
         if print_answer is not Print.NO and epoch != 1:
@@ -95,8 +104,6 @@ def attackTrainerDiscrete(attack, attacked_nodes: torch.Tensor, y_targets: torch
         if results[3] or changed_attributes == limited_max_attributes or changed_attributes == prev_changed_attributes:
             break
         prev_changed_attributes = changed_attributes
-        if discrete_stop_after_1iter:
-            break
 
     if print_answer is Print.YES:
         final_log = ''
@@ -1,14 +1,25 @@
 from classes.basic_classes import DatasetType
-from node_attack.attackTrainerContinuous import attackTrainerContinuous
+from node_attack.attackTrainerContinuous import (attackTrainerContinuous, attackTrainerContinuousSweep,
+                                                 attackTrainerContinuousLinfSweep)
+from node_attack.attackTrainerPGD import attackTrainerPGD
 from node_attack.attackTrainerDiscrete import attackTrainerDiscrete
+from model_functions.victim_subgraph import useVictimSubgraph
+from model_functions.model_snapshot import ModelSnapshot
 
+from typing import Optional
 import torch
 
 
 def attackTrainer(attack, attacked_nodes: torch.Tensor, y_targets: torch.Tensor, malicious_nodes: torch.Tensor,
-                  node_num: int, discrete_stop_after_1iter: bool = False):
+                  node_num: int):
     """
         a gateway function between the two attack algorithms
+        when attack.subgraph is set, both algorithms run on the receptive field of the victim only
+        when attack.pgd is set, continuous datasets are attacked by the projected-gradient trainer
+        when attack.l_0_sweep is set, continuous datasets are attacked for all its l_0 values at once
+        (and the attack results include the defence and the number of attributes for each of them),
+        and the same goes for attack.l_inf_sweep, which is attacked by continuation
+        when attack.warm_start is set, the (plain) continuous attack is warm-started from its rows (see warmStart)
 
         Parameters
         ----------
@@ -17,8 +28,6 @@ def attackTrainer(attack, attacked_nodes: torch.Tensor, y_targets: torch.Tensor,
         y_targets: torch.Tensor - the target labels of the attack
         malicious_nodes: torch.Tensor - the attacker/malicious node
         node_num: int - the index of the attacked/victim node (out of the train/val/test-set)
-        discrete_stop_after_1iter: bool - whether or not to stop the discrete after 1 iteration
-                                          this is a specific flag for the GRAD_CHOICE Approach
 
         Returns
         -------
@@ -28,10 +37,52 @@ def attackTrainer(attack, attacked_nodes: torch.Tensor, y_targets: torch.Tensor,
         if the number of attributes is 0 the node is misclassified to begin with
     """
     dataset = attack.getDataset()
-    if dataset.type is DatasetType.CONTINUOUS:
-        return attackTrainerContinuous(attack, attacked_nodes, y_targets, malicious_nodes, node_num)
+    if attack.subgraph:
+        useVictimSubgraph(model=attack.model_wrapper.model, attacked_nodes=attacked_nodes)
+
+    if dataset.type is DatasetType.CONTINUOUS and attack.pgd:
+        attack_results = attackTrainerPGD(attack, attacked_nodes, y_targets, malicious_nodes, node_num)
+    elif dataset.type is DatasetType.CONTINUOUS and attack.l_inf_sweep is not None:
+        attack_results = attackTrainerContinuousLinfSweep(attack, attacked_nodes, y_targets, malicious_nodes, node_num)
+    elif dataset.type is DatasetType.CONTINUOUS and attack.l_0_sweep is not None:
+        attack_results = attackTrainerContinuousSweep(attack, attacked_nodes, y_targets, malicious_nodes, node_num)
+    elif dataset.type is DatasetType.CONTINUOUS:
+        model0 = warmStart(attack=attack, malicious_nodes=malicious_nodes)
+        attack_results = attackTrainerContinuous(attack, attacked_nodes, y_targets, malicious_nodes, node_num,
+                                                 model0=model0)
     elif dataset.type is DatasetType.DISCRETE:
-        return attackTrainerDiscrete(attack, attacked_nodes, y_targets, malicious_nodes, node_num,
-                                     discrete_stop_after_1iter)
+        attack_results = attackTrainerDiscrete(attack, attacked_nodes, y_targets, malicious_nodes, node_num)
     else:
         quit("Unrecognised dataset")
+
+    attack.model_wrapper.model.removeVictimSubgraph()
+    return attack_results
+
+
+def warmStart(attack, malicious_nodes: torch.Tensor) -> Optional[ModelSnapshot]:
+    """
+        writes the rows of attack.warm_start (more information at adversarial_attack.harmfulInputCache.HarmfulInput)
+        into the model, only for the malicious nodes which were chosen for this attack
+        the rows of other nodes are not written, as they would stay in the model without being attacked
+
+        Parameters
+        ----------
+        attack: oneGNNAttack
+        malicious_nodes: torch.Tensor - the attacker/malicious node
+
+        Returns
+        -------
+        model0: Optional[ModelSnapshot] - the model before the warm start, None when no row was written
+    """
+    warm_start = attack.warm_start
+    if warm_start is None:
+        return None
+    is_chosen = (warm_start.malicious_nodes.unsqueeze(1) == malicious_nodes.view(1, -1)).any(dim=1)
+    if not is_chosen.any():
+        return None
+
+    model = attack.model_wrapper.model
+    model0 = model.takeSnapshot()
+    for malicious_node, row in zip(warm_start.malicious_nodes[is_chosen], warm_start.rows[is_chosen]):
+        model.setNodesAttributes(idx_node=malicious_node, values=row)
+    return model0
@@ -1,9 +1,13 @@
 from classes.basic_classes import DatasetType
+from model_functions.victim_subgraph import fullForward, victimLogits
 
-from typing import List, Dict
+from typing import List, Dict, NamedTuple, Optional, Tuple
+import math
 import torch
+from torch import nn
 import torch.nn.functional as F
 import torch_geometric
+import weakref
 
 
 def createLogTemplate(attack, dataset):
@@ -42,20 +46,10 @@ def setRequiresGrad(model, malicious_nodes: torch.Tensor) -> List[Dict]:
         for p in layer.parameters():
             p.detach()
             p.requires_grad = False
-    for row in model.node_attribute_list:
-        row.detach()
-        row.requires_grad = False
 
-    # specifying adversarial parameters and constructing list
-    if malicious_nodes.shape[0] == 1:
-        malicious_node_indexes = [malicious_nodes.item()]
-    else:
-        malicious_node_indexes = malicious_nodes.tolist()
-    malicious_row_list = [model.node_attribute_list[idx] for idx in malicious_node_indexes]
-    for row in malicious_row_list:
-        row.requires_grad = True
-
-    return [dict(params=malicious_row_list)]
+    # specifying adversarial parameters - only the rows of the malicious nodes
+    malicious_rows = model.feature_store.setPerturbedNodes(malicious_nodes)
+    return [dict(params=[malicious_rows])]
 
 
 def train(model, targeted: bool, attacked_nodes: torch.Tensor, y_targets: torch.Tensor, optimizer: torch.optim):
@@ -73,27 +67,59 @@ def train(model, targeted: bool, attacked_nodes: torch.Tensor, y_targets: torch.
     model.train()
     optimizer.zero_grad()
 
-    attacked_nodes = [attacked_nodes.item()]
-    model_output = model()[attacked_nodes]
+    loss = attackLoss(model=model, targeted=targeted, attacked_nodes=attacked_nodes, y_targets=y_targets)
+    loss.backward()
+
+    optimizer.step()
+
+    model.eval()
+
+
+def attackLoss(model, targeted: bool, attacked_nodes: torch.Tensor, y_targets: torch.Tensor) -> torch.Tensor:
+    """
+        the loss which the attack minimizes, from the current mode of the model
+        (the eval mode is used when the train mode output is degenerate)
+
+        Parameters
+        -------
+        model: Model
+        targeted: bool
+        attacked_nodes: torch.Tensor
+        y_targets: torch.Tensor - the target labels of the attack
+
+        Returns
+        -------
+        loss: torch.Tensor
+    """
+    model_output = victimLogits(model=model, attacked_nodes=attacked_nodes)
 
     if torch.sum(model_output - model_output[:y_targets.shape[0], y_targets]) == 0:
         model.eval()
-        model_output = model()[attacked_nodes]
+        model_output = victimLogits(model=model, attacked_nodes=attacked_nodes)
 
     loss = F.nll_loss(model_output, y_targets)
-    loss = loss if targeted else -loss
-    loss.backward()
+    return loss if targeted else -loss
 
-    optimizer.step()
 
-    model.eval()
+class VictimResult(NamedTuple):
+    """
+        a VictimResult object with the following fields:
+        success - attack success (True, False), or the attack success rate for multiple victims
+        margin - the margin of the attack for each victim, positive when the attack succeeds on the victim
+    """
+    success: float
+    margin: torch.Tensor
+
+
+# the mask accuracies of the last tested version of each model, dropped together with the model
+_mask_accuracies_cache = weakref.WeakKeyDictionary()
 
 
 # a function which test the model with all masks and tests the attack
 # returns the accuracies of the test AKA attack_results
 @torch.no_grad()
 def test(data: torch_geometric.data.Data, model, targeted: bool, attacked_nodes: torch.Tensor,
-         y_targets: torch.Tensor) -> torch.Tensor:
+         y_targets: torch.Tensor, compute_accuracies: bool = True) -> torch.Tensor:
     """
         tests the model according to the train/val/test masks and attack mask
 
@@ -104,32 +130,188 @@ def test(data: torch_geometric.data.Data, model, targeted: bool, attacked_nodes:
         targeted: bool
         attacked_nodes: torch.Tensor
         y_targets: torch.Tensor - the target labels of the attack
+        compute_accuracies: bool - whether or not to compute the train/val/test accuracies
+                                   when False, they are returned as nan
 
         Returns
         -------
         accuracies: : torch.Tensor - train, val, test, misclassified/attack success (True, False)
     """
     model.eval()
-    logits, accuracies = model(), []
-    for _, mask in data('train_mask', 'val_mask', 'test_mask'):
-        pred = logits[mask].max(1)[1]
-        acc = pred.eq(data.y[mask]).sum().item() / mask.sum().item()
-        accuracies.append(acc)
+    logits = None
+    if compute_accuracies:
+        accuracies, logits = maskAccuracies(data=data, model=model)
+    else:
+        accuracies = [float('nan')] * 3
+
+    model_res = None
+    if logits is not None and model.victim_subgraph is None:
+        model_res = logits[attacked_nodes]
+    victim_result = testVictim(model=model, targeted=targeted, attacked_nodes=attacked_nodes, y_targets=y_targets,
+                               model_res=model_res)
+    accuracies.append(victim_result.success)
+    return accuracies
 
-    model_res = logits[attacked_nodes]
 
-    # edge case where a model in train mode is mistaken
-    model.train()
-    train_model_res = model()[attacked_nodes]
-    y_targets_acc = model_res2targets_acc(targeted=targeted, y_targets=y_targets, model_res=train_model_res)
-    model.eval()
-    if y_targets_acc:
-        accuracies.append(y_targets_acc)
-        return accuracies
+@torch.no_grad()
+def testVictim(model, targeted: bool, attacked_nodes: torch.Tensor, y_targets: torch.Tensor,
+               model_res: Optional[torch.Tensor] = None) -> VictimResult:
+    """
+        tests the attack on the victim nodes only, with a single forward
+        a second forward (in train mode) is used only for models which behave differently in train mode,
+        as the attack also succeeds when such a model in train mode is mistaken
 
+        Parameters
+        ----------
+        model: Model
+        targeted: bool
+        attacked_nodes: torch.Tensor
+        y_targets: torch.Tensor - the target labels of the attack
+        model_res: Optional[torch.Tensor] - the eval mode output of the victim nodes, when already computed
+
+        Returns
+        -------
+        victim_result: VictimResult
+    """
+    model.eval()
+    if model_res is None:
+        model_res = victimLogits(model=model, attacked_nodes=attacked_nodes)
     y_targets_acc = model_res2targets_acc(targeted=targeted, y_targets=y_targets, model_res=model_res)
-    accuracies.append(y_targets_acc)
-    return accuracies
+
+    # edge case where a model in train mode is mistaken
+    if isTrainModeSensitive(model):
+        model.train()
+        train_model_res = victimLogits(model=model, attacked_nodes=attacked_nodes)
+        model.eval()
+        train_y_targets_acc = model_res2targets_acc(targeted=targeted, y_targets=y_targets,
+                                                    model_res=train_model_res)
+        if train_y_targets_acc:
+            y_targets_acc = train_y_targets_acc
+
+    return VictimResult(success=y_targets_acc,
+                        margin=victimMargin(targeted=targeted, y_targets=y_targets, model_res=model_res))
+
+
+def victimMargin(targeted: bool, y_targets: torch.Tensor, model_res: torch.Tensor) -> torch.Tensor:
+    """
+        the margin of the attack for each victim
+        targeted - the gap between the target class and the best other class
+        untargeted - the gap between the best other class and the correct class
+
+        Parameters
+        ----------
+        targeted: bool
+        y_targets: torch.Tensor - the target labels of the attack
+        model_res: torch.Tensor - model result for the attacked nodes
+
+        Returns
+        -------
+        margin: torch.Tensor
+    """
+    y_targets = y_targets.view(-1, 1).to(model_res.device)
+    target_res = model_res.gather(1, y_targets).squeeze(1)
+    other_res = model_res.scatter(1, y_targets, float('-inf')).max(1)[0]
+    margin = target_res - other_res
+    return margin if targeted else -margin
+
+
+@torch.no_grad()
+def maskAccuracies(data: torch_geometric.data.Data, model) -> Tuple[List[float], Optional[torch.Tensor]]:
+    """
+        the accuracies of the model on the train/val/test masks, with a single host-device sync
+        the accuracies are cached per model and model version, so an unchanged model is not tested twice
+
+        Parameters
+        ----------
+        data: torch_geometric.data.Data
+        model: Model
+
+        Returns
+        -------
+        accuracies: List[float] - train, val, test
+        logits: Optional[torch.Tensor] - the output of all nodes, None when the accuracies are cached
+    """
+    version = _testVersion(data=data, model=model)
+    cached = _mask_accuracies_cache.get(model) if version is not None else None
+    if cached is not None and _isSameVersion(version, cached[0]):
+        return list(cached[1]), None
+
+    logits = fullForward(model)
+    pred = logits.max(1)[1]
+    masks = [mask for _, mask in data('train_mask', 'val_mask', 'test_mask')]
+    counts = torch.stack([pred[mask].eq(data.y[mask]).sum() for mask in masks] + [mask.sum() for mask in masks])
+    counts = counts.tolist()
+    accuracies = [correct / total for correct, total in zip(counts[:3], counts[3:])]
+
+    if version is not None:
+        _mask_accuracies_cache[model] = (version, accuracies)
+    return list(accuracies), logits
+
+
+def _testVersion(data: torch_geometric.data.Data, model) -> Optional[List[Tuple]]:
+    """
+        the objects which the mask accuracies depend on, together with their version counters
+        None when the model can not be versioned (its edge weights are changed without a version counter)
+    """
+    feature_store = getattr(model, 'feature_store', None)
+    if feature_store is None or getattr(model, 'edge_weight', None) is not None:
+        return None
+    tensors = list(model.parameters()) + list(model.buffers()) + [model.edge_index,
+                                                                  feature_store.perturbed_attributes]
+    tensors += [tensor for _, tensor in data('train_mask', 'val_mask', 'test_mask', 'y')]
+    return [(tensor, tensor._version) for tensor in tensors] + [(feature_store, feature_store.version)]
+
+
+def _isSameVersion(version: List[Tuple], other_version: List[Tuple]) -> bool:
+    """
+        compares two versions by the identity of their objects and by their version counters
+    """
+    if len(version) != len(other_version):
+        return False
+    return all(obj is other_obj and obj_version == other_obj_version
+               for (obj, obj_version), (other_obj, other_obj_version) in zip(version, other_version))
+
+
+@torch.no_grad()
+def isTrainModeSensitive(model) -> bool:
+    """
+        whether or not the output of the model in train mode can differ from its output in eval mode
+        (e.g. dropout, batch normalization), cached on the model per model.attack (which disables dropout in Model)
+        important note: the check does not change the state of the random generators
+
+        Parameters
+        ----------
+        model: Model
+
+        Returns
+        -------
+        is_sensitive: bool
+    """
+    if not hasattr(model, 'train_mode_sensitive'):
+        model.train_mode_sensitive = {}
+    attack = getattr(model, 'attack', False)
+    if attack in model.train_mode_sensitive:
+        return model.train_mode_sensitive[attack]
+
+    # modules which change their state in train mode
+    is_sensitive = False
+    for module in model.modules():
+        if isinstance(module, nn.modules.batchnorm._BatchNorm) or getattr(module, '_do_cache_adj_prep', False):
+            is_sensitive = True
+
+    if not is_sensitive:
+        training = model.training
+        devices = [torch.cuda.current_device()] if torch.cuda.is_available() else []
+        with torch.random.fork_rng(devices=devices):
+            model.eval()
+            eval_logits = fullForward(model)
+            model.train()
+            train_logits = fullForward(model)
+        model.train(training)
+        is_sensitive = not torch.equal(eval_logits, train_logits)
+
+    model.train_mode_sensitive[attack] = is_sensitive
+    return is_sensitive
 
 
 @torch.no_grad()
@@ -157,10 +339,12 @@ def model_res2targets_acc(targeted: bool, y_targets: torch.Tensor, model_res: to
     if targeted:
         pred[edge_case_vec] = y_targets[edge_case_vec]
     else:
-        for node_idx in range(model_res.shape[0]):
-            for class_idx in range(model_res.shape[1]):
-                if model_res[node_idx, class_idx] == pred_val[node_idx] and class_idx != y_targets[node_idx]:
-                    pred[node_idx] = class_idx
+        # the last class (other than y_target) with the maximal prob
+        classes = torch.arange(model_res.shape[1], device=model_res.device)
+        other_max_mask = torch.logical_and(diff_prob_mat == 0, classes.unsqueeze(0) != y_targets.view(-1, 1))
+        last_other_max, _ = torch.where(other_max_mask, classes.unsqueeze(0), classes.new_tensor(-1)).max(1)
+        has_other_max = last_other_max >= 0
+        pred[has_other_max] = last_other_max[has_other_max]
     # end of edge case
 
     if y_targets.shape[0] == 1:
@@ -175,56 +359,130 @@ def model_res2targets_acc(targeted: bool, y_targets: torch.Tensor, model_res: to
     return y_targets_acc
 
 
+def flipSchedule(flip_k: int, flip_growth: float, epoch: int) -> int:
+    """
+        the number of attributes to flip per malicious node in a round of the discrete attack:
+        flip_k in the first round, growing by a factor of flip_growth per round
+
+        Parameters
+        ----------
+        flip_k: int - the number of attributes to flip in the first round
+        flip_growth: float - the growth factor of the number of attributes per round
+        epoch: int - the round, starting from 1
+
+        Returns
+        -------
+        num_flips: int
+    """
+    return math.ceil(flip_k * flip_growth ** (epoch - 1))
+
+
 @torch.no_grad()
-def flipUpBestNewAttributes(model, model0, malicious_nodes: torch.Tensor, num_attributes_left: torch.Tensor)\
-        -> torch.Tensor:
+def flipUpBestNewAttributes(model, model0, malicious_nodes: torch.Tensor, num_attributes_left: torch.Tensor,
+                            num_flips: int = 1) -> Tuple[torch.Tensor, torch.Tensor]:
     """
-        tests the model according to the train/val/test masks and attack mask
+        flips up, for each malicious node, the (at most) num_flips attributes with the largest gradient step
+        ties with the num_flips-th largest step are flipped as well, as long as the attribute limit allows
 
         Parameters
         ----------
         model: Model - post-attack model
         model0: Model - pre-attack model
         malicious_nodes: torch.Tensor - the attacker/malicious node
-        num_attributes_left: torch.Tensor -  a torch tensor vector with ones where the attribute is not flipped
+        num_attributes_left: torch.Tensor -  the number of attributes which each malicious node can still flip
+        num_flips: int - the number of attributes to flip per malicious node
 
         Returns
         -------
-        num_attributes_left: torch.Tensor -  a torch tensor vector with ones where the attribute is not flipped
+        num_attributes_left: torch.Tensor -  the number of attributes which each malicious node can still flip
+        flip_scores: torch.Tensor - the gradient step of each flipped attribute (zero for the other attributes)
     """
-    for malicious_idx, malicious_node in enumerate(malicious_nodes):
-        row = model.node_attribute_list[malicious_node][0]
-        row0 = model0.node_attribute_list[malicious_node][0]
+    rows = model.getInput(nodes=malicious_nodes).detach()
+    rows0 = model0.getInput(nodes=malicious_nodes)
 
-        # exclude attributes which are already used and attributes with negative gradient
-        zero_mask = torch.logical_or(row < row0, row0 == 1)
-        diff = row - row0
-        diff[zero_mask] = 0
+    # exclude attributes which are already used and attributes with negative gradient
+    diff = torch.clamp(rows - rows0, min=0)
+    diff[rows0 == 1] = 0
 
-        # find best gradient indexes
-        row = row0.clone().detach()
-        max_diff = diff.max()
-        flip_indexes = (diff == max_diff).nonzero(as_tuple=True)[0]
+    # find best gradient indexes
+    threshold = torch.topk(diff, k=min(num_flips, diff.shape[1]), dim=1)[0][:, -1:]
+    is_flipped = torch.logical_and(diff >= threshold, diff > 0)
 
-        # check if attribute limit exceeds
-        if num_attributes_left[malicious_idx] < flip_indexes.shape[0]:
-            flip_indexes = flip_indexes[:num_attributes_left[malicious_idx]]
+    # check if attribute limit exceeds
+    is_within_limit = torch.cumsum(is_flipped.long(), dim=1) <= num_attributes_left.view(-1, 1)
+    is_flipped = torch.logical_and(is_flipped, is_within_limit)
 
-        # flip
-        if max_diff != 0:
-            row[flip_indexes] = 1
-            num_attributes_left[malicious_idx] -= flip_indexes.shape[0]
+    # flip
+    rows = rows0.clone()
+    rows[is_flipped] = 1
+    num_attributes_left = num_attributes_left - is_flipped.sum(dim=1)
+
+    # save flipped gradients
+    for malicious_idx, malicious_node in enumerate(malicious_nodes):
+        model.setNodesAttributes(idx_node=malicious_node, values=rows[malicious_idx])
+    return num_attributes_left, torch.where(is_flipped, diff, torch.zeros_like(diff))
 
-        # save flipped gradients
-        model.setNodesAttributes(idx_node=malicious_node, values=row)
-    return num_attributes_left
+
+@torch.no_grad()
+def refineFlippedAttributes(model, model0, malicious_nodes: torch.Tensor, num_attributes_left: torch.Tensor,
+                            flip_scores: torch.Tensor, targeted: bool, attacked_nodes: torch.Tensor,
+                            y_targets: torch.Tensor) -> torch.Tensor:
+    """
+        when the last flips are successful, binary searches (in the order of their gradient step)
+        the minimal prefix of them which is still successful and keeps only that prefix
+
+        Parameters
+        ----------
+        model: Model - post-attack model
+        model0: Model - pre-attack model, before the last flips
+        malicious_nodes: torch.Tensor - the attacker/malicious node
+        num_attributes_left: torch.Tensor -  the number of attributes which each malicious node can still flip
+        flip_scores: torch.Tensor - the gradient step of each of the last flipped attributes
+                                    more information at flipUpBestNewAttributes
+        targeted: bool
+        attacked_nodes: torch.Tensor
+        y_targets: torch.Tensor - the target labels of the attack
+
+        Returns
+        -------
+        num_attributes_left: torch.Tensor -  the number of attributes which each malicious node can still flip
+    """
+    flipped_rows, flipped_attributes = flip_scores.nonzero(as_tuple=True)
+    num_flipped = flipped_rows.shape[0]
+    if num_flipped <= 1 or not testVictim(model=model, targeted=targeted, attacked_nodes=attacked_nodes,
+                                          y_targets=y_targets).success:
+        return num_attributes_left
+
+    order = torch.argsort(-flip_scores[flipped_rows, flipped_attributes])
+    flipped_rows, flipped_attributes = flipped_rows[order], flipped_attributes[order]
+    rows0 = model0.getInput(nodes=malicious_nodes)
+
+    def flipPrefix(num_flips: int):
+        rows = rows0.clone()
+        rows[flipped_rows[:num_flips], flipped_attributes[:num_flips]] = 1
+        for malicious_idx, malicious_node in enumerate(malicious_nodes):
+            model.setNodesAttributes(idx_node=malicious_node, values=rows[malicious_idx])
+
+    # the smallest successful prefix, the whole set of flips is known to be successful
+    low, high = 1, num_flipped
+    while low < high:
+        middle = (low + high) // 2
+        flipPrefix(middle)
+        if testVictim(model=model, targeted=targeted, attacked_nodes=attacked_nodes, y_targets=y_targets).success:
+            high = middle
+        else:
+            low = middle + 1
+    flipPrefix(high)
+
+    unflipped_rows = flipped_rows[high:]
+    return num_attributes_left + torch.bincount(unflipped_rows, minlength=malicious_nodes.shape[0])
 
 
 # embed the attribute row and limits the inf norm, only for continuous datasets
 @torch.no_grad()
 def embedRowContinuous(model, malicious_node, model0, l_inf, l_0):
-    row0 = model0.node_attribute_list[malicious_node][0]
-    row = model.node_attribute_list[malicious_node][0]
+    row0 = model0.getNodesAttributes(malicious_node)
+    row = model.getNodesAttributes(malicious_node)
     final_row = row0.clone()
     k = int(l_0 * row0.shape[0])
 
@@ -243,3 +501,20 @@ def embedRowContinuous(model, malicious_node, model0, l_inf, l_0):
     final_row[final_row < 0] = 0
 
     model.setNodesAttributes(idx_node=malicious_node, values=final_row)
+
+
+# projects the attribute rows onto the l_0/l_inf feasible set in place, only for continuous datasets
+# the same limits as embedRowContinuous, for all the malicious rows at once
+@torch.no_grad()
+def projectRowsContinuous(rows: torch.Tensor, rows0: torch.Tensor, l_inf: float, l_0: float):
+    k = int(l_0 * rows0.shape[1])
+
+    # limiting number of attributes
+    rows.clamp_(min=0)
+    largest_diff_indices = torch.topk((rows - rows0).abs(), k=k, dim=1)[1]
+    is_kept = torch.zeros_like(rows, dtype=torch.bool).scatter_(1, largest_diff_indices, True)
+    rows.copy_(torch.where(is_kept, rows, rows0))
+
+    # limiting the amplitude of attributes
+    rows.copy_(torch.max(torch.min(rows, rows0 + l_inf), rows0 - l_inf))
+    rows.clamp_(min=0)
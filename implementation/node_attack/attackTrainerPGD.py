@@ -0,0 +1,117 @@
+from node_attack.attackTrainerHelpers import (createLogTemplate, setRequiresGrad, train, testVictim, maskAccuracies,
+                                              projectRowsContinuous)
+from classes.basic_classes import Print
+from node_attack.attackTrainerTests import test_continuous
+
+import torch
+
+# the adaptive step: the learning rate is decayed whenever the margin of the attack does not improve by the tolerance
+# and the attack stops after PGD_PATIENCE such epochs in a row
+PGD_STEP_DECAY = 0.5
+PGD_MARGIN_TOLERANCE = 1e-4
+PGD_PATIENCE = 3
+
+
+def attackTrainerPGD(attack, attacked_nodes: torch.Tensor, y_targets: torch.Tensor,
+                     malicious_nodes: torch.Tensor, node_num: int) -> torch.Tensor:
+    """
+        a projected-gradient trainer function that attacks our model by changing the input attributes
+        after every step the malicious rows are projected, in place, onto the l_0/l_inf limits
+        so the attack is always embedded and no separate embedding pass is needed
+
+        Parameters
+        ----------
+        attack: oneGNNAttack
+        attacked_nodes: torch.Tensor - the victim nodes
+        y_targets: torch.Tensor - the target labels of the attack
+        malicious_nodes: torch.Tensor - the attacker/malicious node
+        node_num: int - the index of the attacked/victim node (out of the train/val/test-set)
+
+        Returns
+        -------
+        attack_results: torch.Tensor - 2d-tensor that includes
+                                       1st-col - the defence
+                                       2nd-col - the number of attributes used
+        if the number of attributes is 0 the node is misclassified to begin with
+    """
+    # initialize
+    model = attack.model_wrapper.model
+    continuous_epochs = attack.continuous_epochs
+    lr = attack.lr
+    print_answer = attack.print_answer
+    dataset = attack.getDataset()
+    data = dataset.data
+
+    num_attributes = data.x.shape[1]
+    l_0_max_attributes_per_malicious = int(num_attributes * attack.l_0)
+    l_0_max_attributes = l_0_max_attributes_per_malicious * malicious_nodes.shape[0]
+    max_attributes = num_attributes * malicious_nodes.shape[0]
+
+    log_template = createLogTemplate(attack=attack, dataset=dataset)
+
+    # changing the parameters which require grads and setting adversarial optimizer
+    optimizer_params = setRequiresGrad(model=model, malicious_nodes=malicious_nodes)
+    malicious_rows = optimizer_params[0]['params'][0]
+    optimizer = torch.optim.Adam(params=optimizer_params, lr=lr)
+
+    model0 = model.takeSnapshot()
+    rows0 = malicious_rows.detach().clone()
+    best_margin, epochs_without_improvement = None, 0
+    for epoch in range(0, continuous_epochs):
+        # train and project
+        train(model=model, targeted=attack.targeted, attacked_nodes=attacked_nodes, y_targets=y_targets,
+              optimizer=optimizer)
+        is_zero_grad = model.is_zero_grad()
+        projectRowsContinuous(rows=malicious_rows, rows0=rows0, l_inf=attack.l_inf, l_0=attack.l_0)
+
+        # test correctness
+        changed_attributes = (malicious_rows != rows0).sum().item()
+        if not is_zero_grad:
+            test_continuous(model=model, model0=model0, malicious_nodes=malicious_nodes,
+                            attacked_nodes=attacked_nodes, changed_attributes=changed_attributes,
+                            max_attributes=l_0_max_attributes, l_inf=attack.l_inf)
+
+        # test
+        victim_result = testVictim(model=model, targeted=attack.targeted, attacked_nodes=attacked_nodes,
+                                   y_targets=y_targets)
+        if print_answer is Print.YES:
+            results = maskAccuracies(data=data, model=model)[0]
+        else:
+            results = [float('nan')] * 3
+        results.append(victim_result.success)
+
+        # prints
+        if print_answer is Print.YES:
+            print(log_template.format(node_num, epoch + 1, *results[:-1]), flush=True, end='')
+
+        # breaks
+        if is_zero_grad or results[3]:
+            break
+
+        # adaptive step and early stopping on the convergence of the margin
+        margin = victim_result.margin.min().item()
+        if best_margin is None or margin > best_margin + PGD_MARGIN_TOLERANCE:
+            best_margin, epochs_without_improvement = margin, 0
+        else:
+            epochs_without_improvement += 1
+            if epochs_without_improvement == PGD_PATIENCE:
+                break
+            for param_group in optimizer.param_groups:
+                param_group['lr'] *= PGD_STEP_DECAY
+
+        if epoch != continuous_epochs - 1 and print_answer is not Print.NO:
+            print()
+
+    if print_answer is Print.YES:
+        final_log = ''
+        if results[3]:
+            attr_percent = changed_attributes / (num_attributes * malicious_nodes.shape[0])
+            final_log += ', l_0 used: {:.4f}'.format(attr_percent)
+        final_log += ', Attack Success: {}'.format(results[-1])
+        print(final_log + '\n', flush=True)
+    if not results[3]:
+        changed_attributes = max_attributes
+
+    if attack.mode.isAdversarial() and not results[3]:
+        model.restoreSnapshot(model0)
+    return torch.tensor([[results[3], changed_attributes]]).type(torch.long)
@@ -1,3 +1,5 @@
+from model_functions.victim_subgraph import victimLogits
+
 import torch
 
 
@@ -65,7 +67,7 @@ def test_discrete(model, model0, malicious_nodes: torch.Tensor, attacked_nodes:
     # An edge case where:
     # the log_softmax has a zero in it (as a result of huge differences in the values of the softmax).
     # Therefore, no perturbation of a feature would help
-    attacked_nodes_output = model()[attacked_nodes]
+    attacked_nodes_output = victimLogits(model=model, attacked_nodes=attacked_nodes)
     zeros_per_row = torch.all(attacked_nodes_output != 0, dim=1)
     rows_with_zeros = (zeros_per_row == 0).sum()
     assert len(indices_of_changed_nodes) >= 1 or rows_with_zeros == attacked_nodes.numel(), "#perturbed nodes is zero"
@@ -1,16 +1,19 @@
 from node_attack.attackTrainerGeneric import attackTrainer
-from node_attack.attackTrainerHelpers import test, createLogTemplate
-from helpers.algorithms import kBFS, heuristicApproach, gradientApproach
+from node_attack.attackTrainerHelpers import test, testVictim, createLogTemplate
+from helpers.algorithms import heuristicApproach, gradientApproach
+from dataset_functions.neighbourhood_index import getNeighbourhoodIndex
 from classes.approach_classes import Approach, NodeApproach
 from classes.basic_classes import Print, DatasetType
+from helpers.parallelVictims import getRandomState, setRandomState
+from model_functions.victim_subgraph import useVictimSubgraph
 
+from typing import List, Optional
 import torch_geometric
 import torch
-import copy
 
 
-def attackVictim(attack, approach: Approach, attacked_node: torch.Tensor, y_target: torch.Tensor, node_num: int)\
-        -> torch.Tensor:
+def attackVictim(attack, approach: Approach, attacked_node: torch.Tensor, y_target: torch.Tensor, node_num: int,
+                 neighbours_and_dist: Optional[torch.Tensor] = None) -> torch.Tensor:
     """
         chooses the node we attack with (the malicious node) from our BFS environment
         this BFS environments is also calculated according to our selected approach
@@ -24,6 +27,7 @@ def attackVictim(attack, approach: Approach, attacked_node: torch.Tensor, y_targ
         attacked_node: torch.Tensor - the victim node
         y_target: torch.Tensor - the target label of the attack
         node_num: int - the index of the attacked/victim node (out of the train/val/test-set)
+        neighbours_and_dist: Optional[torch.Tensor] - the BFS environment of the victim, when already looked up
 
         Returns
         -------
@@ -36,8 +40,9 @@ def attackVictim(attack, approach: Approach, attacked_node: torch.Tensor, y_targ
     dataset = attack.getDataset()
     print_answer = attack.print_answer
 
-    neighbours_and_dist = kBFS(root=attacked_node, device=device, reversed_arr_list=dataset.reversed_arr_list,
-                               K=attack.num_layers)
+    if neighbours_and_dist is None:
+        neighbourhood_index = getNeighbourhoodIndex(dataset=dataset, K=attack.num_layers)
+        neighbours_and_dist = neighbourhood_index.neighboursAndDist(root=attacked_node, device=device)
     if neighbours_and_dist.nelement():
         neighbours_and_dist = manipulateNeighborhood(attack=attack, approach=approach, attacked_node=attacked_node,
                                                      neighbours_and_dist=neighbours_and_dist, device=device)
@@ -64,11 +69,11 @@ def attackVictim(attack, approach: Approach, attacked_node: torch.Tensor, y_targ
     if approach is NodeApproach.AGREE:
         if print_answer is Print.YES:
             print()
-        malicious_node_heuristic = heuristicApproach(reversed_arr_list=dataset.reversed_arr_list,
+        malicious_node_heuristic = heuristicApproach(node_scores=dataset.structure_index.in_degree,
                                                      neighbours_and_dist=neighbours_and_dist,
                                                      device=attack.device)
         malicious_node_gradient = gradientApproach(attack=attack, attacked_node=attacked_node, y_target=y_target,
-                                                   node_num=node_num, neighbours_and_dist=neighbours_and_dist)
+                                                   neighbours_and_dist=neighbours_and_dist)
         attack_results = torch.zeros(1, 2)
         attack_results[0][0] = malicious_node_heuristic == malicious_node_gradient  # in attackSet we change to equal
         return attack_results
@@ -76,16 +81,18 @@ def attackVictim(attack, approach: Approach, attacked_node: torch.Tensor, y_targ
     if approach is NodeApproach.ZERO_FEATURES:
         model = attack.model_wrapper.model
         data = dataset.data
-        zero_model = copy.deepcopy(model)
+        model0 = model.takeSnapshot()
         # train
-        zero_model.node_attribute_list[malicious_node][:] = 0
+        model.setNodesAttributes(idx_node=malicious_node,
+                                 values=torch.zeros_like(model.getNodesAttributes(malicious_node)))
 
         # test correctness
-        changed_attributes = (zero_model.getInput() != model.getInput())[malicious_node].sum().item()
+        changed_attributes = (model.getInput() != model0.getInput())[malicious_node].sum().item()
 
         # test
-        results = test(data=data, model=zero_model, targeted=attack.targeted,
-                       attacked_nodes=attacked_node, y_targets=y_target)
+        results = test(data=data, model=model, targeted=attack.targeted, attacked_nodes=attacked_node,
+                       y_targets=y_target, compute_accuracies=print_answer is Print.YES)
+        model.restoreSnapshot(model0)
         if print_answer is Print.YES:
             log_template = createLogTemplate(attack=attack, dataset=dataset) + ', Attack Success: {}\n'
             if dataset.type is DatasetType.DISCRETE:
@@ -122,6 +129,58 @@ def attackVictim(attack, approach: Approach, attacked_node: torch.Tensor, y_targ
     return attack_results
 
 
+def attackVictimPerDistance(attack, approach: Approach, attacked_node: torch.Tensor, y_target: torch.Tensor,
+                            node_num: int, random_states: Optional[List] = None) -> torch.Tensor:
+    """
+        attackVictim for each distance of attack.distance_sweep, with a single lookup of the BFS environment
+        each distance is attacked from the same model and with its own random stream,
+        so its result is the same as in a separate attack of the distance:
+        with random_states (the victims are attacked one after the other) the stream of each distance
+        continues from the previous victim, and otherwise (each victim is seeded) it starts from the victim seed
+
+        Parameters
+        ----------
+        attack: oneGNNAttack
+        approach: Approach
+        attacked_node: torch.Tensor - the victim node
+        y_target: torch.Tensor - the target label of the attack
+        node_num: int - the index of the attacked/victim node (out of the train/val/test-set)
+        random_states: Optional[List] - the random state of each distance after the previous victim
+
+        Returns
+        -------
+        attack_results: torch.Tensor - 2d-tensor with a single row that includes for each distance
+                                       the defence and the number of attributes used (as in attackVictim)
+    """
+    neighbourhood_index = getNeighbourhoodIndex(dataset=attack.getDataset(), K=attack.num_layers)
+    neighbours_and_dist = neighbourhood_index.neighboursAndDist(root=attacked_node, device=attack.device)
+    model = attack.model_wrapper.model
+    model0 = model.takeSnapshot()
+    current_distance = attack.current_distance
+    victim_random_state = getRandomState()
+
+    sweep_results = []
+    for distance_idx, distance in enumerate(attack.distance_sweep):
+        if random_states is not None and random_states[distance_idx] is not None:
+            setRandomState(random_states[distance_idx])
+        else:
+            setRandomState(victim_random_state)
+        attack.current_distance = distance
+
+        attack_results = attackVictim(attack=attack, approach=approach, attacked_node=attacked_node,
+                                      y_target=y_target, node_num=node_num, neighbours_and_dist=neighbours_and_dist)
+        # in case of an impossible attack (no neighbours in this distance)
+        if attack_results is None:
+            attack_results = torch.tensor([[0, 0]])
+        sweep_results.append(attack_results.type(torch.long))
+
+        if random_states is not None:
+            random_states[distance_idx] = getRandomState()
+        model.restoreSnapshot(model0)
+    attack.current_distance = current_distance
+    return torch.cat(sweep_results, dim=1)
+
+
 def manipulateNeighborhood(attack, approach: Approach, attacked_node: torch.Tensor, neighbours_and_dist,
                            device: torch.cuda) -> torch.tensor:
     """
@@ -157,6 +216,7 @@ def checkNodeClassification(attack, dataset: torch_geometric.data.Data, attacked
                             print_answer: Print, attack_num):
     """
         checks if the node is currecly classified to y_target
+        when attack.subgraph is set, the check runs on the receptive field of the victim only
 
         Parameters
         ----------
@@ -171,8 +231,13 @@ def checkNodeClassification(attack, dataset: torch_geometric.data.Data, attacked
         -------
         classified_to_target: torch.Tensor - the defence of the model
     """
-    results = test(dataset.data, attack.model_wrapper.model, attack.targeted, attacked_node, y_target)
-    classified_to_target = not results[3]
+    model = attack.model_wrapper.model
+    if attack.subgraph:
+        useVictimSubgraph(model=model, attacked_nodes=attacked_node)
+    victim_result = testVictim(model=model, targeted=attack.targeted, attacked_nodes=attacked_node,
+                               y_targets=y_target)
+    model.removeVictimSubgraph()
+    classified_to_target = not victim_result.success
 
     if not classified_to_target and print_answer is Print.YES:
         attack_log = 'Attack: {:03d}, Node: {}, Misclassified already!\n' \
@@ -0,0 +1,5 @@
+import os.path as osp
+import sys
+
+# the modules of the implementation import each other from the implementation directory
+sys.path.insert(0, osp.dirname(osp.dirname(osp.abspath(__file__))))
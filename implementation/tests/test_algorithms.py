@@ -0,0 +1,143 @@
+from helpers.algorithms import gradientApproach, multiRootKBFS
+from classes.basic_classes import DatasetType
+from dataset_functions.graph_dataset import buildCSRAdjacency
+from model_functions.feature_store import FeatureStore
+from model_functions.model_snapshot import ModelSnapshot
+
+from types import SimpleNamespace
+import collections
+import numpy as np
+import pytest
+import torch
+import torch.nn.functional as F
+
+
+class DenseGCN(torch.nn.Module):
+    def __init__(self, x: torch.Tensor, adjacency: torch.Tensor, num_classes: int):
+        super(DenseGCN, self).__init__()
+        self.layers = torch.nn.ModuleList([torch.nn.Linear(x.shape[1], 8), torch.nn.Linear(8, num_classes)])
+        self.feature_store = FeatureStore(x)
+        self.edge_index = adjacency.nonzero().T
+        self.victim_subgraph = None
+        degree = adjacency.sum(1) + 1
+        self.adjacency = (adjacency + torch.eye(x.shape[0])) / torch.sqrt(degree.view(-1, 1) * degree.view(1, -1))
+
+    def forward(self, x=None):
+        x = self.feature_store.getInput() if x is None else x
+        x = F.relu(self.adjacency @ self.layers[0](x))
+        return F.log_softmax(self.adjacency @ self.layers[1](x), dim=1)
+
+    def getInput(self, nodes=None):
+        return self.feature_store.getInput(nodes=nodes)
+
+    def takeSnapshot(self):
+        return ModelSnapshot(self)
+
+    def restoreSnapshot(self, snapshot):
+        snapshot.restore(self)
+
+    def removeVictimSubgraph(self):
+        self.victim_subgraph = None
+
+
+def oldGradientApproach(attack, attacked_node, y_target, malicious_nodes) -> int:
+    # the baseline GRAD_CHOICE selection: the first epoch of an attack of the whole neighbourhood
+    # (with a tenth of the learning rate), with one attribute row parameter per node
+    model = attack.model_wrapper.model
+    x0 = model.getInput().detach().clone()
+    rows = [torch.nn.Parameter(x0[node].clone()) for node in malicious_nodes.tolist()]
+    if attack.dataset_type is DatasetType.DISCRETE:
+        for row in rows:
+            row.data.zero_()
+    prev_rows = [row.detach().clone() for row in rows]
+    optimizer = torch.optim.Adam(params=rows, lr=attack.lr / 10)
+
+    x = x0.clone()
+    for node, row in zip(malicious_nodes.tolist(), rows):
+        x = x.index_copy(0, torch.tensor([node]), row.view(1, -1))
+    loss = F.nll_loss(model(x)[[attacked_node.item()]], y_target)
+    loss = loss if attack.targeted else -loss
+    loss.backward()
+    optimizer.step()
+
+    new_x = x0.clone()
+    num_attributes_left = int(x0.shape[1] * attack.l_0)
+    for node, row, row0 in zip(malicious_nodes.tolist(), rows, prev_rows):
+        row = row.detach().clone()
+        if attack.dataset_type is DatasetType.DISCRETE:
+            zero_mask = torch.logical_or(row < row0, row0 == 1)
+            diff = row - row0
+            diff[zero_mask] = 0
+            row = row0.clone()
+            max_diff = diff.max()
+            flip_indexes = (diff == max_diff).nonzero(as_tuple=True)[0][:num_attributes_left]
+            if max_diff != 0:
+                row[flip_indexes] = 1
+        new_x[node] = row
+
+    nodes_norm_linf, _ = torch.max(torch.abs(new_x - x0), dim=1)
+    return malicious_nodes[torch.argmax(nodes_norm_linf[malicious_nodes])].item()
+
+
+@pytest.mark.parametrize('dataset_type', [DatasetType.CONTINUOUS, DatasetType.DISCRETE])
+@pytest.mark.parametrize('targeted', [True, False])
+def test_gradient_approach_matches_the_baseline(dataset_type, targeted):
+    num_nodes, num_features, num_classes = 12, 10, 3
+    for seed in range(10):
+        generator = torch.Generator().manual_seed(seed)
+        torch.manual_seed(seed)
+        adjacency = (torch.rand(num_nodes, num_nodes, generator=generator) < 0.25).float().triu(1)
+        adjacency = adjacency + adjacency.T
+        x = torch.rand(num_nodes, num_features, generator=generator)
+        if dataset_type is DatasetType.DISCRETE:
+            x = (x < 0.3).float()
+        model = DenseGCN(x=x, adjacency=adjacency, num_classes=num_classes)
+        attack = SimpleNamespace(model_wrapper=SimpleNamespace(model=model), subgraph=False, targeted=targeted,
+                                 dataset_type=dataset_type, lr=0.01, l_0=0.2, grad_norm='linf',
+                                 device=torch.device('cpu'))
+
+        attacked_node = torch.tensor([0])
+        y_target = torch.tensor([seed % num_classes])
+        malicious_nodes = torch.randperm(num_nodes - 1, generator=generator)[:6] + 1
+        neighbours_and_dist = torch.stack((malicious_nodes, torch.ones_like(malicious_nodes)), dim=1)
+
+        expected = oldGradientApproach(attack=attack, attacked_node=attacked_node, y_target=y_target,
+                                       malicious_nodes=malicious_nodes)
+        malicious_node = gradientApproach(attack=attack, attacked_node=attacked_node, y_target=y_target,
+                                          neighbours_and_dist=neighbours_and_dist)
+        assert malicious_node.item() == expected
+        assert torch.equal(model.getInput(), x)
+
+
+def queueKBFS(root: int, reversed_arr_list, K: int):
+    # the original (queue-based) BFS, see helpers.algorithms.kBFS
+    neighbours_and_dist = []
+    visited, queue = {root}, collections.deque([(root, 0)])
+    while queue:
+        vertex, dist = queue.popleft()
+        if dist < K != 0:
+            for neighbour in reversed_arr_list[vertex]:
+                if neighbour not in visited:
+                    visited.add(neighbour)
+                    queue.append((neighbour, dist + 1))
+                    neighbours_and_dist.append([neighbour, dist + 1])
+    return neighbours_and_dist
+
+
+@pytest.mark.parametrize('K', [0, 1, 2, 4])
+def test_multi_root_kbfs_matches_the_queue_bfs(K):
+    num_nodes = 50
+    for seed in range(5):
+        edge_index = np.random.default_rng(seed).integers(num_nodes, size=(2, 80))
+        adjacency = buildCSRAdjacency(index_from=edge_index[1], index_to=edge_index[0], num_nodes=num_nodes)
+        reversed_arr_list = [adjacency.indices[adjacency.indptr[node]:adjacency.indptr[node + 1]].tolist()
+                             for node in range(num_nodes)]
+
+        # repeated roots are separate BFSs
+        roots = np.array([0, 7, 7, 23, 49])
+        offsets, nodes, distances = multiRootKBFS(roots=roots, adjacency=adjacency, K=K)
+        assert offsets.shape[0] == roots.shape[0] + 1
+        for root_idx, root in enumerate(roots.tolist()):
+            start, end = offsets[root_idx], offsets[root_idx + 1]
+            neighbours_and_dist = np.stack((nodes[start:end], distances[start:end]), axis=1).tolist()
+            assert neighbours_and_dist == queueKBFS(root=root, reversed_arr_list=reversed_arr_list, K=K)
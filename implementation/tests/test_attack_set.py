@@ -0,0 +1,74 @@
+from node_attack.attackSet import printAttackResults
+from classes.attack_class import AttackMode
+from classes.approach_classes import NodeApproach
+from classes.basic_classes import DatasetType
+
+from types import SimpleNamespace
+import re
+import torch
+
+
+def sweepAttack(mode: AttackMode = AttackMode.NODE_L0, **sweeps) -> SimpleNamespace:
+    attack = SimpleNamespace(mode=mode, targeted=False, continuous_epochs=20, lr=0.1, l_inf=0.5, l_0=0.05,
+                             current_distance=1, dataset_type=DatasetType.CONTINUOUS,
+                             default_multiple_num_of_attackers=2, l_0_sweep=None, l_inf_sweep=None,
+                             distance_sweep=None,
+                             model_wrapper=SimpleNamespace(model=SimpleNamespace(name='GCN'), basic_log='Basic Model'))
+    attack.getDataset = lambda: SimpleNamespace(type=DatasetType.CONTINUOUS)
+    for sweep_name, sweep in sweeps.items():
+        setattr(attack, sweep_name, sweep)
+    return attack
+
+
+def sweepResults() -> torch.Tensor:
+    # three victims, the defence and the attributes for each of the values of a sweep of three values
+    return torch.tensor([[1, 4, 1, 2, 1, 2],
+                         [0, 0, 1, 6, 1, 6],
+                         [0, 0, 0, 0, 1, 4]])
+
+
+def printedDefences(printed: str):
+    return [float(defence) for defence in re.findall(r'Test Defence Success: ([0-9.]+)', printed)]
+
+
+def test_print_attack_results_per_l_0(capsys):
+    attack = sweepAttack(l_0_sweep=[0.1, 0.2, 0.3])
+    printAttackResults(attack=attack, approach=NodeApproach.SINGLE, attack_results=sweepResults(), max_attributes=10)
+    printed = capsys.readouterr().out
+
+    assert printed.count('Attack Results') == 3
+    assert re.findall(r'l_0:([0-9.]+)', printed) == ['0.10', '0.20', '0.30']
+    assert printedDefences(printed) == [0.6667, 0.3333, 0.0]
+    assert attack.l_0 == 0.05
+
+
+def test_print_attack_results_without_a_sweep(capsys):
+    attack = sweepAttack()
+    printAttackResults(attack=attack, approach=NodeApproach.SINGLE, attack_results=sweepResults()[:, :2],
+                       max_attributes=10)
+    printed = capsys.readouterr().out
+    assert printed.count('Attack Results') == 1
+    assert re.findall(r'l_0:([0-9.]+)', printed) == ['0.05']
+    assert printedDefences(printed) == [0.6667]
+
+
+def test_print_attack_results_per_l_inf(capsys):
+    attack = sweepAttack(mode=AttackMode.NODE_LINF, l_inf_sweep=[0.1, 0.2, 0.4])
+    printAttackResults(attack=attack, approach=NodeApproach.SINGLE, attack_results=sweepResults(), max_attributes=10)
+    printed = capsys.readouterr().out
+
+    assert printed.count('Attack Results') == 3
+    assert re.findall(r'Linf:([0-9.]+)', printed) == ['0.10', '0.20', '0.40']
+    assert printedDefences(printed) == [0.6667, 0.3333, 0.0]
+    assert attack.l_inf == 0.5
+
+
+def test_print_attack_results_per_distance(capsys):
+    attack = sweepAttack(mode=AttackMode.DISTANCE, distance_sweep=[1, 2, 3])
+    printAttackResults(attack=attack, approach=NodeApproach.SINGLE, attack_results=sweepResults(), max_attributes=10)
+    printed = capsys.readouterr().out
+
+    assert printed.count('Attack Results') == 3
+    assert re.findall(r'Distance: ([0-9]+)', printed) == ['01', '02', '03']
+    assert printedDefences(printed) == [0.6667, 0.3333, 0.0]
+    assert attack.current_distance == 1
@@ -0,0 +1,142 @@
+from node_attack.attackTrainerHelpers import flipSchedule, flipUpBestNewAttributes, maskAccuracies, model_res2targets_acc
+from model_functions.feature_store import FeatureStore
+
+from torch_geometric.data import Data
+import gc
+import pytest
+import torch
+
+
+class LinearModel(torch.nn.Module):
+    def __init__(self, x: torch.Tensor, num_classes: int):
+        super(LinearModel, self).__init__()
+        self.lin = torch.nn.Linear(x.shape[1], num_classes)
+        self.feature_store = FeatureStore(x)
+        self.edge_index = torch.zeros(2, 0, dtype=torch.long)
+        self.victim_subgraph = None
+
+    def forward(self):
+        return self.lin(self.feature_store.getInput())
+
+
+def maskData(num_nodes: int = 30, num_features: int = 5, num_classes: int = 3) -> Data:
+    generator = torch.Generator().manual_seed(0)
+    data = Data(x=torch.rand(num_nodes, num_features, generator=generator),
+                y=torch.randint(num_classes, (num_nodes,), generator=generator))
+    positions = torch.arange(num_nodes)
+    data.train_mask, data.val_mask, data.test_mask = positions % 3 == 0, positions % 3 == 1, positions % 3 == 2
+    return data
+
+
+def test_mask_accuracies_are_cached_per_model():
+    torch.manual_seed(0)
+    data = maskData()
+    models = [LinearModel(data.x, num_classes=3) for _ in range(2)]
+    models[1].lin.weight.data.neg_()
+    expected = [maskAccuracies(data=data, model=model)[0] for model in models]
+    assert expected[0] != expected[1]
+
+    for model, accuracies in zip(models, expected):
+        cached_accuracies, logits = maskAccuracies(data=data, model=model)
+        assert logits is None
+        assert cached_accuracies == accuracies
+
+    # a new model (which may reuse the memory of a dropped one) is tested
+    del models
+    gc.collect()
+    model = LinearModel(data.x, num_classes=3)
+    _, logits = maskAccuracies(data=data, model=model)
+    assert logits is not None
+
+
+def loopModelRes2TargetsAcc(targeted: bool, y_targets: torch.Tensor, model_res: torch.Tensor) -> float:
+    # the original (per node, per class) implementation of model_res2targets_acc
+    pred_val, pred = model_res.max(1)
+    diff_prob_mat = (model_res.T - pred_val).T
+    same_prob_vec = (diff_prob_mat == 0).sum(1)
+    edge_case_vec = torch.logical_and(same_prob_vec > 1,
+                                      diff_prob_mat[range(0, y_targets.shape[0]), y_targets] == 0)
+    if targeted:
+        pred[edge_case_vec] = y_targets[edge_case_vec]
+    else:
+        for node_idx in range(model_res.shape[0]):
+            for class_idx in range(model_res.shape[1]):
+                if model_res[node_idx, class_idx] == pred_val[node_idx] and class_idx != y_targets[node_idx]:
+                    pred[node_idx] = class_idx
+
+    if y_targets.shape[0] == 1:
+        y_targets_acc = (pred == y_targets)
+        if not targeted:
+            y_targets_acc = torch.logical_not(y_targets_acc)
+    else:
+        y_targets_acc = torch.sum(pred == y_targets).type(torch.FloatTensor) / y_targets.shape[0]
+        if not targeted:
+            y_targets_acc = 1 - y_targets_acc
+    return y_targets_acc.item()
+
+
+@pytest.mark.parametrize('targeted', [True, False])
+def test_model_res2targets_acc_matches_the_loop(targeted):
+    generator = torch.Generator().manual_seed(0)
+    for _ in range(200):
+        num_nodes = int(torch.randint(1, 6, (1,), generator=generator))
+        num_classes = int(torch.randint(2, 6, (1,), generator=generator))
+        # few distinct values, so that ties between the classes are common
+        model_res = torch.randint(3, (num_nodes, num_classes), generator=generator).float()
+        y_targets = torch.randint(num_classes, (num_nodes,), generator=generator)
+        expected = loopModelRes2TargetsAcc(targeted=targeted, y_targets=y_targets, model_res=model_res.clone())
+        assert model_res2targets_acc(targeted=targeted, y_targets=y_targets, model_res=model_res.clone()) == \
+            pytest.approx(expected)
+
+
+class AttributeModel(object):
+    def __init__(self, x: torch.Tensor):
+        self.feature_store = FeatureStore(x)
+
+    def getInput(self, nodes: torch.Tensor = None) -> torch.Tensor:
+        return self.feature_store.getInput(nodes=nodes)
+
+    def setNodesAttributes(self, idx_node: torch.Tensor, values: torch.Tensor):
+        self.feature_store.setNodesAttributes(idx_node, values)
+
+
+def test_flip_schedule():
+    assert [flipSchedule(flip_k=1, flip_growth=1, epoch=epoch) for epoch in range(1, 5)] == [1, 1, 1, 1]
+    assert [flipSchedule(flip_k=1, flip_growth=2, epoch=epoch) for epoch in range(1, 5)] == [1, 2, 4, 8]
+    assert [flipSchedule(flip_k=3, flip_growth=1.5, epoch=epoch) for epoch in range(1, 5)] == [3, 5, 7, 11]
+
+
+def test_flip_up_best_new_attributes():
+    malicious_nodes = torch.tensor([0, 1, 2])
+    x0 = torch.tensor([[0., 0., 0., 0., 0.],
+                       [0., 1., 0., 0., 0.],
+                       [0., 0., 0., 0., 0.]])
+    x = torch.tensor([[0.3, 0.5, -0.9, 0.1, 0.0],
+                      [0.2, 0.9, 0.4, 0.4, 0.1],
+                      [0.6, 0.6, 0.6, 0.0, 0.0]])
+    model0, model = AttributeModel(x0), AttributeModel(x)
+
+    # node 0 - the two largest positive steps, node 1 - the used attribute 1 is skipped and the tie at 0.4 is flipped,
+    # node 2 - the tie at 0.6 is cut by the attribute limit
+    num_attributes_left, flip_scores = \
+        flipUpBestNewAttributes(model=model, model0=model0, malicious_nodes=malicious_nodes,
+                                num_attributes_left=torch.tensor([5, 5, 2]), num_flips=2)
+    expected = torch.tensor([[1., 1., 0., 0., 0.],
+                             [0., 1., 1., 1., 0.],
+                             [1., 1., 0., 0., 0.]])
+    assert torch.equal(model.getInput(nodes=malicious_nodes), expected)
+    assert num_attributes_left.tolist() == [3, 3, 0]
+    assert torch.equal(flip_scores > 0, expected.bool() & (x0 == 0))
+    assert torch.allclose(flip_scores[0], torch.tensor([0.3, 0.5, 0., 0., 0.]))
+
+
+def test_flip_up_best_new_attributes_without_positive_steps():
+    malicious_nodes = torch.tensor([0])
+    x0 = torch.zeros(1, 4)
+    model0, model = AttributeModel(x0), AttributeModel(-torch.ones(1, 4))
+    num_attributes_left, flip_scores = \
+        flipUpBestNewAttributes(model=model, model0=model0, malicious_nodes=malicious_nodes,
+                                num_attributes_left=torch.tensor([4]), num_flips=10)
+    assert torch.equal(model.getInput(nodes=malicious_nodes), x0)
+    assert num_attributes_left.tolist() == [4]
+    assert not flip_scores.any()
@@ -0,0 +1,54 @@
+from model_functions.edge_key_index import EdgeKeyIndex, MAX_SEGMENTS
+
+import numpy as np
+
+
+def firstColumns(src: np.ndarray, dst: np.ndarray) -> dict:
+    # the first column of each edge, by a scan of the edge index
+    first_columns = {}
+    for column, edge in enumerate(zip(src.tolist(), dst.tolist())):
+        first_columns.setdefault(edge, column)
+    return first_columns
+
+
+def test_find_returns_the_first_column():
+    num_nodes = 10
+    src, dst = np.array([1, 2, 1, 3, 1]), np.array([2, 3, 2, 1, 2])
+    edge_key_index = EdgeKeyIndex(num_nodes=num_nodes).extend(src=src, dst=dst)
+    assert edge_key_index.num_edges == 5
+    assert edge_key_index.find(1, 2) == 0
+    assert edge_key_index.find(2, 3) == 1
+    assert edge_key_index.find(3, 1) == 3
+    assert edge_key_index.find(2, 1) is None
+    assert edge_key_index.find(9, 9) is None
+
+
+def test_extend_keeps_the_old_index():
+    num_nodes = 10
+    edge_key_index = EdgeKeyIndex(num_nodes=num_nodes).extend(src=np.array([0, 1]), dst=np.array([1, 2]))
+    extended = edge_key_index.extend(src=np.array([2, 0]), dst=np.array([3, 1]))
+    assert extended.find(2, 3) == 2
+    assert extended.find(0, 1) == 0
+    assert edge_key_index.find(2, 3) is None
+    assert edge_key_index.num_edges == 2
+    assert edge_key_index.extend(src=np.zeros(0), dst=np.zeros(0)) is edge_key_index
+
+
+def test_extend_past_the_merge_matches_a_scan():
+    num_nodes = 12
+    rng = np.random.default_rng(0)
+    src, dst = rng.integers(num_nodes, size=30), rng.integers(num_nodes, size=30)
+    edge_key_index = EdgeKeyIndex(num_nodes=num_nodes).extend(src=src, dst=dst)
+
+    # more extensions than segments, with edges which repeat the dataset edges and each other
+    for _ in range(3 * MAX_SEGMENTS):
+        new_src, new_dst = rng.integers(num_nodes, size=3), rng.integers(num_nodes, size=3)
+        edge_key_index = edge_key_index.extend(src=new_src, dst=new_dst)
+        src, dst = np.concatenate((src, new_src)), np.concatenate((dst, new_dst))
+        assert len(edge_key_index.segments) <= MAX_SEGMENTS
+
+    first_columns = firstColumns(src=src, dst=dst)
+    assert edge_key_index.num_edges == src.shape[0]
+    for edge_src in range(num_nodes):
+        for edge_dst in range(num_nodes):
+            assert edge_key_index.find(edge_src, edge_dst) == first_columns.get((edge_src, edge_dst))
@@ -0,0 +1,47 @@
+from model_functions.feature_store import FeatureStore
+from model_functions.feature_projection import FeatureProjection
+from model_functions.input_products import InputProductCache
+from model_functions.sparse_features import SparseFeatures
+
+import pytest
+import torch
+
+
+class InputLayer(torch.nn.Module):
+    def __init__(self, in_channels: int, out_channels: int):
+        super(InputLayer, self).__init__()
+        self.weights = torch.nn.Parameter(torch.rand(in_channels, out_channels), requires_grad=False)
+
+    def inputWeight(self) -> torch.Tensor:
+        return self.weights
+
+
+@pytest.mark.parametrize('is_sparse', [False, True])
+def test_forward_after_base_write(is_sparse):
+    torch.manual_seed(0)
+    x = (torch.rand(10, 6) < 0.5).float()
+    matrix = None if is_sparse else torch.rand(6, 4)
+    feature_store = FeatureStore(SparseFeatures.fromDense(x) if is_sparse else x)
+    feature_projection = FeatureProjection(matrix)
+    layer = InputLayer(6 if is_sparse else 4, 3)
+    input_products = InputProductCache()
+
+    def expected():
+        return torch.matmul(feature_projection.project(feature_store.getInput()), layer.weights)
+
+    # fill the caches with the clean base matrix
+    assert torch.allclose(input_products.getProduct(layer, feature_store, feature_projection), expected())
+    base_version = feature_store.base_version
+
+    # node 2 is perturbed in the overlay, and written into the base matrix when node 5 becomes trainable
+    feature_store.setNodesAttributes(idx_node=torch.tensor(2), values=torch.ones(6))
+    feature_store.setPerturbedNodes(torch.tensor([5]))
+    assert feature_store.base_version != base_version
+    assert torch.equal(feature_store._baseRows(torch.tensor([2]))[0], torch.ones(6))
+
+    assert torch.allclose(input_products.getProduct(layer, feature_store, feature_projection), expected())
+    assert torch.allclose(feature_projection.projectInput(feature_store),
+                          feature_projection.project(feature_store.getInput()))
+    nodes = torch.tensor([2, 5, 7])
+    assert torch.allclose(input_products.getProduct(layer, feature_store, feature_projection, nodes=nodes),
+                          expected()[nodes])
@@ -0,0 +1,85 @@
+from dataset_functions.graph_dataset import GraphDataset, buildCSRAdjacency
+
+from torch_geometric.data import Data
+from typing import List
+import numpy as np
+import pytest
+import torch
+
+
+def reversedArrayList(edge_index: np.ndarray, num_nodes: int) -> List[List[int]]:
+    # the original (per edge) list of the incoming neighbours of each node
+    reversed_arr_list = [[] for _ in range(num_nodes)]
+    for edge_from, edge_to in edge_index.T.tolist():
+        reversed_arr_list[edge_to].append(edge_from)
+    return reversed_arr_list
+
+
+def randomEdgeIndex(num_nodes: int, num_edges: int, seed: int) -> np.ndarray:
+    return np.random.default_rng(seed).integers(num_nodes, size=(2, num_edges))
+
+
+def test_csr_adjacency_matches_the_reversed_array_list():
+    num_nodes = 40
+    for seed in range(5):
+        edge_index = randomEdgeIndex(num_nodes=num_nodes, num_edges=120, seed=seed)
+        adjacency = buildCSRAdjacency(index_from=edge_index[1], index_to=edge_index[0], num_nodes=num_nodes)
+        reversed_arr_list = reversedArrayList(edge_index=edge_index, num_nodes=num_nodes)
+
+        assert adjacency.degrees().tolist() == [len(neighbours) for neighbours in reversed_arr_list]
+        for node in range(num_nodes):
+            start, end = adjacency.indptr[node], adjacency.indptr[node + 1]
+            assert adjacency.indices[start:end].tolist() == reversed_arr_list[node]
+            assert (edge_index[:, adjacency.edge_ids[start:end]] ==
+                    np.stack((adjacency.indices[start:end], np.full(end - start, node)))).all()
+
+
+def test_csr_adjacency_neighbours_of_a_batch():
+    num_nodes = 40
+    edge_index = randomEdgeIndex(num_nodes=num_nodes, num_edges=120, seed=0)
+    adjacency = buildCSRAdjacency(index_from=edge_index[1], index_to=edge_index[0], num_nodes=num_nodes)
+    reversed_arr_list = reversedArrayList(edge_index=edge_index, num_nodes=num_nodes)
+
+    # repeated nodes and nodes without neighbours are kept, node after node
+    nodes = np.array([3, 0, 3, int(np.argmin(adjacency.degrees())), 17])
+    rows, neighbours, edge_ids = adjacency.neighbours(nodes)
+    expected_rows = [row for row, node in enumerate(nodes.tolist()) for _ in reversed_arr_list[node]]
+    expected_neighbours = [neighbour for node in nodes.tolist() for neighbour in reversed_arr_list[node]]
+    assert rows.tolist() == expected_rows
+    assert neighbours.tolist() == expected_neighbours
+    assert (edge_index[0, edge_ids] == neighbours).all()
+    assert (edge_index[1, edge_ids] == nodes[rows]).all()
+
+    rows, neighbours, edge_ids = adjacency.neighbours(np.zeros(0, dtype=np.int64))
+    assert rows.shape[0] == neighbours.shape[0] == edge_ids.shape[0] == 0
+
+
+def transactionDataset(num_nodes: int = 5) -> GraphDataset:
+    # the transactions only use the data, so the dataset is not loaded
+    dataset = GraphDataset.__new__(GraphDataset)
+    mask = torch.ones(num_nodes, dtype=torch.bool)
+    dataset.data = Data(y=torch.arange(num_nodes), train_mask=mask, val_mask=mask, test_mask=mask)
+    dataset._transaction = None
+    return dataset
+
+
+def test_transaction_rollback():
+    dataset = transactionDataset()
+    y = dataset.data.y
+    dataset.beginTransaction()
+    dataset.updateData(y=torch.cat((y, torch.tensor([0]))))
+    assert dataset.data.y.shape[0] == 6
+    dataset.rollbackTransaction()
+    assert dataset.data.y is y
+
+
+def test_unbalanced_transactions_raise():
+    dataset = transactionDataset()
+    with pytest.raises(RuntimeError):
+        dataset.updateData(y=dataset.data.y)
+    with pytest.raises(RuntimeError):
+        dataset.rollbackTransaction()
+
+    dataset.beginTransaction()
+    with pytest.raises(RuntimeError):
+        dataset.beginTransaction()
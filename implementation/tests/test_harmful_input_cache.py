@@ -0,0 +1,84 @@
+from adversarial_attack import harmfulInputCache
+from adversarial_attack.harmfulInputCache import HarmfulInputCache
+from classes.basic_classes import Print, DatasetType
+from model_functions.feature_store import FeatureStore
+from model_functions.model_snapshot import ModelSnapshot
+from node_attack.attackTrainerGeneric import warmStart
+
+from types import SimpleNamespace
+import numpy as np
+import pytest
+import torch
+
+
+class FeatureModel(torch.nn.Module):
+    def __init__(self, x: torch.Tensor):
+        super(FeatureModel, self).__init__()
+        self.feature_store = FeatureStore(x)
+        self.edge_index = torch.zeros(2, 0, dtype=torch.long)
+
+    def getInput(self, nodes=None):
+        return self.feature_store.getInput(nodes=nodes)
+
+    def setNodesAttributes(self, idx_node, values):
+        self.feature_store.setNodesAttributes(idx_node, values)
+
+    def takeSnapshot(self):
+        return ModelSnapshot(self)
+
+    def restoreSnapshot(self, snapshot):
+        snapshot.restore(self)
+
+
+def makeAttack(dataset_type: DatasetType, num_nodes: int = 8, num_features: int = 4):
+    x = torch.rand(num_nodes, num_features, generator=torch.Generator().manual_seed(0))
+    model = FeatureModel(x)
+    return SimpleNamespace(device=torch.device('cpu'), dataset_type=dataset_type, print_answer=Print.NO,
+                           model_wrapper=SimpleNamespace(model=model), getDataset=lambda: SimpleNamespace(data=None),
+                           warm_start=None)
+
+
+@pytest.mark.parametrize('dataset_type', [DatasetType.CONTINUOUS, DatasetType.DISCRETE])
+def test_refresh_keeps_the_base_matrix(monkeypatch, dataset_type):
+    attack = makeAttack(dataset_type)
+    model = attack.model_wrapper.model
+    x, base_version = model.feature_store.x.clone(), model.feature_store.base_version
+    victims = [0, 1]
+    # the malicious node which the attack chooses for each victim, changed between the refreshes
+    selection = {0: 4, 1: 5}
+    warm_starts = {}
+
+    def attackSetVictim(attack, node_num, approach, attacked_nodes, y_targets, model_snapshot):
+        victim = attacked_nodes[node_num].item()
+        malicious_nodes = torch.tensor([selection[victim]])
+        warm_starts[victim] = warmStart(attack=attack, malicious_nodes=malicious_nodes) is not None
+        rows = model.feature_store.setPerturbedNodes(malicious_nodes)
+        rows.data += 1
+        return torch.tensor([[1, 1]])
+
+    monkeypatch.setattr(harmfulInputCache, 'getNodesToAttack',
+                        lambda data, trainset: (len(victims), np.array(victims)))
+    monkeypatch.setattr(harmfulInputCache, 'getClassificationTargets',
+                        lambda attack, dataset, num_attacks, attacked_nodes: torch.zeros(num_attacks,
+                                                                                          dtype=torch.long))
+    monkeypatch.setattr(harmfulInputCache, 'attackSetVictim', attackSetVictim)
+
+    harmful_input_cache = HarmfulInputCache()
+    harmful_input_cache.getHarmfulInput(attack=attack, approach=None)
+    assert warm_starts == {0: False, 1: False}
+
+    # the second refresh warm-starts victim 0 (same selection), victim 1 chooses another node
+    selection[1] = 6
+    attacked_x, _, _ = harmful_input_cache.getHarmfulInput(attack=attack, approach=None)
+    is_continuous = dataset_type is DatasetType.CONTINUOUS
+    assert warm_starts == {0: is_continuous, 1: False}
+
+    assert torch.equal(model.feature_store.x, x) and model.feature_store.base_version == base_version
+    assert not model.feature_store.perturbed_nodes.numel()
+    assert attack.warm_start is None
+
+    expected_x = x.clone()
+    expected_x[4] += 2 if is_continuous else 1
+    expected_x[6] += 1
+    assert torch.allclose(attacked_x, expected_x)
+    assert harmful_input_cache.entries[1].malicious_nodes.tolist() == [6]
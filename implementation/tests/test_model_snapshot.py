@@ -0,0 +1,41 @@
+from classes.basic_classes import GNN_TYPE
+from model_functions.graph_model import EdgeModel
+
+from types import SimpleNamespace
+from torch_geometric.data import Data
+import torch
+
+
+def edgeDataset(num_nodes: int = 20, num_features: int = 6, num_classes: int = 3) -> SimpleNamespace:
+    generator = torch.Generator().manual_seed(0)
+    edge_index = torch.stack((torch.arange(num_nodes), torch.arange(num_nodes).roll(1)))
+    data = Data(x=torch.rand(num_nodes, num_features, generator=generator), edge_index=edge_index,
+                y=torch.randint(num_classes, (num_nodes,), generator=generator))
+    return SimpleNamespace(name='cora', data=data, num_features=num_features, num_classes=num_classes,
+                           getFeatures=lambda: data.x)
+
+
+def attackStep(model: EdgeModel, optimizer: torch.optim.Optimizer):
+    optimizer.zero_grad()
+    model()[0].sum().backward()
+    optimizer.step()
+
+
+def test_restore_after_added_edges():
+    torch.manual_seed(0)
+    model = EdgeModel(gnn_type=GNN_TYPE.GCN, num_layers=2, dataset=edgeDataset(), device=torch.device('cpu'))
+    model0 = model.takeSnapshot()
+    edge_weight0 = model.edge_weight.detach().clone()
+
+    # two victims, the first one adds edges to the model
+    for added_edges in (torch.tensor([[3, 4], [0, 0]]), torch.zeros(2, 0, dtype=torch.long)):
+        model.addEdges(edge_index=added_edges, edge_weight=torch.zeros(added_edges.shape[1]))
+        model.edge_weight.requires_grad = True
+        optimizer = torch.optim.Adam([model.edge_weight], lr=0.1)
+        attackStep(model=model, optimizer=optimizer)
+        model.restoreSnapshot(model0)
+
+        assert torch.equal(model.edge_weight, edge_weight0)
+        assert model.edge_weight.grad is None
+        assert model.edge_index.shape[1] == edge_weight0.shape[0]
+        assert model.findEdge(3, 0) is None
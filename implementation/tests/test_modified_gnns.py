@@ -0,0 +1,19 @@
+from model_functions.modified_gnns import ModifiedGCNConv
+
+from torch_geometric.nn import GCNConv
+import torch
+
+
+def test_modified_gcn_conv_matches_gcn_conv():
+    torch.manual_seed(0)
+    x = torch.rand(8, 5)
+    edge_index = torch.tensor([[0, 1, 1, 2, 3, 5, 6], [1, 0, 2, 1, 4, 6, 7]])
+    edge_weight = torch.rand(edge_index.shape[1])
+    conv = GCNConv(in_channels=5, out_channels=3)
+    modified_conv = ModifiedGCNConv(in_channels=5, out_channels=3)
+    modified_conv.load_state_dict(conv.state_dict())
+
+    expected = conv(x, edge_index, edge_weight)
+    assert torch.allclose(modified_conv(x, edge_index, edge_weight), expected, atol=1e-6)
+    product = torch.matmul(x, modified_conv.inputWeight())
+    assert torch.allclose(modified_conv.propagateProduct(product, edge_index, edge_weight), expected, atol=1e-6)
@@ -0,0 +1,38 @@
+from helpers.parallelVictims import mapVictims, seedVictim
+
+from types import SimpleNamespace
+import random
+import numpy as np
+import torch
+
+
+def randomVictim(attack, node_num: int):
+    print(f'victim {node_num}')
+    return node_num, torch.rand(1).item(), np.random.rand(), random.random()
+
+
+def makeAttack(workers):
+    return SimpleNamespace(seed=3, workers=workers, device=torch.device('cpu'))
+
+
+def test_seed_victim_is_independent_of_the_order():
+    seedVictim(seed=3, node_num=4)
+    first = randomVictim(None, 4)
+    seedVictim(seed=3, node_num=1)
+    randomVictim(None, 1)
+    seedVictim(seed=3, node_num=4)
+    assert randomVictim(None, 4) == first
+
+    seedVictim(seed=4, node_num=4)
+    assert randomVictim(None, 4) != first
+
+
+def test_workers_merge_the_victims_in_order(capsys):
+    num_attacks = 7
+    sequential = mapVictims(attack=makeAttack(1), victim_function=randomVictim, num_attacks=num_attacks)
+    capsys.readouterr()
+
+    parallel = mapVictims(attack=makeAttack(3), victim_function=randomVictim, num_attacks=num_attacks)
+    assert parallel == sequential
+    assert [result[0] for result in parallel] == list(range(num_attacks))
+    assert capsys.readouterr().out == ''.join(f'victim {node_num}\n' for node_num in range(num_attacks))
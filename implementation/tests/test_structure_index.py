@@ -0,0 +1,73 @@
+from dataset_functions.graph_dataset import buildCSRAdjacency
+from dataset_functions.structure_index import StructureIndex
+
+from types import SimpleNamespace
+import numpy as np
+import pytest
+
+
+def structureDataset(edge_index: np.ndarray, num_nodes: int) -> SimpleNamespace:
+    in_adjacency = buildCSRAdjacency(index_from=edge_index[1], index_to=edge_index[0], num_nodes=num_nodes)
+    out_adjacency = buildCSRAdjacency(index_from=edge_index[0], index_to=edge_index[1], num_nodes=num_nodes)
+    return SimpleNamespace(out_adjacency=out_adjacency, in_degree=in_adjacency.degrees(),
+                           out_degree=out_adjacency.degrees())
+
+
+def peelCoreNumber(edge_index: np.ndarray, num_nodes: int) -> np.ndarray:
+    # the k-core number of each node, by removing a node of minimal degree at a time
+    neighbours = [set() for _ in range(num_nodes)]
+    for node_from, node_to in edge_index.T.tolist():
+        if node_from != node_to:
+            neighbours[node_from].add(node_to)
+            neighbours[node_to].add(node_from)
+    core_number = np.zeros(num_nodes, dtype=np.int64)
+    remaining, k = set(range(num_nodes)), 0
+    while remaining:
+        node = min(remaining, key=lambda remaining_node: len(neighbours[remaining_node]))
+        k = max(k, len(neighbours[node]))
+        core_number[node] = k
+        remaining.remove(node)
+        for neighbour in neighbours[node]:
+            neighbours[neighbour].discard(node)
+    return core_number
+
+
+def randomEdgeIndex(num_nodes: int, num_edges: int, seed: int) -> np.ndarray:
+    return np.random.default_rng(seed).integers(num_nodes, size=(2, num_edges))
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_core_number_matches_the_peel(seed):
+    num_nodes = 40
+    edge_index = randomEdgeIndex(num_nodes=num_nodes, num_edges=100, seed=seed)
+    structure_index = StructureIndex(structureDataset(edge_index=edge_index, num_nodes=num_nodes))
+    assert structure_index.core_number.tolist() == peelCoreNumber(edge_index=edge_index, num_nodes=num_nodes).tolist()
+
+
+def test_degrees_and_cached_statistics():
+    num_nodes = 40
+    edge_index = randomEdgeIndex(num_nodes=num_nodes, num_edges=100, seed=0)
+    structure_index = StructureIndex(structureDataset(edge_index=edge_index, num_nodes=num_nodes))
+    assert structure_index.in_degree.tolist() == np.bincount(edge_index[1], minlength=num_nodes).tolist()
+    assert structure_index.out_degree.tolist() == np.bincount(edge_index[0], minlength=num_nodes).tolist()
+
+    # each statistic is computed once and is read-only
+    core_number = structure_index.core_number
+    assert structure_index.core_number is core_number
+    assert not core_number.flags.writeable
+    assert structure_index.pagerank is structure_index.pagerank
+
+
+def test_pagerank():
+    # a star into node 0, with the dangling node 0
+    num_nodes = 5
+    edge_index = np.array([[1, 2, 3, 4], [0, 0, 0, 0]])
+    pagerank = StructureIndex(structureDataset(edge_index=edge_index, num_nodes=num_nodes)).pagerank
+    assert pagerank.sum() == pytest.approx(1, abs=1e-6)
+    assert pagerank.argmax() == 0
+    assert np.allclose(pagerank[1:], pagerank[1])
+
+    # a directed cycle is uniform
+    edge_index = np.array([[0, 1, 2, 3, 4], [1, 2, 3, 4, 0]])
+    pagerank = StructureIndex(structureDataset(edge_index=edge_index, num_nodes=num_nodes)).pagerank
+    assert np.allclose(pagerank, 1 / num_nodes)
@@ -0,0 +1,139 @@
+from classes.basic_classes import GNN_TYPE
+from model_functions.gal.gal_model import GalModel
+from model_functions.graph_model import NodeModel
+from model_functions import victim_subgraph as victim_subgraph_module
+from model_functions.victim_subgraph import (extractVictimSubgraph, fullForward, isSubgraphExact, useVictimSubgraph,
+                                             victimLogits)
+from node_attack.attackVictim import checkNodeClassification
+
+from types import SimpleNamespace
+from torch_geometric.data import Data
+from torch_geometric.nn import GATConv
+from torch_geometric.utils import to_undirected
+import pytest
+import torch
+
+
+def syntheticDataset(num_nodes: int = 200, num_edges: int = 150, num_features: int = 12, num_classes: int = 3,
+                     seed: int = 0):
+    generator = torch.Generator().manual_seed(seed)
+    edge_index = torch.randint(num_nodes, (2, num_edges), generator=generator)
+    edge_index = to_undirected(edge_index[:, edge_index[0] != edge_index[1]], num_nodes=num_nodes)
+    x = torch.rand(num_nodes, num_features, generator=generator)
+    y = torch.randint(num_classes, (num_nodes,), generator=generator)
+    data = Data(x=x, edge_index=edge_index, y=y)
+    return SimpleNamespace(name='cora', data=data, num_features=num_features, num_classes=num_classes,
+                           getFeatures=lambda: data.x)
+
+
+def test_gal_full_forward_after_subgraph_forward():
+    torch.manual_seed(0)
+    dataset = syntheticDataset()
+    model = GalModel(dataset=dataset, device=torch.device('cpu')).eval()
+    attacked_nodes = torch.tensor([0])
+    with torch.no_grad():
+        clean_model = GalModel(dataset=dataset, device=torch.device('cpu')).eval()
+        clean_model.load_state_dict(model.state_dict())
+        clean_logits = clean_model()
+
+        model.setVictimSubgraph(attacked_nodes)
+        assert model.victim_subgraph.subset.shape[0] < dataset.data.num_nodes
+        model()
+        assert torch.allclose(fullForward(model), clean_logits, atol=1e-6)
+        model.removeVictimSubgraph()
+        assert torch.allclose(model(), clean_logits, atol=1e-6)
+
+
+def test_extract_victim_subgraph_is_the_receptive_field():
+    dataset = syntheticDataset()
+    edge_index = dataset.data.edge_index
+    attacked_nodes = torch.tensor([3, 7])
+    victim_subgraph = extractVictimSubgraph(attacked_nodes=attacked_nodes, num_hops=2, edge_index=edge_index,
+                                            num_nodes=dataset.data.num_nodes)
+
+    # the nodes within 3 hops (2 message passing steps and the border degrees)
+    within_hops = torch.zeros(dataset.data.num_nodes, dtype=torch.bool)
+    within_hops[attacked_nodes] = True
+    for _ in range(3):
+        within_hops[edge_index[0][within_hops[edge_index[1]]]] = True
+    assert torch.equal(victim_subgraph.subset, within_hops.nonzero(as_tuple=True)[0])
+    assert torch.equal(victim_subgraph.subset[victim_subgraph.mapping], attacked_nodes)
+    assert torch.equal(victim_subgraph.subset[victim_subgraph.edge_index], edge_index[:, victim_subgraph.edge_mask])
+
+
+# ModifiedGATConv follows the GATConv of torch_geometric 1.x
+GAT_PARAM = pytest.param(GNN_TYPE.GAT, marks=pytest.mark.skipif(not hasattr(GATConv(1, 1), 'lin_l'),
+                                                                reason='GATConv of torch_geometric 1.x'))
+
+
+@pytest.mark.parametrize('gnn_type', [GNN_TYPE.GCN, GAT_PARAM, GNN_TYPE.SAGE, GNN_TYPE.SGC])
+def test_victim_subgraph_matches_the_full_graph(gnn_type):
+    torch.manual_seed(0)
+    dataset = syntheticDataset()
+    model = NodeModel(gnn_type=gnn_type, num_layers=2, dataset=dataset, device=torch.device('cpu')).eval()
+    model.attack = True
+    attacked_nodes = dataset.data.edge_index[1, :1]
+
+    assert useVictimSubgraph(model=model, attacked_nodes=attacked_nodes)
+    assert model.victim_subgraph.subset.shape[0] < dataset.data.num_nodes
+    assert isSubgraphExact(model=model, attacked_nodes=attacked_nodes)
+    with torch.no_grad():
+        full_logits = fullForward(model)
+        assert torch.allclose(victimLogits(model=model, attacked_nodes=attacked_nodes), full_logits[attacked_nodes],
+                              atol=1e-5)
+
+        # a perturbed row of a neighbour of the victim
+        neighbour = dataset.data.edge_index[0, 0]
+        model.setNodesAttributes(idx_node=neighbour, values=torch.ones(dataset.num_features))
+        perturbed_logits = fullForward(model)[attacked_nodes]
+        assert not torch.allclose(perturbed_logits, full_logits[attacked_nodes])
+        assert torch.allclose(victimLogits(model=model, attacked_nodes=attacked_nodes), perturbed_logits, atol=1e-5)
+
+
+def test_victim_subgraph_is_not_used_with_batch_norm():
+    dataset = syntheticDataset()
+    model = NodeModel(gnn_type=GNN_TYPE.GIN, num_layers=2, dataset=dataset, device=torch.device('cpu')).eval()
+    attacked_nodes = dataset.data.edge_index[1, :1]
+    assert not useVictimSubgraph(model=model, attacked_nodes=attacked_nodes)
+    assert model.victim_subgraph is None
+
+
+def test_victim_subgraph_exactness_is_checked_once_per_model(monkeypatch):
+    checked_models = []
+
+    def countedIsSubgraphExact(model, attacked_nodes):
+        checked_models.append(model)
+        return isSubgraphExact(model=model, attacked_nodes=attacked_nodes)
+    monkeypatch.setattr(victim_subgraph_module, 'isSubgraphExact', countedIsSubgraphExact)
+
+    dataset = syntheticDataset()
+    models = [NodeModel(gnn_type=gnn_type, num_layers=2, dataset=dataset, device=torch.device('cpu')).eval()
+              for gnn_type in (GNN_TYPE.GCN, GNN_TYPE.GIN)]
+    for model in models:
+        for attacked_nodes in dataset.data.edge_index[1, :3].split(1):
+            assert useVictimSubgraph(model=model, attacked_nodes=attacked_nodes) is (model is models[0])
+            model.removeVictimSubgraph()
+    assert checked_models == models
+
+
+def test_check_node_classification_on_the_victim_subgraph():
+    torch.manual_seed(0)
+    dataset = syntheticDataset()
+    model = NodeModel(gnn_type=GNN_TYPE.GCN, num_layers=2, dataset=dataset, device=torch.device('cpu')).eval()
+    model.attack = True
+    attacked_node = dataset.data.edge_index[1, :1]
+    y_target = fullForward(model)[attacked_node].max(1)[1]
+    attack = SimpleNamespace(model_wrapper=SimpleNamespace(model=model), targeted=False, subgraph=True)
+    # the first victim of the model also runs its once per model full-graph checks
+    assert checkNodeClassification(attack=attack, dataset=dataset, attacked_node=attacked_node, y_target=y_target,
+                                   print_answer=None, attack_num=1)
+
+    full_graph_forwards = []
+    model.register_forward_pre_hook(lambda module, inputs: full_graph_forwards.append(module.victim_subgraph is None))
+    for attack_num, attacked_node in enumerate(dataset.data.edge_index[1, :3].split(1)):
+        y_target = fullForward(model)[attacked_node].max(1)[1]
+        full_graph_forwards.clear()
+        assert checkNodeClassification(attack=attack, dataset=dataset, attacked_node=attacked_node,
+                                       y_target=y_target, print_answer=None, attack_num=attack_num + 1)
+        assert full_graph_forwards and not any(full_graph_forwards)
+    assert model.victim_subgraph is None